@@ -0,0 +1,472 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Write a synthetic music library: small valid MP3 (silent CBR frames,
+# ID3v2.4 or ID3v2.3 tags), FLAC (constant subframes, Vorbis comments),
+# Opus (empty frames, Opus tags) and M4A (iTunes atoms, no audio track)
+# files.
+# Usage: benchmarks/generate.py ROOT COUNT [--seed N] [--formats mp3,flac]
+
+from base64 import b64encode
+import argparse
+import os
+import random
+import struct
+
+# MPEG1 layer III, 128kbps, 44100Hz, joint stereo
+MP3_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_SIZE = 417
+MP3_FRAME_SAMPLES = 1152
+FLAC_BLOCK_SIZE = 4096
+RATE = 44100
+# Opus frames are 20ms at 48kHz, CELT fullband mono
+OPUS_RATE = 48000
+OPUS_FRAME_SAMPLES = 960
+OPUS_PRESKIP = 312
+OPUS_FRAME = b"\xf8"
+
+
+def syncsafe(value):
+    """
+        Encode syncsafe integer
+        @param value as int
+        @return bytes
+    """
+    return bytes([(value >> 21) & 0x7f, (value >> 14) & 0x7f,
+                  (value >> 7) & 0x7f, value & 0x7f])
+
+
+def crc8(data):
+    """
+        FLAC frame header CRC
+        @param data as bytes
+        @return int
+    """
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for i in range(0, 8):
+            crc = ((crc << 1) ^ 0x07 if crc & 0x80 else crc << 1) & 0xff
+    return crc
+
+
+def crc16(data):
+    """
+        FLAC frame CRC
+        @param data as bytes
+        @return int
+    """
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for i in range(0, 8):
+            crc = ((crc << 1) ^ 0x8005 if crc & 0x8000 else crc << 1) &\
+                0xffff
+    return crc
+
+
+def crc32(data):
+    """
+        Ogg page CRC
+        @param data as bytes
+        @return int
+    """
+    crc = 0
+    for byte in data:
+        crc ^= byte << 24
+        for i in range(0, 8):
+            crc = ((crc << 1) ^ 0x04c11db7 if crc & 0x80000000 else
+                   crc << 1) & 0xffffffff
+    return crc
+
+
+def write_mp3(path, tags, seconds, version=4):
+    """
+        Write silent MP3 file
+        @param path as str
+        @param tags as dict, see get_tags()
+        @param seconds as int
+        @param version as int, ID3v2 major version, 3 or 4
+    """
+    frames = b""
+    names = [("TIT2", "title"), ("TPE1", "artist"),
+             ("TPE2", "album_artist"), ("TALB", "album"),
+             ("TRCK", "track"), ("TPOS", "disc"), ("TDRC", "year")]
+    for (frame_id, key) in names:
+        if key in tags:
+            frames += id3_frame(frame_id, str(tags[key]), version)
+    if "genres" in tags:
+        # ID3v2.3 has no multiple values, use first genre
+        genres = tags["genres"] if version == 4 else tags["genres"][0:1]
+        frames += id3_frame("TCON", "\x00".join(genres), version)
+    if "cover" in tags:
+        # Latin-1, mime type, front cover, empty description
+        data = b"\x00image/jpeg\x00\x03\x00" + tags["cover"]
+        frames += b"APIC" + id3_size(len(data), version) + b"\x00\x00" +\
+            data
+    header = b"ID3" + bytes([version]) + b"\x00\x00" + syncsafe(len(frames))
+    count = seconds * RATE // MP3_FRAME_SAMPLES
+    frame = MP3_HEADER + b"\x00" * (MP3_FRAME_SIZE - 4)
+    with open(path, "wb") as f:
+        f.write(header + frames + frame * count)
+
+
+def id3_frame(frame_id, text, version=4):
+    """
+        Return ID3v2 text frame, UTF-8 for ID3v2.4, UTF-16 for ID3v2.3
+        @param frame_id as str
+        @param text as str
+        @param version as int, ID3v2 major version, 3 or 4
+        @return bytes
+    """
+    if version == 4:
+        data = b"\x03" + text.encode("utf-8")
+    else:
+        data = b"\x01" + text.encode("utf-16")
+    return frame_id.encode("ascii") + id3_size(len(data), version) +\
+        b"\x00\x00" + data
+
+
+def id3_size(size, version):
+    """
+        Encode ID3v2 frame size, syncsafe since ID3v2.4
+        @param size as int
+        @param version as int, ID3v2 major version, 3 or 4
+        @return bytes
+    """
+    if version == 4:
+        return syncsafe(size)
+    return struct.pack(">I", size)
+
+
+def write_flac(path, tags, seconds):
+    """
+        Write silent FLAC file, mono 16 bits
+        @param path as str
+        @param tags as dict, see get_tags()
+        @param seconds as int
+    """
+    count = max(1, seconds * RATE // FLAC_BLOCK_SIZE)
+    streaminfo = struct.pack(">HH", FLAC_BLOCK_SIZE, FLAC_BLOCK_SIZE)
+    streaminfo += b"\x00" * 6
+    # Rate (20 bits), channels - 1 (3), bits - 1 (5), samples (36)
+    value = (RATE << 44) | (0 << 41) | (15 << 36) | (count * FLAC_BLOCK_SIZE)
+    streaminfo += value.to_bytes(8, "big") + b"\x00" * 16
+    vendor = b"lollypop"
+    comment = struct.pack("<I", len(vendor)) + vendor + get_comments(tags)
+    data = b"fLaC"
+    data += b"\x00" + len(streaminfo).to_bytes(3, "big") + streaminfo
+    if "cover" in tags:
+        picture = flac_picture(tags["cover"])
+        data += b"\x06" + len(picture).to_bytes(3, "big") + picture
+    data += b"\x84" + len(comment).to_bytes(3, "big") + comment
+    for i in range(0, count):
+        data += flac_frame(i)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def flac_picture(cover):
+    """
+        Return FLAC PICTURE block data for a front cover
+        @param cover as bytes, JPEG image
+        @return bytes
+    """
+    mime = b"image/jpeg"
+    return struct.pack(">II", 3, len(mime)) + mime +\
+        struct.pack(">I", 0) + b"\x00" * 16 +\
+        struct.pack(">I", len(cover)) + cover
+
+
+def flac_frame(number):
+    """
+        Return a FLAC frame with a constant silent subframe
+        @param number as int, frame number
+        @return bytes
+    """
+    # Block size 4096, 44.1kHz, mono, 16 bits
+    header = b"\xff\xf8\xc9\x08" + utf8_number(number)
+    header += bytes([crc8(header)])
+    # Constant subframe, value 0
+    frame = header + b"\x00\x00\x00"
+    return frame + struct.pack(">H", crc16(frame))
+
+
+def utf8_number(number):
+    """
+        Encode frame number as FLAC does (UTF-8 like)
+        @param number as int
+        @return bytes
+    """
+    if number < 0x80:
+        return bytes([number])
+    return chr(number).encode("utf-8")
+
+
+def get_comments(tags, picture=False):
+    """
+        Return Vorbis comments for tags
+        @param tags as dict, see get_tags()
+        @param picture as bool, add cover as METADATA_BLOCK_PICTURE
+        @return bytes, without vendor string
+    """
+    comments = []
+    names = [("TITLE", "title"), ("ARTIST", "artist"),
+             ("ALBUMARTIST", "album_artist"), ("ALBUM", "album"),
+             ("TRACKNUMBER", "track"), ("DISCNUMBER", "disc"),
+             ("DATE", "year")]
+    for (name, key) in names:
+        if key in tags:
+            comments.append("%s=%s" % (name, tags[key]))
+    for genre in tags.get("genres", []):
+        comments.append("GENRE=%s" % genre)
+    if picture and "cover" in tags:
+        comments.append("METADATA_BLOCK_PICTURE=%s" % b64encode(
+            flac_picture(tags["cover"])).decode("ascii"))
+    data = struct.pack("<I", len(comments))
+    for item in comments:
+        item = item.encode("utf-8")
+        data += struct.pack("<I", len(item)) + item
+    return data
+
+
+def write_opus(path, tags, seconds):
+    """
+        Write silent Opus file, mono, empty 20ms frames
+        @param path as str
+        @param tags as dict, see get_tags()
+        @param seconds as int
+    """
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, OPUS_PRESKIP, RATE,
+                                     0, 0)
+    vendor = b"lollypop"
+    comment = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor +\
+        get_comments(tags, True)
+    data = ogg_page([head], 0, 0, 0x02)
+    data += ogg_page([comment], 0, 1)
+    count = seconds * OPUS_RATE // OPUS_FRAME_SAMPLES
+    sequence = 2
+    # One page per second
+    per_page = OPUS_RATE // OPUS_FRAME_SAMPLES
+    for i in range(0, count, per_page):
+        size = min(per_page, count - i)
+        granule = OPUS_PRESKIP + (i + size) * OPUS_FRAME_SAMPLES
+        flags = 0x04 if i + size == count else 0
+        data += ogg_page([OPUS_FRAME] * size, granule, sequence, flags)
+        sequence += 1
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def ogg_page(packets, granule, sequence, flags=0):
+    """
+        Return an Ogg page for complete packets
+        @param packets as [bytes]
+        @param granule as int
+        @param sequence as int, page number
+        @param flags as int, 0x02 for first page, 0x04 for last page
+        @return bytes
+    """
+    segments = b""
+    for packet in packets:
+        segments += b"\xff" * (len(packet) // 255) +\
+            bytes([len(packet) % 255])
+    header = b"OggS\x00" + bytes([flags]) +\
+        struct.pack("<qIII", granule, 1, sequence, 0) +\
+        bytes([len(segments)]) + segments
+    page = header + b"".join(packets)
+    return page[0:22] + struct.pack("<I", crc32(page)) + page[26:]
+
+
+def write_m4a(path, tags, seconds):
+    """
+        Write M4A file, iTunes metadata and duration only, no audio track
+        @param path as str
+        @param tags as dict, see get_tags()
+        @param seconds as int
+    """
+    items = b""
+    names = [(b"\xa9nam", "title"), (b"\xa9ART", "artist"),
+             (b"aART", "album_artist"), (b"\xa9alb", "album"),
+             (b"\xa9day", "year")]
+    for (name, key) in names:
+        if key in tags:
+            items += mp4_atom(name, mp4_data(str(tags[key]).encode("utf-8"),
+                                             1))
+    if "genres" in tags:
+        items += mp4_atom(b"\xa9gen",
+                          mp4_data(tags["genres"][0].encode("utf-8"), 1))
+    for (name, key) in [(b"trkn", "track"), (b"disk", "disc")]:
+        if key in tags:
+            items += mp4_atom(name, mp4_data(struct.pack(">HHHH", 0,
+                                                         tags[key], 0, 0),
+                                             0))
+    if "cover" in tags:
+        items += mp4_atom(b"covr", mp4_data(tags["cover"], 13))
+    # Version, flags, dates, timescale, duration, rate, volume, reserved,
+    # matrix, predefined, next track id
+    mvhd = struct.pack(">IIIII", 0, 0, 0, 1000, seconds * 1000) +\
+        struct.pack(">IH", 0x10000, 0x100) + b"\x00" * 10 +\
+        struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0,
+                    0x40000000) + b"\x00" * 24 + struct.pack(">I", 1)
+    hdlr = b"\x00" * 8 + b"mdirappl" + b"\x00" * 9
+    meta = b"\x00" * 4 + mp4_atom(b"hdlr", hdlr) + mp4_atom(b"ilst", items)
+    moov = mp4_atom(b"mvhd", mvhd) +\
+        mp4_atom(b"udta", mp4_atom(b"meta", meta))
+    with open(path, "wb") as f:
+        f.write(mp4_atom(b"ftyp", b"M4A \x00\x00\x00\x00M4A mp42isom"))
+        f.write(mp4_atom(b"moov", moov))
+
+
+def mp4_atom(atom_type, data):
+    """
+        Return MP4 atom
+        @param atom_type as bytes
+        @param data as bytes
+        @return bytes
+    """
+    return struct.pack(">I", len(data) + 8) + atom_type + data
+
+
+def mp4_data(value, data_type):
+    """
+        Return iTunes data atom
+        @param value as bytes
+        @param data_type as int, 0 binary, 1 UTF-8, 13 JPEG
+        @return bytes
+    """
+    return mp4_atom(b"data", struct.pack(">II", data_type, 0) + value)
+
+
+def write_file(path, tags, seconds):
+    """
+        Write file, format from extension
+        @param path as str
+        @param tags as dict, see get_tags()
+        @param seconds as int
+    """
+    if path.endswith(".mp3"):
+        write_mp3(path, tags, seconds)
+    elif path.endswith(".opus"):
+        write_opus(path, tags, seconds)
+    elif path.endswith(".m4a"):
+        write_m4a(path, tags, seconds)
+    else:
+        write_flac(path, tags, seconds)
+
+
+def get_cover(rand):
+    """
+        Return random bytes looking like a JPEG image
+        @param rand as random.Random
+        @return bytes
+    """
+    size = rand.randint(1024, 16 * 1024)
+    return b"\xff\xd8\xff\xe0" + bytes(rand.getrandbits(8)
+                                       for i in range(0, size)) + b"\xff\xd9"
+
+
+def get_tags(rand, album, track, disc, artist, album_artist, genres,
+             year, cover, missing):
+    """
+        Return tags for track
+        @param rand as random.Random
+        @return dict
+    """
+    if rand.random() < missing:
+        return {}
+    tags = {"title": "Track %02d" % track,
+            "artist": artist,
+            "album": album,
+            "track": track,
+            "disc": disc,
+            "genres": genres,
+            "year": year}
+    if album_artist is not None:
+        tags["album_artist"] = album_artist
+    if cover is not None:
+        tags["cover"] = cover
+    # Some files miss some tags
+    if rand.random() < missing:
+        del tags[rand.choice(["album", "genres", "year", "track"])]
+    return tags
+
+
+def generate(root, count, seed=0, formats=("mp3", "flac"), artists=0,
+             genres=20, tracks=10, compilations=0.1, multi_disc=0.1,
+             album_artists=0.5, covers=0.5, missing=0.05):
+    """
+        Generate library
+        @param root as str
+        @param count as int, file count
+        @param seed as int
+        @param formats as [str]
+        @param artists as int, 0 for one per 50 files
+        @param genres as int
+        @param tracks as int, tracks per album
+        @param compilations as float, ratio of albums
+        @param multi_disc as float, ratio of albums on two discs
+        @param album_artists as float, ratio of albums with album artist
+        @param covers as float, ratio of albums with embedded cover
+        @param missing as float, ratio of files with missing tags
+        @return [(str, dict)], generated files and their tags
+    """
+    rand = random.Random(seed)
+    artist_names = ["Artist %03d" % i
+                    for i in range(0, artists or max(2, count // 50))]
+    genre_names = ["Genre %02d" % i for i in range(0, genres)]
+    files = []
+    album = 0
+    while len(files) < count:
+        album += 1
+        extension = formats[album % len(formats)]
+        album_name = "Album %05d" % album
+        compilation = rand.random() < compilations
+        discs = 2 if rand.random() < multi_disc else 1
+        year = rand.randint(1960, 2016)
+        album_genres = rand.sample(genre_names, rand.choice([1, 1, 1, 2]))
+        cover = get_cover(rand) if rand.random() < covers else None
+        if compilation:
+            artist = None
+            album_artist = None
+            dirname = os.path.join(root, "Compilations", album_name)
+        else:
+            artist = rand.choice(artist_names)
+            album_artist = artist if rand.random() < album_artists else None
+            dirname = os.path.join(root, artist, album_name)
+        os.makedirs(dirname, exist_ok=True)
+        size = min(tracks, count - len(files))
+        for i in range(0, size):
+            track = i + 1
+            disc = 1 + i * discs // size
+            track_artist = artist or rand.choice(artist_names)
+            tags = get_tags(rand, album_name, track, disc, track_artist,
+                            album_artist, album_genres, year, cover,
+                            missing)
+            path = os.path.join(dirname, "%s-%02d.%s" % (disc, track,
+                                                         extension))
+            write_file(path, tags, rand.randint(1, 8))
+            files.append((path, tags))
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate music library")
+    parser.add_argument("root")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", default="mp3,flac")
+    args = parser.parse_args()
+    files = generate(args.root, args.count, args.seed,
+                     args.formats.split(","))
+    print("%s files written to %s" % (len(files), args.root))
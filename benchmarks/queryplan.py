@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Query plan regression check, no GStreamer or GTK needed:
+#   - schema and indexes are read from Database.create_* in database.py
+#   - a database is populated with synthetic rows and analyzed
+#   - every literal query of src/database_*.py is run with
+#     EXPLAIN QUERY PLAN
+# Queries with parameters are hot: exit status is 1 if one of them scans
+# a whole table, unless allowed in COLD.
+# Usage: benchmarks/queryplan.py [--verbose] [SRC_DIR]
+
+import argparse
+import ast
+import glob
+import os
+import random
+import re
+import sqlite3
+import sys
+
+# Parametrized queries allowed to scan: (module, function)
+COLD = [
+    # LIKE '%...%' fallback when sqlite lacks FTS5 can not use an index
+    ("database_albums", "AlbumsDatabase.search"),
+    ("database_artists", "ArtistsDatabase.search"),
+    ("database_tracks", "TracksDatabase.search"),
+    # Path prefix matches, used by MPD and path updates
+    ("database_tracks", "TracksDatabase.get_ids_by_path"),
+    ("database_tracks", "TracksDatabase.get_mtimes_for_path")
+]
+SCAN = re.compile(r"^SCAN (TABLE )?(\w+)")
+
+
+def get_schema(src):
+    """
+        Return schema statements from Database class
+        @param src as str, source directory
+        @return [str]
+    """
+    with open(os.path.join(src, "database.py")) as f:
+        tree = ast.parse(f.read())
+    statements = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and node.name == "Database":
+            for item in node.body:
+                if not isinstance(item, ast.Assign):
+                    continue
+                name = item.targets[0].id
+                if name.startswith("create_"):
+                    value = ast.literal_eval(item.value)
+                    if isinstance(value, str):
+                        statements.append(value)
+                    else:
+                        statements += value
+    return statements
+
+
+def get_string(node):
+    """
+        Return string constant
+        @param node as ast.AST
+        @return str/None
+    """
+    # ast.Str before Python 3.8, ast.Constant after
+    value = getattr(node, "value", getattr(node, "s", None))
+    return value if isinstance(value, str) else None
+
+
+def get_literal(node):
+    """
+        Return SQL from execute() first argument, formatting is replaced
+        by a number
+        @param node as ast.AST
+        @return str/None if not a literal
+    """
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
+        sql = get_string(node.left)
+        if sql is not None:
+            return re.sub(r"%[sdi]", "1", sql)
+        return None
+    return get_string(node)
+
+
+def get_queries(src):
+    """
+        Return queries of database modules
+        @param src as str, source directory
+        @return ([(module, function, line, sql)], dynamic query count)
+    """
+    queries = []
+    dynamic = 0
+    for path in sorted(glob.glob(os.path.join(src, "database_*.py"))):
+        module = os.path.splitext(os.path.basename(path))[0]
+        if module == "database_upgrade":
+            continue
+        with open(path) as f:
+            tree = ast.parse(f.read())
+        for cls in tree.body:
+            if not isinstance(cls, ast.ClassDef):
+                continue
+            for function in cls.body:
+                if not isinstance(function, ast.FunctionDef):
+                    continue
+                name = "%s.%s" % (cls.name, function.name)
+                for node in ast.walk(function):
+                    if not isinstance(node, ast.Call) or\
+                            not isinstance(node.func, ast.Attribute) or\
+                            node.func.attr not in ["execute",
+                                                   "executemany"] or\
+                            not node.args:
+                        continue
+                    sql = get_literal(node.args[0])
+                    if sql is None:
+                        dynamic += 1
+                    else:
+                        queries.append((module, name, node.lineno,
+                                        " ".join(sql.split())))
+    return (queries, dynamic)
+
+
+def populate(db, tracks=10000):
+    """
+        Fill database with synthetic rows, then analyze it
+        @param db as sqlite3.Connection
+        @param tracks as int
+    """
+    rand = random.Random(0)
+    genres = max(1, tracks // 200)
+    artists = max(1, tracks // 30)
+    albums = max(1, tracks // 10)
+    db.executemany("INSERT INTO genres (rowid, name) VALUES (?, ?)",
+                   [(i, "Genre %s" % i) for i in range(1, genres + 1)])
+    db.executemany("INSERT INTO artists (rowid, name, sortname)\
+                    VALUES (?, ?, ?)",
+                   [(i, "Artist %s" % i, "Artist %s" % i)
+                    for i in range(1, artists + 1)])
+    db.executemany("INSERT INTO albums (rowid, name, artist_id,\
+                    no_album_artist, year, path, popularity, mtime)\
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   [(i, "Album %s" % i, rand.randint(1, artists), 0,
+                     rand.randint(1960, 2016), "/music/%s" % i,
+                     rand.randint(0, 10), 0)
+                    for i in range(1, albums + 1)])
+    db.executemany("INSERT INTO album_genres (album_id, genre_id)\
+                    VALUES (?, ?)",
+                   [(i, rand.randint(1, genres))
+                    for i in range(1, albums + 1)])
+    rows = []
+    for i in range(1, tracks + 1):
+        album_id = rand.randint(1, albums)
+        rows.append((i, "Track %s" % i, "/music/%s/%s.mp3" % (album_id, i),
+                     rand.randint(60, 600), i % 12, 1, album_id, 2000,
+                     rand.randint(0, 10), 0, 0, i, 1000))
+    db.executemany("INSERT INTO tracks (rowid, name, filepath, duration,\
+                    tracknumber, discnumber, album_id, year, popularity,\
+                    ltime, mtime, inode, size)\
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    db.executemany("INSERT INTO track_artists (track_id, artist_id)\
+                    VALUES (?, ?)",
+                   [(i, rand.randint(1, artists))
+                    for i in range(1, tracks + 1)])
+    db.executemany("INSERT INTO track_genres (track_id, genre_id)\
+                    VALUES (?, ?)",
+                   [(i, rand.randint(1, genres))
+                    for i in range(1, tracks + 1)])
+    db.executemany("INSERT INTO dirs (path, mtime, count) VALUES (?, ?, ?)",
+                   [("/music/%s" % i, 0, 10)
+                    for i in range(1, albums + 1)])
+    db.execute("ANALYZE")
+    db.commit()
+
+
+def get_scans(db, tables, sql):
+    """
+        Return tables fully scanned by query
+        @param db as sqlite3.Connection
+        @param tables as set of str
+        @param sql as str
+        @return ([str], plan as [str])
+    """
+    params = [None] * sql.count("?")
+    plan = [row[-1] for row in db.execute("EXPLAIN QUERY PLAN " + sql,
+                                          params)]
+    scans = []
+    for detail in plan:
+        match = SCAN.match(detail)
+        # Virtual tables, like full text search ones, use their own index
+        if match is not None and match.group(2) in tables and\
+           "VIRTUAL TABLE" not in detail:
+            scans.append(match.group(2))
+    return (scans, plan)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check query plans")
+    parser.add_argument("src", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__),
+                                             "..", "src"))
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--verbose", action="store_true",
+                        help="print every query plan")
+    args = parser.parse_args()
+    db = sqlite3.connect(":memory:")
+    for statement in get_schema(args.src):
+        db.execute(statement)
+    tables = set(row[0] for row in db.execute(
+                        "SELECT name FROM sqlite_master WHERE type='table'"))
+    populate(db, args.tracks)
+    (queries, dynamic) = get_queries(args.src)
+    # Temporary tables used by later queries
+    for (module, function, line, sql) in queries:
+        if sql.upper().startswith("CREATE TEMP"):
+            db.execute(sql)
+    failures = 0
+    cold = 0
+    for (module, function, line, sql) in queries:
+        if sql.upper().startswith(("CREATE", "DROP")):
+            continue
+        try:
+            (scans, plan) = get_scans(db, tables, sql)
+        except sqlite3.Error as e:
+            print("ERROR %s.py:%s %s(): %s" % (module, line, function, e))
+            failures += 1
+            continue
+        hot = "?" in sql and (module, function) not in COLD
+        if scans and hot:
+            failures += 1
+            status = "SCAN"
+        elif scans:
+            cold += 1
+            status = "cold"
+        else:
+            status = "ok"
+        if status == "SCAN" or args.verbose:
+            print("%s %s.py:%s %s(): %s" % (status, module, line, function,
+                                            ", ".join(scans)))
+            print("    %s" % sql)
+            for detail in plan:
+                print("    -> %s" % detail)
+    print("%s queries, %s hot full scans, %s cold full scans, "
+          "%s dynamic queries not checked" % (len(queries), failures, cold,
+                                              dynamic))
+    sys.exit(1 if failures else 0)
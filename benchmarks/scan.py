@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# End to end scan benchmark on a synthetic library, results as JSON:
+#   - full scan of an empty database
+#   - no-op rescan, incremental then stating all files
+#   - rescan after 1% of files changed
+#   - rescan after half of albums were deleted
+# Settings use memory backend, database and embedded covers live in a
+# temporary directory
+# Usage: PYTHONPATH=<dir containing lollypop> benchmarks/scan.py [COUNT]
+
+import os
+# Do not touch user settings
+os.environ['GSETTINGS_BACKEND'] = 'memory'
+
+from gi.repository import GLib
+
+import argparse
+import json
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+from time import time
+
+from lollypop.art_album import AlbumArt
+from lollypop.database import Database
+from lollypop.scanonly import ScanOnlyApplication
+
+from generate import generate, write_file
+
+
+class ScanBenchmark(ScanOnlyApplication):
+    """
+        Run scan scenarios one after the other
+    """
+
+    def __init__(self, music, files, seed):
+        """
+            Create benchmark
+            @param music as str, library root
+            @param files as [(str, dict)], see generate()
+            @param seed as int
+        """
+        ScanOnlyApplication.__init__(self, [])
+        self._music = music
+        self._files = files
+        self._rand = random.Random(seed)
+        self._scenarios = [("full_scan", None, False),
+                           ("noop_rescan", None, False),
+                           ("noop_full_rescan", None, True),
+                           ("change_1pct_rescan", self._change, True),
+                           ("mass_delete_rescan", self._delete, False)]
+        self._current = None
+        self.results = []
+
+    def do_activate(self):
+        """
+            Init database and run first scenario
+        """
+        self._init()
+        self.settings.set_value('music-path',
+                                GLib.Variant('as', [self._music]))
+        self.scanner.connect('scan-finished', self._on_scan_finished)
+        self.hold()
+        GLib.timeout_add(100, self._next)
+
+#######################
+# PRIVATE             #
+#######################
+    def _next(self):
+        """
+            Run next scenario once previous scan thread exited
+        """
+        if self.scanner.is_locked():
+            return True
+        if not self._scenarios:
+            self.release()
+            return False
+        (name, action, full) = self._scenarios.pop(0)
+        changed = 0
+        if action is not None:
+            changed = action()
+        self._current = (name, full, changed)
+        self._start = time()
+        self.scanner.update(None, full)
+        return False
+
+    def _change(self):
+        """
+            Retag 1% of files, mtime is moved forward as it is stored
+            in seconds
+            @return changed files as int
+        """
+        count = max(1, len(self._files) // 100)
+        for (path, tags) in self._rand.sample(self._files, count):
+            mtime = os.stat(path).st_mtime
+            tags = dict(tags)
+            tags['title'] = "%s (edit)" % tags.get('title', "Track")
+            write_file(path, tags, self._rand.randint(1, 8))
+            os.utime(path, (mtime + 10, mtime + 10))
+        return count
+
+    def _delete(self):
+        """
+            Remove half of album directories
+            @return deleted files as int
+        """
+        albums = sorted(set(os.path.dirname(path)
+                            for (path, tags) in self._files))
+        deleted = set(self._rand.sample(albums, len(albums) // 2))
+        for album in deleted:
+            shutil.rmtree(album)
+        count = len(self._files)
+        self._files = [(path, tags) for (path, tags) in self._files
+                       if os.path.dirname(path) not in deleted]
+        return count - len(self._files)
+
+    def _on_scan_finished(self, scanner):
+        """
+            Save scenario result and run next one
+            @param scanner as CollectionScanner
+        """
+        elapsed = time() - self._start
+        (name, full, changed) = self._current
+        stats = scanner.get_stats()
+        plan = stats.get('plan', {})
+        files = sum(plan.get(key, 0) for key in ['add', 'update',
+                                                 'unchanged', 'move'])
+        # Kilobytes on Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.results.append({'name': name,
+                             'full': full,
+                             'changed': changed,
+                             'elapsed': elapsed,
+                             'files': files,
+                             'files_per_s': files / elapsed if elapsed else 0,
+                             'tracks': self.tracks.count(),
+                             'plan': plan,
+                             'walk': stats.get('walk', {}),
+                             'tags': stats.get('tags', {}),
+                             'write': stats.get('write', {}),
+                             'peak_rss_kb': rss})
+        GLib.timeout_add(100, self._next)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan benchmark")
+    parser.add_argument("count", type=int, nargs="?", default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", default="mp3,flac")
+    parser.add_argument("--output", help="JSON file, default to stdout")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep temporary directory")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix="lollypop-bench-")
+    music = os.path.join(tmp, "music")
+    Database.LOCAL_PATH = os.path.join(tmp, "db")
+    Database.DB_PATH = "%s/lollypop.db" % Database.LOCAL_PATH
+    AlbumArt._EMBEDDED_PATH = os.path.join(tmp, "embedded")
+    start = time()
+    files = generate(music, args.count, args.seed, args.formats.split(","))
+    generated = time() - start
+    benchmark = ScanBenchmark(music, files, args.seed)
+    benchmark.run([])
+    report = {'count': args.count,
+              'seed': args.seed,
+              'formats': args.formats.split(","),
+              'generate_elapsed': generated,
+              'python': platform.python_version(),
+              'cpus': os.cpu_count(),
+              'scenarios': benchmark.results}
+    if args.keep:
+        report['directory'] = tmp
+    else:
+        shutil.rmtree(tmp)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Compare per file latency of FastTagReader and GStreamer Discoverer
+# Usage: PYTHONPATH=<dir containing lollypop> benchmarks/tagreader.py PATH...
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+import os
+import sys
+from time import time
+
+from lollypop.tagreader import TagReader, ScannerTagReader
+from lollypop.tagreader_fast import FastTagReader
+from lollypop.scanwalker import ScanWalker
+
+
+def get_files(paths):
+    """
+        Return music files in paths
+        @param paths as [str]
+        @return [str]
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [filepath for (filepath, mtime) in
+                      ScanWalker().walk([path])]
+        else:
+            files.append(path)
+    return files
+
+
+def get_summary(filepath, infos):
+    """
+        Return compared values
+        @param filepath as str
+        @param infos as DiscovererInfo/FastInfos
+        @return tuple
+    """
+    reader = ScannerTagReader()
+    tags = infos.get_tags()
+    return (reader.get_title(tags, filepath),
+            reader.get_artists(tags),
+            reader.get_album_name(tags),
+            reader.get_genres(tags),
+            reader.get_tracknumber(tags),
+            reader.get_discnumber(tags),
+            reader.get_year(tags),
+            round(infos.get_duration() / 1000000000))
+
+
+def percentile(values, percent):
+    """
+        Return percentile of values
+        @param values as [float]
+        @param percent as int
+        @return float
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+def bench(files):
+    """
+        Run benchmark on files
+        @param files as [str]
+    """
+    fast = FastTagReader()
+    discoverer = TagReader()
+    fast_times = []
+    discoverer_times = []
+    fallbacks = 0
+    mismatches = 0
+    for filepath in files:
+        start = time()
+        fast_infos = fast.get_infos(filepath)
+        fast_times.append(time() - start)
+        start = time()
+        try:
+            infos = discoverer.get_infos(filepath)
+        except Exception as e:
+            print("%s: %s" % (filepath, e))
+            continue
+        discoverer_times.append(time() - start)
+        if fast_infos is None:
+            fallbacks += 1
+        elif get_summary(filepath, fast_infos) !=\
+                get_summary(filepath, infos):
+            mismatches += 1
+            print("%s:\n  fast: %s\n  gst:  %s" % (
+                  filepath,
+                  get_summary(filepath, fast_infos),
+                  get_summary(filepath, infos)))
+    print("%s files, %s fallbacks, %s mismatches" % (len(files), fallbacks,
+                                                     mismatches))
+    for (name, times) in [("fast", fast_times),
+                          ("discoverer", discoverer_times)]:
+        if times:
+            print("%-10s mean %.2fms, p50 %.2fms, p95 %.2fms, total %.2fs" % (
+                  name, sum(times) / len(times) * 1000,
+                  percentile(times, 50) * 1000,
+                  percentile(times, 95) * 1000,
+                  sum(times)))
+    if sum(fast_times) > 0:
+        print("speedup: x%.1f" % (sum(discoverer_times) / sum(fast_times)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: %s PATH..." % sys.argv[0])
+        sys.exit(1)
+    Gst.init(None)
+    bench(get_files(sys.argv[1:]))
@@ -52,6 +52,7 @@ from lollypop.radios import Radios
 from lollypop.collectionscanner import CollectionScanner
 from lollypop.fullscreen import FullScreen
 from lollypop.mpd import MpdServerDaemon
+from lollypop.objects import Track, Album
 
 
 class Application(Gtk.Application):
@@ -70,7 +71,6 @@ class Application(Gtk.Application):
                             self,
                             application_id='org.gnome.Lollypop',
                             flags=Gio.ApplicationFlags.HANDLES_COMMAND_LINE)
-        self.cursors = {}
         self.window = None
         self.notify = None
         self.mpd = None
@@ -96,6 +96,14 @@ class Application(Gtk.Application):
             self.add_main_option("prev", b'p', GLib.OptionFlags.NONE,
                                  GLib.OptionArg.NONE, "Go to prev track",
                                  None)
+            self.add_main_option("list-quarantine", b'\0',
+                                 GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+                                 "List files skipped by collection scanner",
+                                 None)
+            self.add_main_option("clear-quarantine", b'\0',
+                                 GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+                                 "Scan skipped files again on next update",
+                                 None)
         self.connect('command-line', self._on_command_line)
         self.register(None)
         if self.get_is_remote():
@@ -119,7 +127,7 @@ class Application(Gtk.Application):
             self.lastfm = LastFM()
         self.db = Database()
         self.playlists = Playlists()
-        # We store cursors for main thread
+        # Main thread keeps its own connections
         SqlCursor.add(self.db)
         SqlCursor.add(self.playlists)
         self.albums = AlbumsDatabase()
@@ -128,6 +136,9 @@ class Application(Gtk.Application):
         self.tracks = TracksDatabase()
         self.player = Player()
         self.scanner = CollectionScanner()
+        # Loaded tracks and albums are outdated by scanner changes
+        self.scanner.connect('scan-finished', self._on_scan_finished)
+        self.scanner.connect('album-modified', self._on_album_modified)
         self.art = Art()
         if not self.settings.get_value('disable-mpris'):
             MPRIS(self)
@@ -207,12 +218,17 @@ class Application(Gtk.Application):
             self.scanner.stop()
             GLib.idle_add(self.quit)
             return
+        # Wait for pending user changes
+        radios = Radios()
+        self.db.writer.stop()
+        self.playlists.writer.stop()
+        radios.writer.stop()
         try:
             with SqlCursor(self.db) as sql:
                 sql.execute('VACUUM')
             with SqlCursor(self.playlists) as sql:
                 sql.execute('VACUUM')
-            with SqlCursor(Radios()) as sql:
+            with SqlCursor(radios) as sql:
                 sql.execute('VACUUM')
         except Exception as e:
             print("Application::quit(): ", e)
@@ -262,7 +278,24 @@ class Application(Gtk.Application):
             self.player.next()
         elif options.contains('prev'):
             self.player.prev()
+        # Output goes to calling terminal, even if we are already running
+        if options.contains('list-quarantine'):
+            for (path, reason) in self.scanner.get_quarantined():
+                app_cmd_line.print_("%s: %s\n" % (path, reason))
+        if options.contains('clear-quarantine'):
+            self.scanner.clear_quarantine()
         args = app_cmd_line.get_arguments()
+        # Do not show window for quarantine commands only
+        if (options.contains('list-quarantine') or
+                options.contains('clear-quarantine')) and\
+                len(args) < 2 and\
+                not any(options.contains(option)
+                        for option in ['set-rating', 'play-pause',
+                                       'next', 'prev']):
+            # Nothing else to do if we were started for it
+            if not app_cmd_line.get_is_remote():
+                GLib.idle_add(self.quit)
+            return 0
         if len(args) > 1:
             self.player.clear_externals()
             for f in args[1:]:
@@ -290,6 +323,23 @@ class Application(Gtk.Application):
             self.player.play_first_external()
         self._externals_count += 1
 
+    def _on_scan_finished(self, scanner):
+        """
+            Forget loaded tracks and albums
+            @param scanner as CollectionScanner
+        """
+        Track.RECORDS.clear()
+        Album.RECORDS.clear()
+
+    def _on_album_modified(self, scanner, album_id):
+        """
+            Forget loaded album and its tracks
+            @param scanner as CollectionScanner
+            @param album id as int
+        """
+        Album.RECORDS.remove(album_id)
+        Track.RECORDS.remove_by('album_id', album_id)
+
     def _hide_on_delete(self, widget, event):
         """
             Hide window
@@ -311,7 +361,7 @@ class Application(Gtk.Application):
             t = Thread(target=self.art.clean_all_cache)
             t.daemon = True
             t.start()
-            self.window.update_db()
+            self.window.update_db(True)
 
     def _fullscreen(self, action=None, param=None):
         """
@@ -10,13 +10,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import GLib, Gdk, GdkPixbuf, Gio, Gst
+from gi.repository import GLib, Gdk, GdkPixbuf, Gio
 
 import re
 import os
 
 from lollypop.art_base import BaseArt
 from lollypop.art_downloader import ArtDownloader
+from lollypop.database_dirs import DirsDatabase
 from lollypop.tagreader import TagReader
 from lollypop.define import Lp
 from lollypop.objects import Album
@@ -28,6 +29,8 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
     """
 
     _MIMES = ("jpeg", "jpg", "png", "gif")
+    # Embedded images saved by scanner, by album id
+    _EMBEDDED_PATH = BaseArt._CACHE_PATH + "/embedded"
 
     def __init__(self):
         """
@@ -37,6 +40,7 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
         ArtDownloader.__init__(self)
         TagReader.__init__(self)
         self._favorite = Lp().settings.get_value('favorite-cover').get_string()
+        self._dirs = DirsDatabase()
 
     def get_album_cache_path(self, album, size):
         """
@@ -77,14 +81,18 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
         if album.id is None:
             return None
         try:
-            paths = [
-                os.path.join(album.path, self._favorite),
+            names = [
+                self._favorite,
                 # Used when having muliple albums in same folder
-                os.path.join(album.path, "{}_{}.jpg".format(album.artist_name,
-                                                            album.name))
+                "{}_{}.jpg".format(album.artist_name, album.name)
             ]
-            for path in paths:
-                if os.path.exists(path):
+            images = self._get_images(album.path)
+            for name in names:
+                path = os.path.join(album.path, name)
+                if images is None:
+                    if os.path.exists(path):
+                        return path
+                elif name in images:
                     return path
         except:
             pass
@@ -96,10 +104,7 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
             @param album as Album
             @return path or None
         """
-        all_paths = [os.path.join(album.path, f) for f in os.listdir(
-                                                                album.path)]
-        for path in filter(lambda p: p.lower().endswith(self._MIMES),
-                           all_paths):
+        for path in self._get_image_paths(album.path):
             return path
 
     def get_album_artworks(self, album):
@@ -108,11 +113,8 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
             @param album as Album
             @return [paths]
         """
-        all_paths = [os.path.join(album.path, f) for f in os.listdir(
-                                                                album.path)]
         paths = []
-        for path in filter(lambda p: p.lower().endswith(self._MIMES),
-                           all_paths):
+        for path in self._get_image_paths(album.path):
             if not path.endswith(self._favorite):
                 paths.append(path)
         return paths
@@ -144,10 +146,14 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
                                                                          size,
                                                                          size,
                                                                          False)
-                # Use tags artwork
+                # Use tags artwork, saved by scanner if known
                 if pixbuf is None and album.tracks:
+                    (exist, data) = self.get_embedded_artwork(album.id)
                     try:
-                        pixbuf = self.pixbuf_from_tags(
+                        if data is not None:
+                            pixbuf = self.pixbuf_from_data(data, size)
+                        elif not exist:
+                            pixbuf = self.pixbuf_from_tags(
                                     album.tracks[0].path, size)
                     except Exception as e:
                         pass
@@ -210,9 +216,78 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
             else:
                 artpath = os.path.join(album.path, self._favorite)
             pixbuf.savev(artpath, "jpeg", ["quality"], ["90"])
+            self.update_images(album.path)
         except Exception as e:
             print("Art::save_album_artwork(): %s" % e)
 
+    def update_images(self, path):
+        """
+            List images in scanned album folder again
+            @param path as str
+        """
+        if self._dirs.get_images(path) is None:
+            return
+        images = []
+        try:
+            for entry in os.scandir(path):
+                if entry.is_file() and\
+                   entry.name.lower().endswith(self._MIMES):
+                    stat = entry.stat()
+                    images.append((entry.name, stat.st_size,
+                                   int(stat.st_mtime)))
+        except Exception as e:
+            print("Art::update_images(): %s" % e)
+            return
+        Lp().db.writer.write(self._dirs.set_images, {path: images})
+
+    def get_embedded_artwork(self, album_id):
+        """
+            Return image embedded in album tracks, as saved by scanner
+            @param album id as int
+            @return (exist as bool, data as bytes/None)
+            exist is False if scanner did not look for an image
+        """
+        path = "%s/%s" % (self._EMBEDDED_PATH, album_id)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            return (True, data or None)
+        except:
+            return (False, None)
+
+    def save_embedded_artwork(self, album_id, data):
+        """
+            Save image embedded in album tracks, an empty file means
+            tracks do not have any
+            @param album id as int
+            @param data as bytes/None
+            @thread safe
+        """
+        path = "%s/%s" % (self._EMBEDDED_PATH, album_id)
+        try:
+            if not os.path.exists(self._EMBEDDED_PATH):
+                os.makedirs(self._EMBEDDED_PATH, exist_ok=True)
+            # Readers never see a partial file
+            with open(path + ".tmp", "wb") as f:
+                if data is not None:
+                    f.write(data)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print("Art::save_embedded_artwork(): %s" % e)
+
+    def remove_embedded_artwork(self, album_id):
+        """
+            Remove image saved for deleted album
+            @param album id as int
+            @thread safe
+        """
+        try:
+            os.remove("%s/%s" % (self._EMBEDDED_PATH, album_id))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print("Art::remove_embedded_artwork(): %s" % e)
+
     def album_artwork_update(self, album_id):
         """
             Announce album cover update
@@ -242,26 +317,54 @@ class AlbumArt(BaseArt, ArtDownloader, TagReader):
         pixbuf = None
         try:
             infos = self.get_infos(filepath)
-            exist = False
             if infos is not None:
-                (exist, sample) = infos.get_tags().get_sample_index('image', 0)
-            if exist:
-                (exist, mapflags) = sample.get_buffer().map(Gst.MapFlags.READ)
-            if exist:
-                stream = Gio.MemoryInputStream.new_from_data(mapflags.data,
-                                                             None)
-                pixbuf = GdkPixbuf.Pixbuf.new_from_stream_at_scale(stream,
-                                                                   size,
-                                                                   size,
-                                                                   False,
-                                                                   None)
+                data = self.get_image(infos.get_tags())
+                if data is not None:
+                    pixbuf = self.pixbuf_from_data(data, size)
         except:
             pass
         return pixbuf
 
+    def pixbuf_from_data(self, data, size):
+        """
+            Return pixbuf for image data
+            @param data as bytes
+            @param size as int
+        """
+        stream = Gio.MemoryInputStream.new_from_data(data, None)
+        return GdkPixbuf.Pixbuf.new_from_stream_at_scale(stream,
+                                                         size,
+                                                         size,
+                                                         False,
+                                                         None)
+
 #######################
 # PRIVATE             #
 #######################
+    def _get_images(self, path):
+        """
+            Return image names in album folder, as listed by scanner
+            @param path as str
+            @return [str] or None if folder was not scanned
+        """
+        images = self._dirs.get_images(path)
+        if images is None:
+            return None
+        return [name for (name, size, mtime) in images]
+
+    def _get_image_paths(self, path):
+        """
+            Return images in album folder, filesystem is only read if
+            folder was not scanned
+            @param path as str
+            @return [str]
+        """
+        names = self._get_images(path)
+        if names is None:
+            names = [name for name in os.listdir(path)
+                     if name.lower().endswith(self._MIMES)]
+        return [os.path.join(path, name) for name in names]
+
     def _get_album_cache_name(self, album):
         """
             Get a uniq string for album
@@ -10,18 +10,26 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import GLib, GObject, Gio
+from gi.repository import GLib, GObject
 
-import os
 from gettext import gettext as _
+from collections import deque
+from itertools import chain
 from threading import Thread
 from time import time
+import os
 
 from lollypop.inotify import Inotify
 from lollypop.define import Lp
+from lollypop.database_dirs import DirsDatabase
+from lollypop.database_quarantine import QuarantineDatabase
+from lollypop.scanplan import ScanPlan
+from lollypop.scanthrottle import ScanThrottle
+from lollypop.scanwalker import ScanWalker
+from lollypop.scanwriter import ScanWriter
 from lollypop.sqlcursor import SqlCursor
-from lollypop.tagreader import ScannerTagReader
-from lollypop.utils import is_audio, is_pls, debug
+from lollypop.tagreader import ScannerTagReader, TagReaderPool
+from lollypop.utils import debug
 
 
 class CollectionScanner(GObject.GObject, ScannerTagReader):
@@ -35,51 +43,125 @@ class CollectionScanner(GObject.GObject, ScannerTagReader):
         'album-modified': (GObject.SignalFlags.RUN_FIRST, None, (int,))
     }
 
-    def __init__(self):
+    def __init__(self, monitor=True):
         """
             Init collection scanner
+            @param monitor as bool, False to not watch collection changes
         """
         GObject.GObject.__init__(self)
         ScannerTagReader.__init__(self)
 
         self._thread = None
         self._inotify = None
-        if Lp().settings.get_value('auto-update'):
+        if monitor and Lp().settings.get_value('auto-update'):
             self._inotify = Inotify()
         self._progress = None
+        self._pool = None
+        self._dirs = DirsDatabase()
+        self._quarantine = QuarantineDatabase()
+        self._quarantined = {}
+        self._moved = deque()
+        self._stats = {}
+        self._throttle = ScanThrottle(self._update_progress)
 
-    def update(self, progress):
+    def update(self, progress, full=False):
         """
             Update database
             @param progress as Gtk.Scale
+            @param full as bool, stat files of unchanged directories
         """
         if not self.is_locked():
-            progress.show()
+            if progress is not None:
+                progress.show()
             self._progress = progress
-            # Keep track of on file with missing codecs
-            self._missing_codecs = None
-            self.init_discover()
+            self._init_scan()
             paths = Lp().settings.get_music_paths()
             if not paths:
                 return
 
+            # Trailing separators would not match dirs and tracks paths
+            paths = [os.path.normpath(path) for path in paths]
+            self._throttle.start(paths)
             if Lp().notify is not None:
                 Lp().notify.send(_("Your music is updating"))
-            self._thread = Thread(target=self._scan, args=(paths,))
+            self._thread = Thread(target=self._scan, args=(paths, full))
             self._thread.daemon = True
             self._thread.start()
 
+    def update_paths(self, paths):
+        """
+            Update database for paths only: files are added, retagged or
+            deleted, directories are walked
+            @param paths as [string]
+            @return False if scanner is busy
+        """
+        if self.is_locked():
+            return False
+        self._progress = None
+        self._init_scan()
+        paths = [os.path.normpath(path) for path in paths]
+        self._throttle.start(paths)
+        self._thread = Thread(target=self._scan_paths, args=(paths,))
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
     def is_locked(self):
         """
             Return True if db locked
         """
         return self._thread is not None and self._thread.isAlive()
 
+    def plan(self, paths=None, full=False):
+        """
+            Compute what a scan would do without touching database (dry run)
+            @param paths as [string], default to music paths
+            @param full as bool, stat files of unchanged directories
+            @return ScanPlan
+        """
+        if paths is None:
+            paths = Lp().settings.get_music_paths()
+        paths = [os.path.normpath(path) for path in paths]
+        mtimes = Lp().tracks.get_mtimes()
+        plan = ScanPlan(mtimes)
+        walker = self._get_walker(mtimes, full)
+        (identities, unidentified) = self._get_identities()
+        for item in self._classify(plan, walker.walk(paths),
+                                   self._quarantine.get_all(), identities):
+            pass
+        return plan
+
+    def get_stats(self):
+        """
+            Return statistics of last finished scan
+            @return {'plan': see ScanPlan.get_summary(),
+                     'walk': see ScanWalker.get_stats(),
+                     'tags': see TagReaderPool.get_stats(),
+                     'write': see ScanWriter.get_stats()}
+        """
+        return self._stats
+
+    def get_quarantined(self):
+        """
+            Return files skipped by scanner until they change
+            @return [(path as string, reason as string)]
+        """
+        return self._quarantine.get_reasons()
+
+    def clear_quarantine(self):
+        """
+            Scan quarantined files again on next update
+        """
+        self._quarantine.clear()
+
     def stop(self):
         """
             Stop scan
         """
         self._thread = None
+        self._throttle.stop()
+        if self._pool is not None:
+            self._pool.cancel()
         if self._progress is not None:
             self._progress.hide()
             self._progress.set_fraction(0.0)
@@ -88,36 +170,156 @@ class CollectionScanner(GObject.GObject, ScannerTagReader):
 #######################
 # PRIVATE             #
 #######################
-    def _get_objects_for_paths(self, paths):
+    def _init_scan(self):
         """
-            Return all tracks/dirs for paths
-            @param paths as string
-            @return ([tracks path], [dirs path], track count)
+            Prepare a new scan
         """
-        tracks = []
-        track_dirs = list(paths)
-        count = 0
-        for path in paths:
-            for root, dirs, files in os.walk(path):
-                # Add dirs
-                for d in dirs:
-                    track_dirs.append(os.path.join(root, d))
-                # Add files
-                for name in files:
-                    filepath = os.path.join(root, name)
-                    try:
-                        f = Gio.File.new_for_path(filepath)
-                        if is_pls(f):
-                            pass
-                        elif is_audio(f):
-                            tracks.append(filepath)
-                            count += 1
-                        else:
-                            debug("%s not detected as a music file" % filepath)
-                    except Exception as e:
-                        print("CollectionScanner::_get_objects_for_paths: %s"
-                              % e)
-        return (tracks, track_dirs, count)
+        # Keep track of on file with missing codecs
+        self._missing_codecs = None
+        workers = Lp().settings.get_value('scan-workers').get_int32()
+        low_priority = Lp().settings.get_value('scan-low-priority')
+        self._pool = TagReaderPool(workers, low_priority)
+
+    def _get_walker(self, mtimes, full):
+        """
+            Return a walker for known files
+            @param mtimes as {filepath as string: mtime as int}
+            @param full as bool, stat files of unchanged directories
+            @return ScanWalker
+        """
+        if full:
+            return ScanWalker()
+        known_files = {}
+        for (filepath, mtime) in mtimes.items():
+            path = os.path.normpath(os.path.dirname(filepath))
+            known_files.setdefault(path, {})[filepath] = mtime
+        return ScanWalker(self._dirs.get_all(), known_files)
+
+    def _get_identities(self):
+        """
+            Return known files identity, used to detect moved files
+            @return ({(inode as int, size as int, mtime as int):
+                      (track id as int, filepath as string)},
+                     {filepath as string: track id as int}), second dict is
+                     for tracks without identity
+        """
+        identities = {}
+        unidentified = {}
+        for (track_id, filepath, mtime,
+             inode, size) in Lp().tracks.get_identities():
+            if inode is None:
+                unidentified[filepath] = track_id
+            else:
+                identities[(inode, size, mtime)] = (track_id, filepath)
+        return (identities, unidentified)
+
+    def _classify(self, plan, files, quarantined, identities):
+        """
+            Sort files against database, plan is finished once all
+            files are classified. Unchanged quarantined files are skipped,
+            new files matching the identity of a vanished file are moves
+            @param plan as ScanPlan
+            @param files as iterable of (filepath as string, mtime as int)
+            @param quarantined as {path as string: (size as int,
+                                                    mtime as int)}
+            @param identities as dict, see _get_identities()
+            @return generator of (filepath as string,
+                                  (mtime as int,
+                                   ScanPlan.ADD/UPDATE/MOVE,
+                                   inode as int, size as int,
+                                   moved track id as int/None))
+            @thread safe
+        """
+        for (filepath, mtime) in files:
+            status = plan.classify(filepath, mtime)
+            if status == ScanPlan.UNCHANGED:
+                continue
+            try:
+                stat = os.stat(filepath)
+            except Exception as e:
+                print("CollectionScanner::_classify(): %s" % e)
+                continue
+            if quarantined.get(filepath) == (stat.st_size, mtime):
+                debug("Skipping quarantined file: %s" % filepath)
+                continue
+            if status == ScanPlan.ADD:
+                moved = identities.pop((stat.st_ino, stat.st_size, mtime),
+                                       None)
+                if moved is not None and not os.path.exists(moved[1]):
+                    plan.set_moved(filepath, moved[1])
+                    yield (filepath, (mtime, ScanPlan.MOVE, stat.st_ino,
+                                      stat.st_size, moved[0]))
+                    continue
+            yield (filepath, (mtime, status, stat.st_ino, stat.st_size, None))
+        plan.finish()
+        debug("CollectionScanner::_classify(): %s" % plan)
+
+    def _split_moves(self, files):
+        """
+            Queue moved files for writer, they do not need their tags read
+            @param files as generator, see _classify()
+            @return generator of files to discover
+            @thread safe
+        """
+        for item in files:
+            if item[1][1] == ScanPlan.MOVE:
+                self._moved.append(item)
+            else:
+                yield item
+
+    def _apply_moves(self):
+        """
+            Update path of moved tracks, ids and stats are kept
+            @warning: commit needed
+        """
+        while self._moved:
+            (filepath, (mtime, status, inode, size,
+                        track_id)) = self._moved.popleft()
+            debug("Moving file: %s" % filepath)
+            old_filepath = Lp().tracks.get_path(track_id)
+            Lp().tracks.set_path(track_id, filepath)
+            album_id = Lp().tracks.get_album_id(track_id)
+            self.move_album(album_id, os.path.dirname(old_filepath),
+                            os.path.dirname(filepath))
+
+    def _identify(self, unidentified, deleted):
+        """
+            Store identity of tracks scanned before identities were
+            stored, so their moves can be detected
+            @param unidentified as {filepath as string: track id as int}
+            @param deleted as set of deleted filepaths
+            @thread safe
+        """
+        identities = []
+        for (filepath, track_id) in unidentified.items():
+            if self._thread is None:
+                return
+            if filepath in deleted:
+                continue
+            try:
+                stat = os.stat(filepath)
+                identities.append((stat.st_ino, stat.st_size, track_id))
+            except Exception as e:
+                print("CollectionScanner::_identify(): %s" % e)
+        with SqlCursor(Lp().db, True):
+            Lp().tracks.set_identities(identities)
+            self._writer.commit()
+
+    def _save_dirs(self, walker, paths):
+        """
+            Remember walked directories status and images for next scan
+            @param walker as ScanWalker
+            @param paths as [string], walked paths
+            @warning: commit needed
+        """
+        roots = tuple(os.path.join(path, '') for path in paths)
+        removed = [path for path in self._dirs.get_all().keys()
+                   if path not in walker.status and
+                   (path in paths or path.startswith(roots))]
+        self._dirs.remove(removed)
+        self._dirs.set([(path, mtime, count) for (path, (mtime, count))
+                        in walker.status.items()])
+        self._dirs.set_images(walker.images)
 
     def _update_progress(self, current, total):
         """
@@ -134,86 +336,185 @@ class CollectionScanner(GObject.GObject, ScannerTagReader):
         Lp().settings.set_value('db-mtime', GLib.Variant('i', int(time())))
         self.stop()
         self.emit("scan-finished")
-        if self._missing_codecs is not None:
+        if self._missing_codecs is not None and Lp().player is not None:
             Lp().player.load_external(
                                     GLib.filename_to_uri(self._missing_codecs))
             Lp().player.play_first_external()
 
-    def _scan(self, paths):
+    def _scan(self, paths, full):
         """
             Scan music collection for music files
             @param paths as [string], paths to scan
+            @param full as bool, stat files of unchanged directories
             @thread safe
         """
-        self._new_albums = []
         mtimes = Lp().tracks.get_mtimes()
-        orig_tracks = Lp().tracks.get_paths()
-        is_empty = len(orig_tracks) == 0
+        plan = ScanPlan(mtimes, False)
+        walker = self._get_walker(mtimes, full)
+        self._quarantined = self._quarantine.get_all()
+        (identities, unidentified) = self._get_identities()
+        files = self._classify(plan, walker.walk(paths), self._quarantined,
+                               identities)
+        if self._process(plan, walker, paths, files):
+            self._identify(unidentified, plan.delete)
+            GLib.idle_add(self._finish)
 
-        # Add monitors on dirs
-        (new_tracks, new_dirs, count) = self._get_objects_for_paths(paths)
-        if self._inotify is not None:
-            for d in new_dirs:
-                self._inotify.add_monitor(d)
+    def _scan_paths(self, paths):
+        """
+            Scan files and directories at paths
+            @param paths as [string]
+            @thread safe
+        """
+        mtimes = {}
+        for path in paths:
+            mtimes.update(Lp().tracks.get_mtimes_for_path(path))
+        plan = ScanPlan(mtimes)
+        dirs = []
+        found = []
+        for path in paths:
+            try:
+                if os.path.isdir(path):
+                    dirs.append(path)
+                elif os.path.exists(path):
+                    found.append((path, int(os.path.getmtime(path))))
+            except Exception as e:
+                print("CollectionScanner::_scan_paths(): %s" % e)
+        walker = ScanWalker()
+        self._quarantined = self._quarantine.get_all()
+        (identities, unidentified) = self._get_identities()
+        files = self._classify(plan, chain(found, walker.walk(dirs)),
+                               self._quarantined, identities)
+        if self._process(plan, walker, paths, files):
+            GLib.idle_add(self._finish)
+
+    def _process(self, plan, walker, paths, files):
+        """
+            Apply plan to database, stages are streamed:
+                - walk and classify in pool feeder thread
+                - read tags in pool workers
+                - write in this thread
+            Queues between stages are bounded
+            @param plan as ScanPlan
+            @param walker as ScanWalker
+            @param paths as [string], walked paths
+            @param files as generator, see _classify()
+            @return False if cancelled
+            @thread safe
+        """
+        # {album id: [track count, duration]}
+        self._new_albums = {}
+        # {album id: True if an embedded image was saved}
+        self._covers = {}
+        # Snapshot before albums get deleted by updates
+        if Lp().tracks.is_empty():
+            album_stats = {}
+        else:
+            album_stats = Lp().albums.get_stats()
+        known = Lp().tracks.count()
+        batch_size = Lp().settings.get_value('scan-batch-size').get_int32()
+        self._writer = ScanWriter(self, batch_size)
+        self._moved = deque()
+        self.init_cache()
 
-        with SqlCursor(Lp().db) as sql:
-            i = 0
-            for filepath in new_tracks:
-                if self._thread is None:
-                    return
-                GLib.idle_add(self._update_progress, i, count)
-                try:
-                    mtime = int(os.path.getmtime(filepath))
-                    if filepath not in orig_tracks:
-                        try:
-                            debug("Adding file: %s" % filepath)
-                            infos = self.get_infos(filepath)
-                            self._add2db(filepath, mtime, infos)
-                        except Exception as e:
-                            debug("Error scanning: %s, %s" % (filepath, e))
-                            string = "%s" % e
-                            if string.startswith('gst-core-error-quark'):
-                                self._missing_codecs = filepath
+        # Writer connection is taken for each file and each batch, so
+        # user database mutations are not delayed by the whole scan
+        i = 0
+        for (filepath, (mtime, status, inode, size, track_id),
+             infos, error) in self._pool.discover(self._split_moves(files)):
+            if self._thread is None:
+                self._pool.cancel()
+                # Keep tracks matching already committed albums and artists
+                self._writer.flush()
+                return False
+            i += 1
+            # Total is unknown until walk is done, estimate it
+            summary = plan.get_summary()
+            self._throttle.progress(i + summary['unchanged'] + summary['move'],
+                                    max(known, plan.count()))
+            self._throttle.wait()
+            with SqlCursor(Lp().db, True):
+                self._apply_moves()
+                if error is not None or infos is None:
+                    # Retry this directory on next scan
+                    walker.invalidate(os.path.dirname(filepath))
+                    if error is None:
+                        print("Can't get infos for ", filepath)
                     else:
+                        debug("Error scanning: %s, %s" % (filepath, error))
+                        string = "%s" % error
+                        if string.startswith('gst-core-error-quark'):
+                            self._missing_codecs = filepath
+                        elif not self._is_transient(error):
+                            self._quarantine.add(filepath, size, mtime,
+                                                 string)
+                else:
+                    try:
+                        debug("Adding file: %s" % filepath)
                         # Update tags by removing song and readd it
-                        if mtime != mtimes[filepath]:
-                            debug("Adding file: %s" % filepath)
-                            infos = self.get_infos(filepath)
-                            if infos is not None:
-                                self._add2db(filepath, mtime, infos)
-                            else:
-                                print("Can't get infos for ", filepath)
-                        else:
-                            orig_tracks.remove(filepath)
-
-                except Exception as e:
-                    print(ascii(filepath))
-                    print("CollectionScanner::_scan(): %s" % e)
-                i += 1
+                        if status == ScanPlan.UPDATE:
+                            old_id = Lp().tracks.get_id_by_path(filepath)
+                            if old_id is not None:
+                                self._writer.defer(self._del_from_db, old_id)
+                        self._add2db(filepath, mtime, inode, size, infos)
+                        if filepath in self._quarantined:
+                            self._quarantine.remove([filepath])
+                    except Exception as e:
+                        walker.invalidate(os.path.dirname(filepath))
+                        print(ascii(filepath))
+                        print("CollectionScanner::_process(): %s" % e)
+                # Albums, artists and genres added for file, batch tracks
+                # are committed by ScanWriter
+                self._writer.commit()
+        with SqlCursor(Lp().db, True):
+            self._apply_moves()
+            self._writer.flush()
+            if self._thread is None:
+                return False
+            debug("CollectionScanner::_process(): %s" % self._writer)
 
             # Restore stats for new albums
-            if not is_empty:
-                for album_id in self._new_albums:
-                    duration = Lp().albums.get_duration(album_id, None)
-                    count = Lp().albums.get_count(album_id, None)
-                    value = Lp().albums.get_stats(duration, count)
-                    if value is not None:
-                        Lp().albums.set_popularity(album_id, value[0])
-                        Lp().albums.set_mtime(album_id, value[1])
+            for (album_id, (count, duration)) in self._new_albums.items():
+                value = album_stats.get((count, duration))
+                if value is not None:
+                    Lp().albums.set_popularity(album_id, value[0])
+                    Lp().albums.set_mtime(album_id, value[1])
 
             # Clean deleted files
-            for filepath in orig_tracks:
-                track_id = Lp().tracks.get_id_by_path(filepath)
-                self._del_from_db(track_id)
+            if plan.delete:
+                self._del_paths_from_db(plan.delete)
+
+            self._save_dirs(walker, paths)
+            self._writer.commit()
+        if self._inotify is not None:
+            for d in walker.dirs:
+                self._inotify.add_monitor(d)
+        self._stats = {'plan': plan.get_summary(),
+                       'walk': walker.get_stats(),
+                       'tags': self._pool.get_stats(),
+                       'write': self._writer.get_stats()}
+        return True
 
-            sql.commit()
-        GLib.idle_add(self._finish)
+    def _is_transient(self, error):
+        """
+            True if error may go away while file is unchanged, like I/O
+            or permission errors: file must not be quarantined
+            @param error as Exception
+            @return bool
+        """
+        # Already retried by TagReaderPool
+        if isinstance(error, TimeoutError):
+            return False
+        elif isinstance(error, OSError):
+            return True
+        return ("%s" % error).startswith('gst-resource-error-quark')
 
-    def _add2db(self, filepath, mtime, infos):
+    def _add2db(self, filepath, mtime, inode, size, infos):
         """
             Add new file to db with informations
             @param filepath as string
             @param file modification time as int
+            @param inode as int
+            @param size as int
             @param infos as GstPbutils.DiscovererInfo
             @return track id as int
         """
@@ -247,10 +548,27 @@ class CollectionScanner(GObject.GObject, ScannerTagReader):
                                          no_album_artist, year, filepath, 0,
                                          mtime)
         if new:
-            self._new_albums.append(album_id)
+            self._new_albums[album_id] = [0, 0]
+        if album_id in self._new_albums:
+            self._new_albums[album_id][0] += 1
+            self._new_albums[album_id][1] += duration
+        # Needs all album tracks, run it once per batch when in db
+        if no_album_artist:
+            self._writer.defer_once(album_id, self.set_compilation_artist,
+                                    album_id, album_artist_id)
 
         (genre_ids, new_genre_ids) = self.add_genres(genres, album_id)
 
+        # Save embedded cover, a later track may have one if first has not.
+        # Only new albums get the "no image" marker, an unchanged track of
+        # a known album may hold the cached image
+        if not self._covers.get(album_id, False):
+            data = self.get_image(tags)
+            if data is not None or (album_id in self._new_albums and
+                                    album_id not in self._covers):
+                Lp().art.save_embedded_artwork(album_id, data)
+            self._covers[album_id] = data is not None
+
         # Restore stats
         value = Lp().tracks.get_stats(filepath, duration)
         if value is None:
@@ -260,21 +578,57 @@ class CollectionScanner(GObject.GObject, ScannerTagReader):
             popularity = value[0]
             ltime = value[1]
         # Add track to db
-        track_id = Lp().tracks.add(title, filepath, duration,
-                                   tracknumber, discnumber,
-                                   album_id, year, popularity, ltime, mtime)
-        self.update_track(track_id, artist_ids, genre_ids)
-
-        # Notify about new artists/genres
-        if new_genre_ids or new_artist_ids:
-            with SqlCursor(Lp().db) as sql:
-                sql.commit()
-            for genre_id in new_genre_ids:
-                GLib.idle_add(self.emit, 'genre-update', genre_id)
-            for artist_id in new_artist_ids:
-                GLib.idle_add(self.emit, 'artist-update', artist_id, album_id)
+        track_id = self._writer.add(title, filepath, duration,
+                                    tracknumber, discnumber,
+                                    album_id, year, popularity, ltime, mtime,
+                                    inode, size, artist_ids, genre_ids)
+
+        # Notify about new artists/genres once committed
+        for genre_id in new_genre_ids:
+            self._writer.emit('genre-update', genre_id)
+        for artist_id in new_artist_ids:
+            self._writer.emit('artist-update', artist_id, album_id)
         return track_id
 
+    def _del_paths_from_db(self, filepaths):
+        """
+            Delete tracks at filepaths from db, then orphaned albums,
+            artists and genres
+            @param filepaths as [string]
+            @warning: commit needed
+        """
+        album_ids = Lp().tracks.remove_paths(filepaths)
+        modified = Lp().albums.clean_many(album_ids)
+        for album_id in modified:
+            self.forget_album(album_id)
+        self._remove_embedded(modified)
+        for artist_id in Lp().artists.clean_all():
+            self.forget_artist(artist_id)
+        for genre_id in Lp().genres.clean_all():
+            self.forget_genre(genre_id)
+        if modified:
+            GLib.idle_add(self._emit_albums_modified, modified)
+
+    def _remove_embedded(self, album_ids):
+        """
+            Remove embedded images saved for deleted albums, album ids may
+            be reused by new albums
+            @param album ids as [int]
+        """
+        existing = Lp().albums.get_many(list(album_ids))
+        for album_id in album_ids:
+            if album_id not in existing:
+                Lp().art.remove_embedded_artwork(album_id)
+                self._covers.pop(album_id, None)
+
+    def _emit_albums_modified(self, album_ids):
+        """
+            Emit album-modified for albums
+            @param album ids as [int]
+        """
+        for album_id in album_ids:
+            self.emit('album-modified', album_id)
+
     def _del_from_db(self, track_id):
         """
             Delete track from db
@@ -288,8 +642,12 @@ class CollectionScanner(GObject.GObject, ScannerTagReader):
         Lp().tracks.clean(track_id)
         modified = Lp().albums.clean(album_id)
         if modified:
+            self.forget_album(album_id)
+            self._remove_embedded([album_id])
             GLib.idle_add(self.emit, 'album-modified', album_id)
         for artist_id in [album_artist_id] + artist_ids:
-            Lp().artists.clean(artist_id)
+            if Lp().artists.clean(artist_id):
+                self.forget_artist(artist_id)
         for genre_id in genre_ids:
-            Lp().genres.clean(genre_id)
+            if Lp().genres.clean(genre_id):
+                self.forget_genre(genre_id)
@@ -17,6 +17,7 @@ from gi.repository import GLib
 from lollypop.define import Lp
 from lollypop.database_upgrade import DatabaseUpgrade
 from lollypop.sqlcursor import SqlCursor
+from lollypop.sqlwriter import SqlWriter
 
 
 class Database:
@@ -25,6 +26,11 @@ class Database:
     """
     LOCAL_PATH = os.path.expanduser("~") + "/.local/share/lollypop"
     DB_PATH = "%s/lollypop.db" % LOCAL_PATH
+    # Connection settings, journal mode is persistent
+    PRAGMAS = ["PRAGMA journal_mode = WAL",
+               "PRAGMA synchronous = NORMAL",
+               "PRAGMA temp_store = MEMORY",
+               "PRAGMA cache_size = -8000"]
 
     # SQLite documentation:
     # In SQLite, a column with type INTEGER PRIMARY KEY
@@ -57,20 +63,117 @@ class Database:
                         year INT,
                         popularity INT NOT NULL,
                         ltime INT,
-                        mtime INT)'''
+                        mtime INT,
+                        inode INT,
+                        size INT)'''
     create_track_artists = '''CREATE TABLE track_artists (
                                                 track_id INT NOT NULL,
                                                 artist_id INT NOT NULL)'''
     create_track_genres = '''CREATE TABLE track_genres (
                                                 track_id INT NOT NULL,
                                                 genre_id INT NOT NULL)'''
+    create_dirs = '''CREATE TABLE dirs (path TEXT PRIMARY KEY NOT NULL,
+                                        mtime INT NOT NULL,
+                                        count INT NOT NULL)'''
+    create_quarantine = '''CREATE TABLE quarantine (
+                                            path TEXT PRIMARY KEY NOT NULL,
+                                            size INT NOT NULL,
+                                            mtime INT NOT NULL,
+                                            reason TEXT)'''
+    create_images = '''CREATE TABLE images (path TEXT NOT NULL,
+                                            name TEXT NOT NULL,
+                                            size INT NOT NULL,
+                                            mtime INT NOT NULL,
+                                            PRIMARY KEY (path, name))'''
+    # Lookups by path, name and foreign keys
+    create_indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_tracks_filepath ON tracks(filepath)",
+        "CREATE INDEX IF NOT EXISTS idx_tracks_album_id\
+                            ON tracks(album_id, discnumber, tracknumber)",
+        "CREATE INDEX IF NOT EXISTS idx_tracks_name\
+                                    ON tracks(name COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_tracks_duration ON tracks(duration)",
+        "CREATE INDEX IF NOT EXISTS idx_albums_name\
+                                    ON albums(name, artist_id)",
+        "CREATE INDEX IF NOT EXISTS idx_albums_artist_id\
+                                    ON albums(artist_id, year)",
+        "CREATE INDEX IF NOT EXISTS idx_albums_path ON albums(path)",
+        "CREATE INDEX IF NOT EXISTS idx_artists_name ON artists(name)",
+        "CREATE INDEX IF NOT EXISTS idx_genres_name ON genres(name)",
+        "CREATE INDEX IF NOT EXISTS idx_album_genres_album_id\
+                                    ON album_genres(album_id, genre_id)",
+        "CREATE INDEX IF NOT EXISTS idx_album_genres_genre_id\
+                                    ON album_genres(genre_id, album_id)",
+        "CREATE INDEX IF NOT EXISTS idx_track_artists_track_id\
+                                    ON track_artists(track_id, artist_id)",
+        "CREATE INDEX IF NOT EXISTS idx_track_artists_artist_id\
+                                    ON track_artists(artist_id, track_id)",
+        "CREATE INDEX IF NOT EXISTS idx_track_genres_track_id\
+                                    ON track_genres(track_id, genre_id)",
+        "CREATE INDEX IF NOT EXISTS idx_track_genres_genre_id\
+                                    ON track_genres(genre_id, track_id)"]
+    # Full text search on names, sqlite may lack FTS5 support
+    create_fts = [
+        "CREATE VIRTUAL TABLE tracks_fts USING fts5(name, content='tracks')",
+        "CREATE TRIGGER tracks_fts_insert AFTER INSERT ON tracks BEGIN\
+            INSERT INTO tracks_fts (rowid, name)\
+            VALUES (new.rowid, new.name);\
+         END",
+        "CREATE TRIGGER tracks_fts_delete AFTER DELETE ON tracks BEGIN\
+            INSERT INTO tracks_fts (tracks_fts, rowid, name)\
+            VALUES ('delete', old.rowid, old.name);\
+         END",
+        "CREATE TRIGGER tracks_fts_update AFTER UPDATE OF name ON tracks\
+         BEGIN\
+            INSERT INTO tracks_fts (tracks_fts, rowid, name)\
+            VALUES ('delete', old.rowid, old.name);\
+            INSERT INTO tracks_fts (rowid, name)\
+            VALUES (new.rowid, new.name);\
+         END",
+        "INSERT INTO tracks_fts (tracks_fts) VALUES ('rebuild')",
+        "CREATE VIRTUAL TABLE albums_fts USING fts5(name, content='albums')",
+        "CREATE TRIGGER albums_fts_insert AFTER INSERT ON albums BEGIN\
+            INSERT INTO albums_fts (rowid, name)\
+            VALUES (new.rowid, new.name);\
+         END",
+        "CREATE TRIGGER albums_fts_delete AFTER DELETE ON albums BEGIN\
+            INSERT INTO albums_fts (albums_fts, rowid, name)\
+            VALUES ('delete', old.rowid, old.name);\
+         END",
+        "CREATE TRIGGER albums_fts_update AFTER UPDATE OF name ON albums\
+         BEGIN\
+            INSERT INTO albums_fts (albums_fts, rowid, name)\
+            VALUES ('delete', old.rowid, old.name);\
+            INSERT INTO albums_fts (rowid, name)\
+            VALUES (new.rowid, new.name);\
+         END",
+        "INSERT INTO albums_fts (albums_fts) VALUES ('rebuild')",
+        "CREATE VIRTUAL TABLE artists_fts USING fts5(name, content='artists')",
+        "CREATE TRIGGER artists_fts_insert AFTER INSERT ON artists BEGIN\
+            INSERT INTO artists_fts (rowid, name)\
+            VALUES (new.rowid, new.name);\
+         END",
+        "CREATE TRIGGER artists_fts_delete AFTER DELETE ON artists BEGIN\
+            INSERT INTO artists_fts (artists_fts, rowid, name)\
+            VALUES ('delete', old.rowid, old.name);\
+         END",
+        "CREATE TRIGGER artists_fts_update AFTER UPDATE OF name ON artists\
+         BEGIN\
+            INSERT INTO artists_fts (artists_fts, rowid, name)\
+            VALUES ('delete', old.rowid, old.name);\
+            INSERT INTO artists_fts (rowid, name)\
+            VALUES (new.rowid, new.name);\
+         END",
+        "INSERT INTO artists_fts (artists_fts) VALUES ('rebuild')"]
 
     def __init__(self):
         """
             Create database tables or manage update if needed
         """
+        # Mutations from user actions go through writer
+        self.writer = SqlWriter(self)
         if os.path.exists(self.DB_PATH):
-            with SqlCursor(self) as sql:
+            with SqlCursor(self, True):
                 db_version = Lp().settings.get_value('db-version').get_int32()
                 upgrade = DatabaseUpgrade(db_version, self)
                 upgrade.do_db_upgrade()
@@ -80,24 +183,72 @@ class Database:
             try:
                 if not os.path.exists(self.LOCAL_PATH):
                     os.mkdir(self.LOCAL_PATH)
-                # Create db schema
-                with SqlCursor(self) as sql:
-                    sql.execute(self.create_albums)
-                    sql.execute(self.create_artists)
-                    sql.execute(self.create_genres)
-                    sql.execute(self.create_album_genres)
-                    sql.execute(self.create_tracks)
-                    sql.execute(self.create_track_artists)
-                    sql.execute(self.create_track_genres)
-                    sql.commit()
+                self.writer.write(self._create_tables).result()
             except:
                 print("Database::__init__(): %s" % self.LOCAL_PATH)
+        with SqlCursor(self) as sql:
+            self.fts = self._has_fts(sql)
+
+    def create_fts_tables(self, sql):
+        """
+            Create full text search tables and fill them
+            @param sql as sqlite cursor
+        """
+        try:
+            sql.execute("SAVEPOINT fts")
+            for request in self.create_fts:
+                sql.execute(request)
+            sql.execute("RELEASE fts")
+        except Exception as e:
+            sql.execute("ROLLBACK TO fts")
+            sql.execute("RELEASE fts")
+            print("Database::create_fts_tables(): %s" % e)
 
     def get_cursor(self):
         """
-            Return a new sqlite cursor
+            Return a new sqlite cursor, usable from any thread.
+            WAL journal lets readers run while scanner writes
         """
         try:
-            return sqlite3.connect(self.DB_PATH, 600.0)
+            sql = sqlite3.connect(self.DB_PATH, 600.0,
+                                  check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                sql.execute(pragma)
+            return sql
         except:
             exit(-1)
+
+#######################
+# PRIVATE             #
+#######################
+    def _create_tables(self):
+        """
+            Create db schema
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            sql.execute(self.create_albums)
+            sql.execute(self.create_artists)
+            sql.execute(self.create_genres)
+            sql.execute(self.create_album_genres)
+            sql.execute(self.create_tracks)
+            sql.execute(self.create_track_artists)
+            sql.execute(self.create_track_genres)
+            sql.execute(self.create_dirs)
+            sql.execute(self.create_quarantine)
+            sql.execute(self.create_images)
+            for index in self.create_indexes:
+                sql.execute(index)
+            self.create_fts_tables(sql)
+
+    def _has_fts(self, sql):
+        """
+            True if full text search tables are usable
+            @param sql as sqlite cursor
+            @return bool
+        """
+        try:
+            sql.execute("SELECT rowid FROM tracks_fts LIMIT 0")
+            return True
+        except:
+            return False
@@ -16,12 +16,15 @@ import itertools
 
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type
+from lollypop.utils import get_fts_match
 
 
 class AlbumsDatabase:
     """
         Albums database helper
     """
+    # Max ids by query, SQLite allows 999 parameters
+    MAX_IDS = 500
 
     def __init__(self):
         """
@@ -107,21 +110,16 @@ class AlbumsDatabase:
             sql.execute("UPDATE albums set mtime=? WHERE rowid=?",
                         (mtime, album_id))
 
-    def set_popularity(self, album_id, popularity, commit=False):
+    def set_popularity(self, album_id, popularity):
         """
             Set popularity
             @param album_id as int
             @param popularity as int
-            @param commit as bool
+            @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
-            try:
-                sql.execute("UPDATE albums set popularity=? WHERE rowid=?",
-                            (popularity, album_id))
-                if commit:
-                    sql.commit()
-            except:  # Database is locked
-                pass
+            sql.execute("UPDATE albums set popularity=? WHERE rowid=?",
+                        (popularity, album_id))
 
     def get_popularity(self, album_id):
         """
@@ -142,7 +140,7 @@ class AlbumsDatabase:
         """
             Increment popularity field for album id
             @param int
-            @raise sqlite3.OperationalError on db update
+            @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT popularity from albums WHERE rowid=?",
@@ -155,7 +153,6 @@ class AlbumsDatabase:
             current += 1
             sql.execute("UPDATE albums set popularity=? WHERE rowid=?",
                         (current, album_id))
-            sql.commit()
 
     def get_avg_popularity(self):
         """
@@ -243,6 +240,26 @@ class AlbumsDatabase:
                 return v[0]
             return None
 
+    def get_all(self):
+        """
+            Get all albums
+            @return [(id as int, name as string, artist id as int,
+                      year as int, no_album_artist as bool, path as string)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT rowid, name, artist_id, year,\
+                                  no_album_artist, path FROM albums")
+            return list(result)
+
+    def get_all_genre_ids(self):
+        """
+            Get genre ids for all albums
+            @return [(album id as int, genre id as int)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT album_id, genre_id FROM album_genres")
+            return list(result)
+
     def get_genre_ids(self, album_id):
         """
             Get genre ids
@@ -254,6 +271,33 @@ class AlbumsDatabase:
                                   WHERE album_id=?", (album_id,))
             return list(itertools.chain(*result))
 
+    def get_many(self, album_ids):
+        """
+            Get album fields for many album ids, in one query by
+            MAX_IDS albums
+            @param album ids as [int]
+            @return {album id: (name, artist name, artist id, year)}
+        """
+        items = {}
+        ids = list(set(album_ids))
+        with SqlCursor(Lp().db) as sql:
+            for i in range(0, len(ids), self.MAX_IDS):
+                chunk = ids[i:i + self.MAX_IDS]
+                result = sql.execute(
+                    "SELECT albums.rowid, albums.name, artists.name,\
+                     albums.artist_id, albums.year\
+                     FROM albums LEFT JOIN artists\
+                     ON albums.artist_id=artists.rowid\
+                     WHERE albums.rowid IN (%s)" %
+                    ", ".join(["?"] * len(chunk)), chunk)
+                for (album_id, name, artist_name,
+                     artist_id, year) in result:
+                    items[album_id] = (name,
+                                       artist_name or _("Compilation"),
+                                       artist_id,
+                                       str(year) if year else "")
+        return items
+
     def get_name(self, album_id):
         """
             Get album name for album id
@@ -332,9 +376,7 @@ class AlbumsDatabase:
                     filepath = Lp().tracks.get_path(tracks[0])
                     path = os.path.dirname(filepath)
                     if os.path.exists(path):
-                        sql.execute("UPDATE albums SET path=? "
-                                    "WHERE rowid=?", (path, album_id))
-                        sql.commit()
+                        Lp().db.writer.write(self.set_path, album_id, path)
             return path
 
     def get_path_count(self, path):
@@ -658,14 +700,24 @@ class AlbumsDatabase:
 
     def search(self, string):
         """
-            Search for albums looking like string
+            Search for albums with words starting like string words,
+            best matches first
             @param string
             return: Array of (id as int, artist_id as int)
         """
+        match = get_fts_match(string)
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT rowid, artist_id FROM albums\
-                                  WHERE name LIKE ?\
-                                  LIMIT 25", ('%' + string + '%',))
+            if Lp().db.fts and match:
+                result = sql.execute("SELECT albums.rowid, albums.artist_id\
+                                      FROM albums_fts, albums\
+                                      WHERE albums_fts MATCH ?\
+                                      AND albums.rowid=albums_fts.rowid\
+                                      ORDER BY albums_fts.rank LIMIT 25",
+                                     (match,))
+            else:
+                result = sql.execute("SELECT rowid, artist_id FROM albums\
+                                      WHERE name LIKE ?\
+                                      LIMIT 25", ('%' + string + '%',))
             return list(result)
 
     def is_compilation(self, album_id):
@@ -698,36 +750,58 @@ class AlbumsDatabase:
                 return v[0]
             return 0
 
-    def get_stats(self, duration, count):
-        """
-            Get stats for album with same duration and track count
-            @param path as str
-            @param duration as int
-            @return (popularity, mtime) as (int, int)
-        """
-        with SqlCursor(Lp().db) as sql:
-            sql.execute("CREATE TEMP TABLE stats (album_id INT,\
-                                                  count INT,\
-                                                  duration INT)")
-            sql.execute("INSERT INTO stats (album_id, count, duration)\
-                            SELECT album_id,\
-                                   COUNT(1),\
-                                   SUM(tracks.duration)\
-                            FROM tracks GROUP BY album_id")
-            result = sql.execute("SELECT album_id\
-                                  FROM stats\
-                                  WHERE count=? and duration=?",
-                                 (count, duration))
-            v = result.fetchone()
-            ret = None
-            if v is not None:
-                result = sql.execute("SELECT popularity, mtime\
-                                      FROM albums\
-                                      WHERE rowid=?", (v[0],))
-                v = result.fetchone()
-                if v is not None:
-                    ret = v
-            return ret
+    def get_stats(self):
+        """
+            Get stats for all albums, keyed by track count and duration,
+            most popular album wins on collision
+            @return {(count as int, duration as int):
+                     (popularity as int, mtime as int)}
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT COUNT(1), SUM(tracks.duration),\
+                                  albums.popularity, albums.mtime\
+                                  FROM tracks, albums\
+                                  WHERE tracks.album_id=albums.rowid\
+                                  GROUP BY tracks.album_id\
+                                  ORDER BY albums.popularity")
+            return dict(((row[0], row[1]), (row[2], row[3]))
+                        for row in result)
+
+    def clean_many(self, album_ids):
+        """
+            Clean database for album ids, see clean()
+            @param album ids as [int]
+            @return album ids deleted or with genres modified as set
+            @warning commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS cleaned_albums\
+                         (album_id INT PRIMARY KEY)")
+            sql.execute("DELETE FROM cleaned_albums")
+            sql.executemany("INSERT OR IGNORE INTO cleaned_albums (album_id)\
+                             VALUES (?)", [(album_id,)
+                                           for album_id in album_ids])
+            # Genres without tracks in album
+            orphans = "FROM album_genres\
+                       WHERE album_id IN (SELECT album_id FROM cleaned_albums)\
+                       AND NOT EXISTS (SELECT 1 FROM tracks, track_genres\
+                                      WHERE tracks.album_id=\
+                                            album_genres.album_id\
+                                      AND track_genres.track_id=tracks.rowid\
+                                      AND track_genres.genre_id=\
+                                          album_genres.genre_id)"
+            result = sql.execute("SELECT DISTINCT album_id " + orphans)
+            modified = set(row[0] for row in result)
+            sql.execute("DELETE " + orphans)
+            # Albums without tracks
+            orphans = "FROM albums\
+                       WHERE rowid IN (SELECT album_id FROM cleaned_albums)\
+                       AND rowid NOT IN (SELECT album_id FROM tracks)"
+            result = sql.execute("SELECT rowid " + orphans)
+            modified |= set(row[0] for row in result)
+            sql.execute("DELETE " + orphans)
+            sql.execute("DELETE FROM cleaned_albums")
+            return modified
 
     def clean(self, album_id):
         """
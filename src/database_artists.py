@@ -15,7 +15,7 @@ import itertools
 
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type
-from lollypop.utils import format_artist_name
+from lollypop.utils import format_artist_name, get_fts_match
 
 
 class ArtistsDatabase:
@@ -86,6 +86,15 @@ class ArtistsDatabase:
                 return v[0]
             return None
 
+    def get_all(self):
+        """
+            Get all artists
+            @return [(id as int, name as string, sortname as string)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT rowid, name, sortname FROM artists")
+            return list(result)
+
     def get_name(self, artist_id):
         """
             Get artist name
@@ -174,14 +183,21 @@ class ArtistsDatabase:
 
     def search(self, string):
         """
-            Search for artists looking like string
+            Search for artists with words starting like string words,
+            best matches first
             @param string
             @return Array of id as int
         """
+        match = get_fts_match(string)
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT rowid FROM artists\
-                                  WHERE name LIKE ?\
-                                  LIMIT 25", ('%' + string + '%',))
+            if Lp().db.fts and match:
+                result = sql.execute("SELECT rowid FROM artists_fts\
+                                      WHERE artists_fts MATCH ?\
+                                      ORDER BY rank LIMIT 25", (match,))
+            else:
+                result = sql.execute("SELECT rowid FROM artists\
+                                      WHERE name LIKE ?\
+                                      LIMIT 25", ('%' + string + '%',))
             return list(itertools.chain(*result))
 
     def count(self):
@@ -196,10 +212,26 @@ class ArtistsDatabase:
                 return v[0]
             return 0
 
+    def clean_all(self):
+        """
+            Remove artists without albums and tracks
+            @return deleted artist ids as set
+            @warning commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            orphans = "FROM artists\
+                       WHERE rowid NOT IN (SELECT artist_id FROM albums)\
+                       AND rowid NOT IN (SELECT artist_id FROM track_artists)"
+            result = sql.execute("SELECT rowid " + orphans)
+            artist_ids = set(row[0] for row in result)
+            sql.execute("DELETE " + orphans)
+            return artist_ids
+
     def clean(self, artist_id):
         """
             Clean database for artist id
             @param artist id as int
+            @return True if artist deleted
             @warning commit needed
         """
         with SqlCursor(Lp().db) as sql:
@@ -217,3 +249,5 @@ class ArtistsDatabase:
                 if not v:
                     sql.execute("DELETE FROM artists WHERE rowid=?",
                                 (artist_id,))
+                    return True
+            return False
@@ -0,0 +1,90 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from lollypop.sqlcursor import SqlCursor
+from lollypop.define import Lp
+
+
+class DirsDatabase:
+    """
+        Scanned directories, used to skip unchanged directories,
+        and images they contain, used to find album artwork
+    """
+
+    def __init__(self):
+        """
+            Init dirs database object
+        """
+        pass
+
+    def get_all(self):
+        """
+            Return scanned directories
+            @return {path as string: (mtime as int, count as int)}
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT path, mtime, count FROM dirs")
+            return dict((row[0], (row[1], row[2])) for row in result)
+
+    def set(self, dirs):
+        """
+            Set directories status
+            @param dirs as [(path as string, mtime as int, count as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT OR REPLACE INTO dirs (path, mtime, count)\
+                             VALUES (?, ?, ?)", dirs)
+
+    def remove(self, paths):
+        """
+            Remove directories
+            @param paths as [string]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("DELETE FROM dirs WHERE path=?",
+                            [(path,) for path in paths])
+            sql.executemany("DELETE FROM images WHERE path=?",
+                            [(path,) for path in paths])
+
+    def get_images(self, path):
+        """
+            Return images found in directory by last scan
+            @param path as string
+            @return [(name as string, size as int, mtime as int)], sorted
+                    by name, None if directory was not scanned
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT 1 FROM dirs WHERE path=?", (path,))
+            if result.fetchone() is None:
+                return None
+            result = sql.execute("SELECT name, size, mtime FROM images\
+                                  WHERE path=? ORDER BY name", (path,))
+            return list(result)
+
+    def set_images(self, images):
+        """
+            Set images of directories, previous ones are removed
+            @param images as {path as string: [(name as string,
+                                                size as int,
+                                                mtime as int)]}
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("DELETE FROM images WHERE path=?",
+                            [(path,) for path in images.keys()])
+            sql.executemany("INSERT INTO images (path, name, size, mtime)\
+                             VALUES (?, ?, ?, ?)",
+                            [(path, name, size, mtime)
+                             for (path, items) in images.items()
+                             for (name, size, mtime) in items])
@@ -112,10 +112,25 @@ class GenresDatabase:
                                   ORDER BY name COLLATE NOCASE")
             return list(itertools.chain(*result))
 
+    def clean_all(self):
+        """
+            Remove genres without tracks
+            @return deleted genre ids as set
+            @warning commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            orphans = "FROM genres\
+                       WHERE rowid NOT IN (SELECT genre_id FROM track_genres)"
+            result = sql.execute("SELECT rowid " + orphans)
+            genre_ids = set(row[0] for row in result)
+            sql.execute("DELETE " + orphans)
+            return genre_ids
+
     def clean(self, genre_id):
         """
             Clean database for genre id
             @param genre id as int
+            @return True if genre deleted
             @warning commit needed
         """
         with SqlCursor(Lp().db) as sql:
@@ -125,3 +140,5 @@ class GenresDatabase:
             v = result.fetchone()
             if not v:
                 sql.execute("DELETE FROM genres WHERE rowid=?", (genre_id,))
+                return True
+            return False
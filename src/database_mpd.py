@@ -70,6 +70,64 @@ class MpdDatabase:
                                       album, artist_id, genre_id, year)
             return list(itertools.chain(*result))
 
+    def search_tracks_ids(self, anything, title, album, artist,
+                          genre_id, year):
+        """
+            Search tracks with names containing searched strings, case
+            insensitive like MPD clients expect, a None or empty filter is
+            ignored, all tracks are returned without filters
+            @param anything as str, title, album or artist
+            @param title as str
+            @param album as str
+            @param artist as str, track artist or album artist
+            @param genre id as int
+            @param year as int
+            @return track ids as [int]
+        """
+        where = []
+        params = []
+        for (string, fields) in [(anything, ["title", "album", "artist"]),
+                                 (title, ["title"]),
+                                 (album, ["album"]),
+                                 (artist, ["artist"])]:
+            if not string:
+                continue
+            clauses = []
+            if "title" in fields:
+                (request, param) = self._get_matching("tracks", string)
+                clauses.append("tracks.rowid IN (%s)" % request)
+                params.append(param)
+            if "album" in fields:
+                (request, param) = self._get_matching("albums", string)
+                clauses.append("tracks.album_id IN (%s)" % request)
+                params.append(param)
+            if "artist" in fields:
+                (request, param) = self._get_matching("artists", string)
+                clauses.append("tracks.rowid IN (SELECT track_id\
+                                FROM track_artists WHERE artist_id IN (%s))\
+                                OR tracks.album_id IN (SELECT rowid\
+                                FROM albums WHERE artist_id IN (%s))" %
+                               (request, request))
+                params += [param, param]
+            where.append("(%s)" % " OR ".join(clauses))
+        if genre_id is not None:
+            where.append("tracks.rowid IN (SELECT track_id\
+                          FROM track_genres WHERE genre_id=?)")
+            params.append(genre_id)
+        if year is None:
+            where.append("tracks.year is null")
+        elif year != Type.NONE:
+            where.append("tracks.year=?")
+            params.append(year)
+        request = "SELECT tracks.rowid FROM tracks "
+        if where:
+            request += "WHERE %s " % " AND ".join(where)
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute(request + "ORDER BY tracks.album_id,\
+                                            tracks.discnumber,\
+                                            tracks.tracknumber", params)
+            return list(itertools.chain(*result))
+
     def get_albums_names(self, artist_id, genre_id, year):
         """
             Get albums names
@@ -185,6 +243,17 @@ class MpdDatabase:
 #######################
 # PRIVATE             #
 #######################
+    def _get_matching(self, table, string):
+        """
+            Get request for table rowids with name containing string.
+            Full text search only matches word prefixes, not used here
+            @param table as str
+            @param string as str
+            @return (request as str, param as str)
+        """
+        return ("SELECT rowid FROM %s WHERE name LIKE ?" % table,
+                "%" + string + "%")
+
     def _get_tracks(self, sql, select_str, album, artist_id, genre_id, year):
         """
             Get tracks attributes
@@ -0,0 +1,88 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from lollypop.sqlcursor import SqlCursor
+from lollypop.define import Lp
+
+
+class QuarantineDatabase:
+    """
+        Files that failed to be scanned, skipped until they change
+    """
+
+    def __init__(self):
+        """
+            Init quarantine database object
+        """
+        pass
+
+    def get_all(self):
+        """
+            Return quarantined files
+            @return {path as string: (size as int, mtime as int)}
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT path, size, mtime FROM quarantine")
+            return dict((row[0], (row[1], row[2])) for row in result)
+
+    def get_reasons(self):
+        """
+            Return quarantined files with failure reason
+            @return [(path as string, reason as string)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT path, reason FROM quarantine\
+                                  ORDER BY path")
+            return list(result)
+
+    def add(self, path, size, mtime, reason):
+        """
+            Quarantine file
+            @param path as string
+            @param size as int
+            @param mtime as int
+            @param reason as string
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("INSERT OR REPLACE INTO quarantine\
+                         (path, size, mtime, reason) VALUES (?, ?, ?, ?)",
+                        (path, size, mtime, reason))
+
+    def remove(self, paths):
+        """
+            Remove files from quarantine
+            @param paths as [string]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("DELETE FROM quarantine WHERE path=?",
+                            [(path,) for path in paths])
+
+    def clear(self):
+        """
+            Remove all files from quarantine
+            @return Future
+            @thread safe
+        """
+        return Lp().db.writer.write(self._clear)
+
+#######################
+# PRIVATE             #
+#######################
+    def _clear(self):
+        """
+            Remove all files from quarantine
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("DELETE FROM quarantine")
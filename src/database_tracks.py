@@ -14,9 +14,11 @@ from gi.repository import GLib
 
 from gettext import gettext as _
 import itertools
+import os
 
 from lollypop.sqlcursor import SqlCursor
 from lollypop.define import Lp, Type
+from lollypop.utils import get_fts_match
 
 
 class TracksDatabase:
@@ -24,6 +26,8 @@ class TracksDatabase:
         All functions take a sqlite cursor as last parameter,
         set another one if you're in a thread
     """
+    # Max ids by query, SQLite allows 999 parameters
+    MAX_IDS = 500
 
     def __init__(self):
         """
@@ -93,6 +97,55 @@ class TracksDatabase:
                             "track_genres (track_id, genre_id)"
                             "VALUES (?, ?)", (track_id, genre_id))
 
+    def add_many(self, tracks):
+        """
+            Add tracks to database
+            @param tracks as [(id, name, filepath, duration, tracknumber,
+                               discnumber, album_id, year, popularity,
+                               ltime, mtime, inode, size)], see add()
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT INTO tracks (rowid, name, filepath,\
+                             duration, tracknumber, discnumber, album_id,\
+                             year, popularity, ltime, mtime, inode, size)\
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            tracks)
+
+    def add_artists(self, track_artists):
+        """
+            Add artists to new tracks, no duplicate check
+            @param track_artists as [(track id as int, artist id as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT INTO "
+                            "track_artists (track_id, artist_id)"
+                            "VALUES (?, ?)", track_artists)
+
+    def add_genres(self, track_genres):
+        """
+            Add genres to new tracks, no duplicate check
+            @param track_genres as [(track id as int, genre id as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("INSERT INTO "
+                            "track_genres (track_id, genre_id)"
+                            "VALUES (?, ?)", track_genres)
+
+    def get_max_id(self):
+        """
+            Return greatest track id
+            @return int, 0 if no tracks
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT MAX(rowid) FROM tracks")
+            v = result.fetchone()
+            if v is not None and v[0] is not None:
+                return v[0]
+            return 0
+
     def get_ids(self):
         """
             Return all tracks id
@@ -157,6 +210,70 @@ class TracksDatabase:
                 return v[0]
             return None
 
+    def get_many(self, track_ids):
+        """
+            Get track fields for many track ids, in one query by
+            MAX_IDS tracks
+            @param track ids as [int]
+            @return {track id: (name, album id, album artist id,
+                                artist ids, album name, artist names,
+                                genre names, duration, tracknumber, path,
+                                album artist name)}
+        """
+        items = {}
+        ids = list(set(track_ids))
+        with SqlCursor(Lp().db) as sql:
+            for i in range(0, len(ids), self.MAX_IDS):
+                chunk = ids[i:i + self.MAX_IDS]
+                result = sql.execute(
+                    "SELECT tracks.rowid, tracks.name, tracks.album_id,\
+                     albums.artist_id,\
+                     (SELECT GROUP_CONCAT(artist_id) FROM track_artists\
+                      WHERE track_id=tracks.rowid),\
+                     albums.name,\
+                     (SELECT GROUP_CONCAT(name, ', ')\
+                      FROM artists, track_artists\
+                      WHERE track_artists.track_id=tracks.rowid\
+                      AND track_artists.artist_id=artists.rowid),\
+                     (SELECT GROUP_CONCAT(name, ', ')\
+                      FROM genres, track_genres\
+                      WHERE track_genres.track_id=tracks.rowid\
+                      AND track_genres.genre_id=genres.rowid),\
+                     tracks.duration, tracks.tracknumber, tracks.filepath,\
+                     album_artists.name\
+                     FROM tracks LEFT JOIN albums\
+                     ON tracks.album_id=albums.rowid\
+                     LEFT JOIN artists AS album_artists\
+                     ON albums.artist_id=album_artists.rowid\
+                     WHERE tracks.rowid IN (%s)" %
+                    ", ".join(["?"] * len(chunk)), chunk)
+                for (track_id, name, album_id, album_artist_id, artist_ids,
+                     album_name, artist_names, genre_names, duration,
+                     tracknumber, path, album_artist) in result:
+                    if album_artist_id is None:
+                        album_artist_id = Type.COMPILATIONS
+                    if album_artist_id == Type.COMPILATIONS:
+                        album_artist = _("Many artists")
+                    elif album_artist is None:
+                        album_artist = _("Unknown")
+                    if artist_ids:
+                        artist_ids = [int(artist_id) for artist_id in
+                                      artist_ids.split(",")]
+                    else:
+                        artist_ids = []
+                    items[track_id] = (name or "",
+                                       album_id,
+                                       album_artist_id,
+                                       artist_ids,
+                                       album_name or _("Unknown"),
+                                       artist_names or "",
+                                       genre_names or "",
+                                       duration,
+                                       tracknumber,
+                                       path or "",
+                                       album_artist)
+        return items
+
     def get_name(self, track_id):
         """
             Get track name for track id
@@ -292,6 +409,53 @@ class TracksDatabase:
                 mtimes.update((row,))
             return mtimes
 
+    def get_identities(self):
+        """
+            Get file identity for tracks
+            @return [(track id as int, filepath as string, mtime as int,
+                      inode as int/None, size as int/None)]
+        """
+        with SqlCursor(Lp().db) as sql:
+            result = sql.execute("SELECT rowid, filepath, mtime, inode, size\
+                                  FROM tracks")
+            return list(result)
+
+    def set_identities(self, identities):
+        """
+            Set file identity for tracks
+            @param identities as [(inode as int, size as int,
+                                   track id as int)]
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.executemany("UPDATE tracks SET inode=?, size=? WHERE rowid=?",
+                            identities)
+
+    def set_path(self, track_id, filepath):
+        """
+            Set track path
+            @param track id as int
+            @param filepath as string
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("UPDATE tracks SET filepath=? WHERE rowid=?",
+                        (filepath, track_id))
+
+    def get_mtimes_for_path(self, path):
+        """
+            Get mtime for track at path or tracks under path
+            @param path as string
+            @return dict of {filepath as string: mtime as int}
+        """
+        with SqlCursor(Lp().db) as sql:
+            prefix = os.path.join(path, '')
+            result = sql.execute("SELECT filepath, mtime FROM tracks\
+                                  WHERE filepath=?\
+                                  OR substr(filepath, 1, ?)=?",
+                                 (path, len(prefix), prefix))
+            return dict(result)
+
     def get_infos(self, track_id):
         """
             Get all track informations for track id
@@ -435,7 +599,7 @@ class TracksDatabase:
         """
             Increment popularity field
             @param track id as int
-            @raise sqlite3.OperationalError on db update
+            @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
             result = sql.execute("SELECT popularity from tracks WHERE rowid=?",
@@ -448,18 +612,16 @@ class TracksDatabase:
             current += 1
             sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
                         (current, track_id))
-            sql.commit()
 
     def set_listened_at(self, track_id, time):
         """
             Set ltime for track
             @param track id as int
             @param time as int
+            @return Future
+            @thread safe
         """
-        with SqlCursor(Lp().db) as sql:
-            sql.execute("UPDATE tracks set ltime=? WHERE rowid=?",
-                        (time, track_id))
-            sql.commit()
+        return Lp().db.writer.write(self.set_ltime, track_id, time)
 
     def get_never_listened_to(self):
         """
@@ -504,7 +666,7 @@ class TracksDatabase:
             sql.execute("UPDATE tracks set ltime=? WHERE rowid=?",
                         (ltime, track_id))
 
-    def set_popularity(self, track_id, popularity, commit=False):
+    def set_popularity(self, track_id, popularity):
         """
             Set popularity
             @param track id as int
@@ -512,13 +674,8 @@ class TracksDatabase:
             @warning: commit needed
         """
         with SqlCursor(Lp().db) as sql:
-            try:
-                sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
-                            (popularity, track_id))
-                if commit:
-                    sql.commit()
-            except:  # Database is locked
-                pass
+            sql.execute("UPDATE tracks set popularity=? WHERE rowid=?",
+                        (popularity, track_id))
 
     def get_popularity(self, track_id):
         """
@@ -561,14 +718,21 @@ class TracksDatabase:
 
     def search(self, searched):
         """
-            Search for tracks looking like searched
+            Search for tracks with words starting like searched words,
+            best matches first
             @param searched as string
             return: list of [id as int, name as string]
         """
+        match = get_fts_match(searched)
         with SqlCursor(Lp().db) as sql:
-            result = sql.execute("SELECT rowid, name FROM tracks\
-                                  WHERE name LIKE ? LIMIT 25",
-                                 ('%' + searched + '%',))
+            if Lp().db.fts and match:
+                result = sql.execute("SELECT rowid, name FROM tracks_fts\
+                                      WHERE tracks_fts MATCH ?\
+                                      ORDER BY rank LIMIT 25", (match,))
+            else:
+                result = sql.execute("SELECT rowid, name FROM tracks\
+                                      WHERE name LIKE ? LIMIT 25",
+                                     ('%' + searched + '%',))
             return list(result)
 
     def get_stats(self, path, duration):
@@ -610,6 +774,32 @@ class TracksDatabase:
                 return track_id
         return None
 
+    def remove_paths(self, filepaths):
+        """
+            Remove tracks at filepaths with their artists and genres
+            @param filepaths as [string]
+            @return album ids of removed tracks as set
+            @warning: commit needed
+        """
+        with SqlCursor(Lp().db) as sql:
+            sql.execute("CREATE TEMP TABLE IF NOT EXISTS removed_paths\
+                         (filepath TEXT PRIMARY KEY)")
+            sql.execute("DELETE FROM removed_paths")
+            sql.executemany("INSERT OR IGNORE INTO removed_paths (filepath)\
+                             VALUES (?)", [(path,) for path in filepaths])
+            result = sql.execute("SELECT DISTINCT album_id FROM tracks\
+                                  WHERE filepath IN\
+                                  (SELECT filepath FROM removed_paths)")
+            album_ids = set(row[0] for row in result)
+            sql.execute("DELETE FROM tracks WHERE filepath IN\
+                         (SELECT filepath FROM removed_paths)")
+            sql.execute("DELETE FROM track_artists WHERE track_id NOT IN\
+                         (SELECT rowid FROM tracks)")
+            sql.execute("DELETE FROM track_genres WHERE track_id NOT IN\
+                         (SELECT rowid FROM tracks)")
+            sql.execute("DELETE FROM removed_paths")
+            return album_ids
+
     def remove(self, track_id):
         """
             Remove track
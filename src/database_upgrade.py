@@ -32,7 +32,18 @@ class DatabaseUpgrade:
         self._UPGRADES = {
             1: "UPDATE tracks SET duration=CAST(duration as INTEGER);",
             2: "UPDATE albums SET artist_id=-2001 where artist_id=-999;",
-            3: self._upgrade_3
+            3: self._upgrade_3,
+            4: "CREATE TABLE dirs (path TEXT PRIMARY KEY NOT NULL,\
+                                   mtime INT NOT NULL,\
+                                   count INT NOT NULL)",
+            5: "CREATE TABLE quarantine (path TEXT PRIMARY KEY NOT NULL,\
+                                         size INT NOT NULL,\
+                                         mtime INT NOT NULL,\
+                                         reason TEXT)",
+            6: self._upgrade_6,
+            7: self._upgrade_7,
+            8: self._upgrade_8,
+            9: self._upgrade_9
                          }
 
     """
@@ -47,7 +58,7 @@ class DatabaseUpgrade:
         @return new db version as int
     """
     def do_db_upgrade(self):
-        with SqlCursor(self._db) as sql:
+        with SqlCursor(self._db, True) as sql:
             for i in range(self._version+1, len(self._UPGRADES)+1):
                 try:
                     if isinstance(self._UPGRADES[i], str):
@@ -66,7 +77,7 @@ class DatabaseUpgrade:
         """
             Add a sorted field to artists
         """
-        with SqlCursor(self._db) as sql:
+        with SqlCursor(self._db, True) as sql:
             sql.execute("ALTER TABLE artists ADD sortname TEXT")
             result = sql.execute("SELECT DISTINCT artists.rowid,\
                                   artists.name\
@@ -78,3 +89,45 @@ class DatabaseUpgrade:
                 sql.execute("UPDATE artists SET sortname=? WHERE rowid=?",
                             (row[1], row[0]))
             sql.commit()
+
+    def _upgrade_6(self):
+        """
+            Add file identity to tracks, used to detect moved files,
+            filled by collection scanner
+        """
+        with SqlCursor(self._db, True) as sql:
+            sql.execute("ALTER TABLE tracks ADD inode INT")
+            sql.execute("ALTER TABLE tracks ADD size INT")
+            sql.commit()
+
+    def _upgrade_7(self):
+        """
+            Add images found in directories, forget directories status
+            so that next scan walks all of them and lists their images
+        """
+        with SqlCursor(self._db, True) as sql:
+            sql.execute("CREATE TABLE images (path TEXT NOT NULL,\
+                                              name TEXT NOT NULL,\
+                                              size INT NOT NULL,\
+                                              mtime INT NOT NULL,\
+                                              PRIMARY KEY (path, name))")
+            sql.execute("DELETE FROM dirs")
+            sql.commit()
+
+    def _upgrade_8(self):
+        """
+            Add indexes used by lookups
+        """
+        with SqlCursor(self._db, True) as sql:
+            for index in self._db.create_indexes:
+                sql.execute(index)
+            sql.execute("ANALYZE")
+            sql.commit()
+
+    def _upgrade_9(self):
+        """
+            Add full text search tables
+        """
+        with SqlCursor(self._db, True) as sql:
+            self._db.create_fts_tables(sql)
+            sql.commit()
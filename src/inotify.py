@@ -15,6 +15,7 @@ from gi.repository import Gio, GLib
 import os
 
 from lollypop.define import Lp
+from lollypop.scanwalker import ScanWalker
 from lollypop.utils import is_audio
 
 
@@ -31,6 +32,10 @@ class Inotify:
         """
         self._monitors = {}
         self._timeout = None
+        # Paths changed since last update
+        self._paths = set()
+        # Directories with images changed since last update
+        self._images = set()
 
     def add_monitor(self, path):
         """
@@ -55,37 +60,46 @@ class Inotify:
 #######################
     def _on_dir_changed(self, monitor, changed_file, other_file, event):
         """
-            Prepare thread to handle changes
+            Remember changed path and prepare an update
         """
-        # Stop collection scanner and wait
-        if Lp().scanner.is_locked():
-            Lp().scanner.stop()
-            GLib.timeout_add(1000,
-                             self._on_dir_changed,
-                             monitor,
-                             changed_file,
-                             other_file,
-                             event)
-        # Run update delayed
-        else:
-            path = changed_file.get_path()
-            # If a directory, monitor it
-            if os.path.exists(path) and\
-               changed_file.query_file_type(Gio.FileQueryInfoFlags.NONE,
-                                            None) == Gio.FileType.DIRECTORY:
+        for f in [changed_file, other_file]:
+            if f is None:
+                continue
+            path = f.get_path()
+            extension = os.path.splitext(path)[1][1:].lower()
+            if extension in ScanWalker.IMAGES:
+                # Album artwork may have changed
+                self._images.add(os.path.dirname(path))
+                continue
+            elif not os.path.exists(path):
+                # Deleted file or directory
+                self._monitors.pop(path, None)
+            elif f.query_file_type(Gio.FileQueryInfoFlags.NONE,
+                                   None) == Gio.FileType.DIRECTORY:
+                # If a directory, monitor it
                 self.add_monitor(path)
-            # If not an audio file, exit
-            elif not is_audio(changed_file):
-                return
-            if self._timeout is not None:
-                GLib.source_remove(self._timeout)
-                self._timeout = None
-            self._timeout = GLib.timeout_add(self._TIMEOUT,
-                                             self._run_collection_update)
+            # If not an audio file, ignore it
+            elif not is_audio(f):
+                continue
+            self._paths.add(path)
+        if not self._paths and not self._images:
+            return
+        if self._timeout is not None:
+            GLib.source_remove(self._timeout)
+            self._timeout = None
+        self._timeout = GLib.timeout_add(self._TIMEOUT,
+                                         self._run_collection_update)
 
     def _run_collection_update(self):
         """
-            Run a collection update
+            Run a collection update for changed paths,
+            wait for current scan to finish
         """
+        for path in self._images:
+            Lp().art.update_images(path)
+        self._images = set()
+        if self._paths and\
+           not Lp().scanner.update_paths(list(self._paths)):
+            return True
         self._timeout = None
-        Lp().window.update_db()
+        self._paths = set()
@@ -122,7 +122,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
                 tracks.append(Track(track_id))
         else:
             tracks.append(Track(track_id))
-        Lp().playlists.add_tracks(Type.MPD, tracks, False)
+        Lp().playlists.add_tracks(Type.MPD, tracks, False).result()
         return ""
 
     def _addid(self, cmd_args):
@@ -147,7 +147,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
             @param args as str
             @return msg as str
         """
-        Lp().playlists.clear(Type.MPD, False)
+        Lp().playlists.clear(Type.MPD, False).result()
         Lp().player.set_user_playlist_by_id(Type.NONE)
         GLib.idle_add(Lp().player.stop)
         Lp().player.current_track = Track()
@@ -254,7 +254,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
         for i in range(start, end):
             track_id = tracks_ids[i]
             tracks.append(Track(track_id))
-        Lp().playlists.remove_tracks(Type.MPD, tracks, False)
+        Lp().playlists.remove_tracks(Type.MPD, tracks, False).result()
         return ""
 
     def _deleteid(self, cmd_args):
@@ -266,7 +266,8 @@ class MpdHandler(socketserver.StreamRequestHandler):
             @return msg as str
         """
         arg = self._get_args(cmd_args)
-        Lp().playlists.remove_tracks(Type.MPD, [Track(int(arg[0]))], False)
+        Lp().playlists.remove_tracks(Type.MPD, [Track(int(arg[0]))],
+                                     False).result()
         return ""
 
     def _find(self, cmd_args):
@@ -279,8 +280,8 @@ class MpdHandler(socketserver.StreamRequestHandler):
         """
         msg = ""
         idx = 0
-        for track_id in self._find_tracks(cmd_args):
-            msg += self._string_for_track_id(track_id, idx)
+        for track in Track.load_many(self._find_tracks(cmd_args)):
+            msg += self._string_for_track(track, idx)
             idx += 1
         return msg
 
@@ -295,7 +296,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
         for track_id in self._find_tracks(cmd_args):
             tracks.append(Track(track_id))
         if tracks:
-            Lp().playlists.add_tracks(Type.MPD, tracks, False)
+            Lp().playlists.add_tracks(Type.MPD, tracks, False).result()
         return ""
 
     def _idle(self, cmd_args):
@@ -481,8 +482,9 @@ class MpdHandler(socketserver.StreamRequestHandler):
         playlist_id = Lp().playlists.get_id(arg)
         msg = ""
         idx = 0
-        for track_id in Lp().playlists.get_tracks_ids(playlist_id):
-            msg += self._string_for_track_id(track_id, idx)
+        for track in Track.load_many(
+                            Lp().playlists.get_tracks_ids(playlist_id)):
+            msg += self._string_for_track(track, idx)
             idx += 1
         return msg
 
@@ -515,7 +517,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
         tracks_ids = Lp().playlists.get_tracks_ids(playlist_id)
         for track_id in tracks_ids:
             tracks.append(Track(track_id))
-        Lp().playlists.add_tracks(Type.MPD, tracks, False)
+        Lp().playlists.add_tracks(Type.MPD, tracks, False).result()
         self.server.init_player_playlist()
         GLib.idle_add(Lp().player.load_in_playlist, tracks_ids[0])
         return ""
@@ -605,12 +607,12 @@ class MpdHandler(socketserver.StreamRequestHandler):
             track_id = tracks_ids[orig]
             del tracks_ids[orig]
             tracks_ids.insert(dst, track_id)
-            Lp().playlists.clear(Type.MPD, False)
+            Lp().playlists.clear(Type.MPD, False).result()
             tracks = []
             for track_id in tracks_ids:
                 tracks.append(Track(track_id))
             Lp().player.set_user_playlist_by_id(Type.NONE)
-            Lp().playlists.add_tracks(Type.MPD, tracks, False)
+            Lp().playlists.add_tracks(Type.MPD, tracks, False).result()
         return ""
 
     def _moveid(self, cmd_args):
@@ -629,12 +631,12 @@ class MpdHandler(socketserver.StreamRequestHandler):
             del tracks_ids[orig]
             tracks_ids.insert(dst, track_id)
 
-            Lp().playlists.clear(Type.MPD)
+            Lp().playlists.clear(Type.MPD).result()
             tracks = []
             for track_id in tracks_ids:
                 tracks.append(Track(track_id))
             Lp().player.set_user_playlist_by_id(Type.NONE)
-            Lp().playlists.add_tracks(Type.MPD, tracks, False)
+            Lp().playlists.add_tracks(Type.MPD, tracks, False).result()
         except:
             pass
         return ""
@@ -739,13 +741,12 @@ class MpdHandler(socketserver.StreamRequestHandler):
         playlist_id = Lp().playlists.get_id(args[0])
         tracks = []
         if not Lp().playlists.exists(playlist_id):
-            Lp().playlists.add(args[0])
-            playlist_id = Lp().playlists.get_id(args[0])
+            playlist_id = Lp().playlists.add(args[0]).result()
         for arg in args[1:]:
             track_id = Lp().tracks.get_id_by_path(arg)
             tracks.append(Track(track_id))
         if tracks:
-            Lp().playlists.add_tracks(playlist_id, tracks, False)
+            Lp().playlists.add_tracks(playlist_id, tracks, False).result()
         return ""
 
     def _playlistid(self, cmd_args):
@@ -767,8 +768,8 @@ class MpdHandler(socketserver.StreamRequestHandler):
                     currents.insert(0, Lp().player.prev_track.id)
                 if Lp().player.next_track.id is not None:
                     currents.append(Lp().player.next_track.id)
-            for track_id in currents:
-                msg += self._string_for_track_id(track_id)
+            for track in Track.load_many(currents):
+                msg += self._string_for_track(track)
         return msg
 
     def _playlistinfo(self, cmd_args):
@@ -802,12 +803,15 @@ class MpdHandler(socketserver.StreamRequestHandler):
             if Lp().player.next_track.id is not None:
                 currents.append(Lp().player.next_track.id)
         i = 0
+        track_ids = []
         for track_id in currents:
             if (start is not None and start <= i <= end) or\
                (pos is not None and pos == i) or\
                (start == end == pos is None):
-                msg += self._string_for_track_id(track_id)
+                track_ids.append(track_id)
             i += 1
+        for track in Track.load_many(track_ids):
+            msg += self._string_for_track(track)
         return msg
 
     def _plchanges(self, cmd_args):
@@ -957,7 +961,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
 
     def _search(self, cmd_args):
         """
-            Send stats about db
+            Send tracks with names containing searched strings
             @syntax search what value
             @param args as str
             @return msg as str
@@ -966,12 +970,15 @@ class MpdHandler(socketserver.StreamRequestHandler):
         args = self._get_args(cmd_args)
         # Search for filters
         i = 0
-        artist = artist_id = None
-        album = None
+        anything = title = artist = album = None
         genre = genre_id = None
         date = ''
         while i < len(args) - 1:
-            if args[i].lower() == 'album':
+            if args[i].lower() == 'any':
+                anything = args[i+1]
+            elif args[i].lower() == 'title':
+                title = args[i+1]
+            elif args[i].lower() == 'album':
                 album = args[i+1]
             elif args[i].lower() == 'artist' or\
                     args[i].lower() == 'albumartist':
@@ -989,12 +996,11 @@ class MpdHandler(socketserver.StreamRequestHandler):
 
         if genre is not None:
             genre_id = Lp().genres.get_id(genre)
-        if artist is not None:
-            artist_id = Lp().artists.get_id(artist)
 
-        for track_id in self.server.mpddb.get_tracks_ids(album, artist_id,
-                                                         genre_id, year):
-            msg += self._string_for_track_id(track_id)
+        for track in Track.load_many(self.server.mpddb.search_tracks_ids(
+                                                anything, title, album, artist,
+                                                genre_id, year)):
+            msg += self._string_for_track(track)
         return msg
 
     def _setvol(self, cmd_args):
@@ -1115,7 +1121,7 @@ class MpdHandler(socketserver.StreamRequestHandler):
             @param args as str
             @return msg as str
         """
-        Lp().window.update_db()
+        Lp().window.update_db(True)
         return ""
 
     def _urlhandlers(self, cmd_args):
@@ -1135,10 +1141,21 @@ class MpdHandler(socketserver.StreamRequestHandler):
             @param track index as int
             @return str
         """
+        if track_id is None:
+            return ""
+        return self._string_for_track(Track(track_id), index)
+
+    def _string_for_track(self, track, index=Type.NONE):
+        """
+            Get mpd protocol string for track
+            @param track as Track
+            @param track index as int
+            @return str
+        """
+        track_id = track.id
         if track_id is None:
             msg = ""
         else:
-            track = Track(track_id)
             if index == Type.NONE:
                 index = 1
                 if Lp().player.is_party():
@@ -14,17 +14,113 @@
 
 from gi.repository import GLib
 
+from collections import OrderedDict
+from threading import Lock
+
 from lollypop.radios import Radios
 from lollypop.define import Lp, Type
 
 
+class Record:
+    """
+        DB row of an album or a track, shared by objects with same id
+        None values are not loaded yet
+    """
+    __slots__ = ['id', 'row']
+
+    def __init__(self, record_id, count):
+        """
+            Init record
+            @param record id as int
+            @param count as int, fields count
+        """
+        self.id = record_id
+        self.row = [None] * count
+
+
+class Records:
+    """
+        Identity map of records, keeps size most recently used ones
+    """
+
+    def __init__(self, fields, size):
+        """
+            Init map
+            @param fields as [str]
+            @param size as int
+        """
+        self._fields = fields
+        self._size = size
+        self._records = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, record_id):
+        """
+            Get record for id, create it if needed
+            @param record id as int
+            @return Record
+            @thread safe
+        """
+        with self._lock:
+            record = self._records.pop(record_id, None)
+            if record is None:
+                record = Record(record_id, len(self._fields))
+                if len(self._records) >= self._size:
+                    self._records.popitem(last=False)
+            self._records[record_id] = record
+            return record
+
+    def remove(self, record_id):
+        """
+            Forget record, objects using it will load a new one
+            @param record id as int
+        """
+        with self._lock:
+            self._records.pop(record_id, None)
+
+    def remove_by(self, field, value):
+        """
+            Forget records with field loaded and equal to value
+            @param field as str
+            @param value as object
+        """
+        index = self._fields.index(field)
+        with self._lock:
+            for record in list(self._records.values()):
+                if record.row[index] == value:
+                    del self._records[record.id]
+
+    def clear(self):
+        """
+            Forget all records
+        """
+        with self._lock:
+            self._records.clear()
+
+
 class Base:
     """
-        Base for album and track objects
+        Base for album and track objects, fields are loaded in a Record
+        from RECORDS, values set on object only apply to object
     """
+    __slots__ = ['db', 'id', '_record', '_overrides']
+
     def __init__(self, db):
+        self._record = None
+        self._overrides = None
         self.db = db
 
+    def __setattr__(self, attr, value):
+        """
+            Override field for this object only
+        """
+        if attr in self.FIELDS:
+            if self._overrides is None:
+                self._overrides = {}
+            self._overrides[attr] = value
+        else:
+            object.__setattr__(self, attr, value)
+
     def __dir__(self, *args, **kwargs):
         """
             Concatenate base class's fields with child class's fields
@@ -35,20 +131,34 @@ class Base:
         # Lazy DB calls of attributes referenced
         # in self.FIELDS
         if attr in self.FIELDS:
+            if self._overrides is not None and attr in self._overrides:
+                return self._overrides[attr]
+            index = self.FIELDS.index(attr)
             if self.id is None or self.id < 0:
-                return self.DEFAULTS[self.FIELDS.index(attr)]
-            # Actual value of 'attr_name' is stored in '_attr_name'
-            attr_name = "_" + attr
-            attr_value = getattr(self, attr_name)
+                return self.DEFAULTS[index]
+            row = self._get_record().row
+            attr_value = row[index]
             if attr_value is None:
                 attr_value = getattr(self.db, "get_" + attr)(self.id)
-                setattr(self, attr_name, attr_value)
+                row[index] = attr_value
             # Return default value if None
             if attr_value is None:
-                return self.DEFAULTS[self.FIELDS.index(attr)]
+                return self.DEFAULTS[index]
             else:
                 return attr_value
 
+    def set_fields(self, fields):
+        """
+            Set fields already loaded from DB, others are set on object
+            @param fields as {field name: value}
+        """
+        row = self._get_record().row
+        for (attr, value) in fields.items():
+            if attr in self.FIELDS:
+                row[self.FIELDS.index(attr)] = value
+            else:
+                setattr(self, "_" + attr, value)
+
     def get_popularity(self):
         """
             Get popularity
@@ -80,7 +190,8 @@ class Base:
             if self.id >= 0:
                 avg_popularity = self.db.get_avg_popularity()
                 popularity = int((popularity * avg_popularity / 5) + 0.5)
-                self.db.set_popularity(self.id, popularity, True)
+                Lp().db.writer.write(self.db.set_popularity,
+                                     self.id, popularity)
             elif self.id == Type.RADIOS:
                 radios = Radios()
                 avg_popularity = radios.get_avg_popularity()
@@ -89,6 +200,18 @@ class Base:
         except Exception as e:
             print("Base::set_popularity(): %s" % e)
 
+#######################
+# PRIVATE             #
+#######################
+    def _get_record(self):
+        """
+            Get record for current id
+            @return Record
+        """
+        if self._record is None or self._record.id != self.id:
+            self._record = self.RECORDS.get(self.id)
+        return self._record
+
 
 class Disc:
     """
@@ -118,15 +241,17 @@ class Disc:
 
             @return list of Track
         """
-        return [Track(id) for id in self.tracks_ids]
+        return Track.load_many(self.tracks_ids)
 
 
 class Album(Base):
     """
         Represent an album
     """
+    __slots__ = ['genre_id', '_tracks_ids', '_tracks', '_discs']
     FIELDS = ['name', 'artist_name', 'artist_id', 'year', 'path']
     DEFAULTS = ['', '', None, '', '']
+    RECORDS = Records(FIELDS, 1000)
 
     def __init__(self, album_id=None, genre_id=None):
         """
@@ -137,6 +262,28 @@ class Album(Base):
         Base.__init__(self, Lp().albums)
         self.id = album_id
         self.genre_id = genre_id
+        self._tracks_ids = None
+        self._tracks = None
+        self._discs = None
+
+    @staticmethod
+    def load_many(album_ids, genre_id=None):
+        """
+            Get albums with fields loaded in one query
+            @param album ids as [int]
+            @param genre id as int
+            @return [Album]
+        """
+        items = Lp().albums.get_many(album_ids)
+        albums = []
+        for album_id in album_ids:
+            album = Album(album_id, genre_id)
+            if album_id in items:
+                album.set_fields(dict(zip(['name', 'artist_name',
+                                           'artist_id', 'year'],
+                                          items[album_id])))
+            albums.append(album)
+        return albums
 
     def set_genre(self, genre_id):
         """
@@ -164,7 +311,7 @@ class Album(Base):
             Get album tracks id
             @return list of int
         """
-        if getattr(self, "_tracks_ids") is None:
+        if self._tracks_ids is None:
             self._tracks_ids = self.db.get_tracks(self.id,
                                                   self.genre_id)
         return self._tracks_ids
@@ -176,7 +323,7 @@ class Album(Base):
             @return list of Track
         """
         if not self._tracks and self.tracks_ids:
-            self._tracks = [Track(track_id) for track_id in self.tracks_ids]
+            self._tracks = Track.load_many(self.tracks_ids)
         return self._tracks
 
     @property
@@ -194,10 +341,12 @@ class Track(Base):
     """
         Represent a track
     """
+    __slots__ = ['_uri', '_album', '_album_artist']
     FIELDS = ['name', 'album_id', 'album_artist_id',
               'artist_ids', 'album_name', 'artist_names',
               'genre_names', 'duration', 'number', 'path', 'position']
     DEFAULTS = ['', None, None, [], '', '', '', 0.0, None, '', 0]
+    RECORDS = Records(FIELDS, 5000)
 
     def __init__(self, track_id=None):
         """
@@ -207,6 +356,46 @@ class Track(Base):
         Base.__init__(self, Lp().tracks)
         self.id = track_id
         self._uri = None
+        self._album = None
+        self._album_artist = None
+
+    @staticmethod
+    def load_many(track_ids):
+        """
+            Get tracks with fields, albums and album artists loaded
+            in two queries
+            @param track ids as [int]
+            @return [Track]
+        """
+        items = Lp().tracks.get_many(track_ids)
+        album_ids = []
+        for item in items.values():
+            if item[1] not in album_ids:
+                album_ids.append(item[1])
+        albums = dict((album.id, album)
+                      for album in Album.load_many(album_ids))
+        tracks = []
+        for track_id in track_ids:
+            track = Track(track_id)
+            if track_id in items:
+                (name, album_id, album_artist_id, artist_ids, album_name,
+                 artist_names, genre_names, duration, tracknumber, path,
+                 album_artist) = items[track_id]
+                track.set_fields({'name': name,
+                                  'album_id': album_id,
+                                  'album_artist_id': album_artist_id,
+                                  'artist_ids': artist_ids,
+                                  'album_name': album_name,
+                                  'artist_names': artist_names,
+                                  'genre_names': genre_names,
+                                  'duration': duration,
+                                  'number': tracknumber,
+                                  'path': path,
+                                  'position': tracknumber or 0,
+                                  'album': albums.get(album_id),
+                                  'album_artist': album_artist})
+            tracks.append(track)
+        return tracks
 
     @property
     def title(self):
@@ -244,7 +433,11 @@ class Track(Base):
             Get track's album
             @return Album
         """
-        return Album(self.album_id)
+        # Track id may change, cached album must follow
+        album_id = self.album_id
+        if self._album is None or self._album.id != album_id:
+            self._album = Album(album_id)
+        return self._album
 
     @property
     def year(self):
@@ -260,7 +453,7 @@ class Track(Base):
             Get track artist name
             @return str
         """
-        if getattr(self, "_album_artist") is None:
+        if self._album_artist is None:
             self._album_artist = Lp().artists.get_name(self.album_artist_id)
         return self._album_artist
 
@@ -252,7 +252,7 @@ class BinPlayer(ReplayGainPlayer, BasePlayer):
             self.current_track.set_album_artist(reader.get_album_artist(tags))
             if self.current_track.album_artist == '':
                 self.current_track.set_album_artist(self.current_track.artist)
-            self.current_track.genre_name = reader.get_genres(tags)
+            self.current_track.genre_names = reader.get_genres(tags)
         self.emit('current-changed')
 
     def _on_bus_element(self, bus, message):
@@ -310,10 +310,9 @@ class BinPlayer(ReplayGainPlayer, BasePlayer):
         finished_start_time = self._start_time
         if self.next_track.id is not None:
             self._load_track(self.next_track)
-        # Increment popularity
-        if not Lp().scanner.is_locked():
-            Lp().tracks.set_more_popular(finished.id)
-            Lp().albums.set_more_popular(finished.album_id)
+        # Increment popularity, queued behind a running scan
+        Lp().db.writer.write(Lp().tracks.set_more_popular, finished.id)
+        Lp().db.writer.write(Lp().albums.set_more_popular, finished.album_id)
         # Scrobble on lastfm
         if Lp().lastfm is not None:
             if finished.album_artist_id == Type.COMPILATIONS:
@@ -347,6 +346,5 @@ class BinPlayer(ReplayGainPlayer, BasePlayer):
                                         self.current_track.album_name,
                                         self.current_track.title,
                                         int(self.current_track.duration))
-        if not Lp().scanner.is_locked():
-            Lp().tracks.set_listened_at(self.current_track.id, int(time()))
+        Lp().tracks.set_listened_at(self.current_track.id, int(time()))
         self._handled_error = None
@@ -22,6 +22,7 @@ from lollypop.database import Database
 from lollypop.define import Lp, Type
 from lollypop.objects import Track
 from lollypop.sqlcursor import SqlCursor
+from lollypop.sqlwriter import SqlWriter
 
 
 class Playlists(GObject.GObject):
@@ -53,12 +54,10 @@ class Playlists(GObject.GObject):
         self._LOVED = _("Loved tracks")
         self._MPD = _("Network control")
         try_import = not os.path.exists(self.DB_PATH)
+        self.writer = SqlWriter(self)
         # Create db schema
         try:
-            with SqlCursor(self) as sql:
-                sql.execute(self.create_playlists)
-                sql.execute(self.create_tracks)
-                sql.commit()
+            self.writer.write(self._create_tables).result()
         except:
             pass
 
@@ -74,7 +73,7 @@ class Playlists(GObject.GObject):
                     f = info.get_name()
                     if f.endswith(".m3u"):
                         if f[:-4] != self._LOVED:
-                            self.add(f[:-4])
+                            self.add(f[:-4]).result()
                         playlist_id = self.get_id(f[:-4])
                         parser = TotemPlParser.Parser.new()
                         parser.connect('entry-parsed',
@@ -89,14 +88,11 @@ class Playlists(GObject.GObject):
         """
             Add a playlist
             @param playlist name as str
+            @return Future, result is playlist id
             @thread safe
         """
-        with SqlCursor(self) as sql:
-            result = sql.execute("INSERT INTO playlists (name, mtime)"
-                                 " VALUES (?, ?)",
-                                 (name, datetime.now().strftime('%s')))
-            sql.commit()
-            GLib.idle_add(self.emit, 'playlists-changed', result.lastrowid)
+        return self.writer.write(self._add, name,
+                                 callback=self._on_playlists_changed)
 
     def exists(self, playlist_id):
         """
@@ -120,28 +116,19 @@ class Playlists(GObject.GObject):
             Rename playlist
             @param new playlist name as str
             @param old playlist name as str
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            playlist_id = self.get_id(old_name)
-            sql.execute("UPDATE playlists\
-                        SET name=?\
-                        WHERE name=?",
-                        (new_name, old_name))
-            sql.commit()
-            GLib.idle_add(self.emit, 'playlists-changed', playlist_id)
+        return self.writer.write(self._rename, new_name, old_name,
+                                 callback=self._on_playlists_changed)
 
     def delete(self, name):
         """
             delete playlist
             @param playlist name as str
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            playlist_id = self.get_id(name)
-            sql.execute("DELETE FROM playlists\
-                        WHERE name=?",
-                        (name,))
-            sql.commit()
-            GLib.idle_add(self.emit, 'playlists-changed', playlist_id)
+        return self.writer.write(self._delete, name,
+                                 callback=self._on_playlists_changed)
 
     def get(self):
         """
@@ -247,13 +234,10 @@ class Playlists(GObject.GObject):
             Clear playlsit
             @param playlist id as int
             @param notify as bool
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            sql.execute("DELETE FROM tracks\
-                         WHERE playlist_id=?", (playlist_id,))
-            sql.commit()
-            if notify:
-                GLib.idle_add(self.emit, 'playlist-changed', playlist_id)
+        return self.writer.write(self._clear, playlist_id,
+                                 callback=self._get_callback(notify))
 
     def add_tracks(self, playlist_id, tracks, notify=True):
         """
@@ -261,37 +245,22 @@ class Playlists(GObject.GObject):
             @param playlist id as int
             @param tracks as [Track]
             @param notify as bool
+            @return Future
+            @thread safe
         """
-        with SqlCursor(self) as sql:
-            changed = False
-            for track in tracks:
-                if not self.exists_track(playlist_id, track.id):
-                    changed = True
-                    sql.execute("INSERT INTO tracks"
-                                " VALUES (?, ?)",
-                                (playlist_id, track.path))
-            if changed:
-                sql.execute("UPDATE playlists SET mtime=?\
-                             WHERE rowid=?", (datetime.now().strftime('%s'),
-                                              playlist_id))
-                sql.commit()
-                if notify:
-                    GLib.idle_add(self.emit, 'playlist-changed', playlist_id)
+        return self.writer.write(self._add_tracks, playlist_id, tracks,
+                                 callback=self._get_callback(notify))
 
     def remove_tracks(self, playlist_id, tracks, notify=True):
         """
             Remove tracks from playlist
             @param playlist id as int
             @param tracks as [Track]
+            @return Future
+            @thread safe
         """
-        with SqlCursor(self) as sql:
-            for track in tracks:
-                sql.execute("DELETE FROM tracks\
-                             WHERE filepath=?\
-                             AND playlist_id=?", (track.path, playlist_id))
-            sql.commit()
-            if notify:
-                GLib.idle_add(self.emit, 'playlist-changed', playlist_id)
+        return self.writer.write(self._remove_tracks, playlist_id, tracks,
+                                 callback=self._get_callback(notify))
 
     def get_position(self, playlist_id, track_id):
         """
@@ -357,7 +326,8 @@ class Playlists(GObject.GObject):
             Return a new sqlite cursor
         """
         try:
-            sql = sqlite3.connect(self.DB_PATH, 600.0)
+            sql = sqlite3.connect(self.DB_PATH, 600.0,
+                                  check_same_thread=False)
             sql.execute("ATTACH DATABASE '%s' AS music" % Database.DB_PATH)
             return sql
         except:
@@ -366,6 +336,136 @@ class Playlists(GObject.GObject):
 #######################
 # PRIVATE             #
 #######################
+    def _create_tables(self):
+        """
+            Create db schema if missing
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT name FROM sqlite_master\
+                                  WHERE type='table'")
+            tables = list(itertools.chain(*result))
+            if 'playlists' not in tables:
+                sql.execute(self.create_playlists)
+            if 'tracks' not in tables:
+                sql.execute(self.create_tracks)
+
+    def _add(self, name):
+        """
+            Add a playlist
+            @param playlist name as str
+            @return playlist id as int
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("INSERT INTO playlists (name, mtime)"
+                                 " VALUES (?, ?)",
+                                 (name, datetime.now().strftime('%s')))
+            return result.lastrowid
+
+    def _rename(self, new_name, old_name):
+        """
+            Rename playlist
+            @param new playlist name as str
+            @param old playlist name as str
+            @return playlist id as int
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            playlist_id = self.get_id(old_name)
+            sql.execute("UPDATE playlists\
+                        SET name=?\
+                        WHERE name=?",
+                        (new_name, old_name))
+            return playlist_id
+
+    def _delete(self, name):
+        """
+            delete playlist
+            @param playlist name as str
+            @return playlist id as int
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            playlist_id = self.get_id(name)
+            sql.execute("DELETE FROM playlists\
+                        WHERE name=?",
+                        (name,))
+            return playlist_id
+
+    def _clear(self, playlist_id):
+        """
+            Clear playlsit
+            @param playlist id as int
+            @return playlist id as int
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("DELETE FROM tracks\
+                         WHERE playlist_id=?", (playlist_id,))
+            return playlist_id
+
+    def _add_tracks(self, playlist_id, tracks):
+        """
+            Add tracks to playlist if not already present
+            @param playlist id as int
+            @param tracks as [Track]
+            @return playlist id as int if changed, else None
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            changed = False
+            for track in tracks:
+                if not self.exists_track(playlist_id, track.id):
+                    changed = True
+                    sql.execute("INSERT INTO tracks"
+                                " VALUES (?, ?)",
+                                (playlist_id, track.path))
+            if changed:
+                sql.execute("UPDATE playlists SET mtime=?\
+                             WHERE rowid=?", (datetime.now().strftime('%s'),
+                                              playlist_id))
+                return playlist_id
+            return None
+
+    def _remove_tracks(self, playlist_id, tracks):
+        """
+            Remove tracks from playlist
+            @param playlist id as int
+            @param tracks as [Track]
+            @return playlist id as int
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            for track in tracks:
+                sql.execute("DELETE FROM tracks\
+                             WHERE filepath=?\
+                             AND playlist_id=?", (track.path, playlist_id))
+            return playlist_id
+
+    def _get_callback(self, notify):
+        """
+            Return writer callback for playlist content changes
+            @param notify as bool
+            @return function/None
+        """
+        return self._on_playlist_changed if notify else None
+
+    def _on_playlists_changed(self, playlist_id):
+        """
+            Notify playlist added/renamed/removed, once committed
+            @param playlist id as int
+        """
+        self.emit('playlists-changed', playlist_id)
+
+    def _on_playlist_changed(self, playlist_id):
+        """
+            Notify playlist content changed, once committed
+            @param playlist id as int/None if unchanged
+        """
+        if playlist_id is not None:
+            self.emit('playlist-changed', playlist_id)
+
     def _on_entry_parsed(self, parser, uri, metadata, playlist_id):
         """
             Import entry
@@ -230,28 +230,32 @@ class SearchPopover(Gtk.Popover):
 
         albums += Lp().albums.search(self._current_search)
 
-        for album_id, artist_id in albums:
+        album_objs = Album.load_many([album_id for (album_id, artist_id)
+                                      in albums])
+        for (album, (album_id, artist_id)) in zip(album_objs, albums):
             search_obj = SearchObject()
             search_obj.artist = Lp().artists.get_name(artist_id)
-            search_obj.title = Lp().albums.get_name(album_id)
+            search_obj.title = album.name
             search_obj.count = Lp().albums.get_count(album_id, None)
             search_obj.id = album_id
             search_obj.album_id = album_id
             results.append(search_obj)
 
-        for track_id, track_name in Lp().tracks.search(
-                        self._current_search) + tracks_non_album_artist:
+        tracks = Lp().tracks.search(
+                        self._current_search) + tracks_non_album_artist
+        track_objs = Track.load_many([track_id for (track_id, track_name)
+                                      in tracks])
+        for (track, (track_id, track_name)) in zip(track_objs, tracks):
             search_obj = SearchObject()
             search_obj.title = track_name
             search_obj.id = track_id
-            search_obj.album_id = Lp().tracks.get_album_id(track_id)
+            search_obj.album_id = track.album_id
             search_obj.is_track = True
 
-            artist_id = Lp().albums.get_artist_id(search_obj.album_id)
-            if artist_id == Type.COMPILATIONS:
-                search_obj.artist = Lp().tracks.get_artist_names(track_id)
+            if track.album_artist_id == Type.COMPILATIONS:
+                search_obj.artist = track.artist_names
             else:
-                search_obj.artist = Lp().artists.get_name(artist_id)
+                search_obj.artist = track.album_artist
 
             results.append(search_obj)
 
@@ -339,7 +343,7 @@ class SearchPopover(Gtk.Popover):
         if tracks:
             playlist_id = Lp().playlists.get_id(self._current_search)
             if playlist_id == Type.NONE:
-                Lp().playlists.add(self._current_search)
+                playlist_id = Lp().playlists.add(self._current_search).result()
             Lp().playlists.add_tracks(playlist_id, tracks)
 
     def _on_map(self, widget):
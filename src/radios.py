@@ -10,12 +10,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import GObject, GLib, Gio, TotemPlParser
+from gi.repository import GObject, Gio, TotemPlParser
 
 import os
+import itertools
 import sqlite3
 
 from lollypop.sqlcursor import SqlCursor
+from lollypop.sqlwriter import SqlWriter
 
 
 class Radios(GObject.GObject):
@@ -34,18 +36,21 @@ class Radios(GObject.GObject):
         # Add, rename, delete
         'radios-changed': (GObject.SignalFlags.RUN_FIRST, None, ()),
     }
+    # Shared by all Radios objects
+    _writer = None
 
     def __init__(self):
         """
             Init playlists manager
         """
         GObject.GObject.__init__(self)
+        if Radios._writer is None:
+            Radios._writer = SqlWriter(self)
+        self.writer = Radios._writer
         try_import = not os.path.exists(self.DB_PATH)
         # Create db schema
         try:
-            with SqlCursor(self) as sql:
-                sql.execute(self.create_radios)
-                sql.commit()
+            self.writer.write(self._create_tables).result()
         except:
             pass
 
@@ -71,19 +76,11 @@ class Radios(GObject.GObject):
             Add a radio, update url if radio already exists in db
             @param radio name as str
             @param url as str
+            @return Future
             @thread safe
         """
-        with SqlCursor(self) as sql:
-            if self.exists(name):
-                sql.execute("UPDATE radios\
-                             SET url=?\
-                             WHERE name=?", (url, name))
-            else:
-                sql.execute("INSERT INTO radios (name, url, popularity)\
-                             VALUES (?, ?, ?)",
-                            (name, url, 0))
-            sql.commit()
-            GLib.idle_add(self.emit, 'radios-changed')
+        return self.writer.write(self._add, name, url,
+                                 callback=self._on_radios_changed)
 
     def exists(self, name):
         """
@@ -107,26 +104,19 @@ class Radios(GObject.GObject):
             Rename playlist
             @param old playlist name as str
             @param new playlist name as str
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            sql.execute("UPDATE radios\
-                        SET name=?\
-                        WHERE name=?",
-                        (new_name, old_name))
-            sql.commit()
-            GLib.idle_add(self.emit, 'radios-changed')
+        return self.writer.write(self._rename, old_name, new_name,
+                                 callback=self._on_radios_changed)
 
     def delete(self, name):
         """
             delete radio
             @param radio name as str
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            sql.execute("DELETE FROM radios\
-                        WHERE name=?",
-                        (name,))
-            sql.commit()
-            GLib.idle_add(self.emit, 'radios-changed')
+        return self.writer.write(self._delete, name,
+                                 callback=self._on_radios_changed)
 
     def get(self):
         """
@@ -158,19 +148,9 @@ class Radios(GObject.GObject):
         """
             Set radio more popular
             @param name as str
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            result = sql.execute("SELECT popularity from radios WHERE name=?",
-                                 (name,))
-            pop = result.fetchone()
-            if pop:
-                current = pop[0]
-            else:
-                current = 0
-            current += 1
-            sql.execute("UPDATE radios set popularity=? WHERE name=?",
-                        (current, name))
-            sql.commit()
+        return self.writer.write(self._set_more_popular, name)
 
     def get_avg_popularity(self):
         """
@@ -192,15 +172,9 @@ class Radios(GObject.GObject):
             Set popularity
             @param name as str
             @param popularity as int
+            @return Future
         """
-        with SqlCursor(self) as sql:
-            try:
-                sql.execute("UPDATE radios SET\
-                            popularity=? WHERE name=?",
-                            (popularity, name))
-                sql.commit()
-            except:  # Database is locked
-                pass
+        return self.writer.write(self._set_popularity, name, popularity)
 
     def get_popularity(self, name):
         """
@@ -223,13 +197,103 @@ class Radios(GObject.GObject):
             Return a new sqlite cursor
         """
         try:
-            return sqlite3.connect(self.DB_PATH, 600.0)
+            return sqlite3.connect(self.DB_PATH, 600.0,
+                                   check_same_thread=False)
         except:
             exit(-1)
 
 #######################
 # PRIVATE             #
 #######################
+    def _create_tables(self):
+        """
+            Create db schema if missing
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT name FROM sqlite_master\
+                                  WHERE type='table'")
+            if 'radios' not in itertools.chain(*result):
+                sql.execute(self.create_radios)
+
+    def _add(self, name, url):
+        """
+            Add a radio, update url if radio already exists in db
+            @param radio name as str
+            @param url as str
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            if self.exists(name):
+                sql.execute("UPDATE radios\
+                             SET url=?\
+                             WHERE name=?", (url, name))
+            else:
+                sql.execute("INSERT INTO radios (name, url, popularity)\
+                             VALUES (?, ?, ?)",
+                            (name, url, 0))
+
+    def _rename(self, old_name, new_name):
+        """
+            Rename radio
+            @param old radio name as str
+            @param new radio name as str
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("UPDATE radios\
+                        SET name=?\
+                        WHERE name=?",
+                        (new_name, old_name))
+
+    def _delete(self, name):
+        """
+            Delete radio
+            @param radio name as str
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("DELETE FROM radios\
+                        WHERE name=?",
+                        (name,))
+
+    def _set_more_popular(self, name):
+        """
+            Set radio more popular
+            @param name as str
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            result = sql.execute("SELECT popularity from radios WHERE name=?",
+                                 (name,))
+            pop = result.fetchone()
+            if pop:
+                current = pop[0]
+            else:
+                current = 0
+            current += 1
+            sql.execute("UPDATE radios set popularity=? WHERE name=?",
+                        (current, name))
+
+    def _set_popularity(self, name, popularity):
+        """
+            Set popularity
+            @param name as str
+            @param popularity as int
+            @warning: commit needed
+        """
+        with SqlCursor(self) as sql:
+            sql.execute("UPDATE radios SET\
+                        popularity=? WHERE name=?",
+                        (popularity, name))
+
+    def _on_radios_changed(self, result):
+        """
+            Notify radio added/renamed/removed, once committed
+            @param result as None
+        """
+        self.emit('radios-changed')
+
     def _on_entry_parsed(self, parser, uri, metadata, name):
         """
             Import entry
@@ -0,0 +1,127 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gio, Gst
+
+import os
+import resource
+from time import time
+
+from lollypop.art import Art
+from lollypop.database import Database
+from lollypop.database_albums import AlbumsDatabase
+from lollypop.database_artists import ArtistsDatabase
+from lollypop.database_genres import GenresDatabase
+from lollypop.database_tracks import TracksDatabase
+from lollypop.settings import Settings
+from lollypop.sqlcursor import SqlCursor
+from lollypop.collectionscanner import CollectionScanner
+
+
+class ScanOnlyApplication(Gio.Application):
+    """
+        Update collection without user interface, then exit:
+            - no window, MPRIS or MPD server
+            - scan throughput is printed when finished
+        Usage: lollypop --scan-only [paths]
+    """
+
+    def __init__(self, paths):
+        """
+            Create application
+            @param paths as [str], default to music paths
+        """
+        Gio.Application.__init__(
+                            self,
+                            application_id='org.gnome.Lollypop.ScanOnly',
+                            flags=Gio.ApplicationFlags.NON_UNIQUE)
+        self.set_default()
+        self.window = None
+        self.notify = None
+        self.player = None
+        self.mpd = None
+        self.lastfm = None
+        self.debug = False
+        self._paths = [os.path.abspath(path) for path in paths]
+        self._status = 0
+        self._start = 0
+
+    def scan(self):
+        """
+            Run scan
+            @return exit status as int
+        """
+        self.run([])
+        return self._status
+
+    def do_activate(self):
+        """
+            Init database and start scan
+        """
+        self._init()
+        self.scanner.connect('scan-finished', self._on_scan_finished)
+        self._start = time()
+        if self._paths:
+            self.scanner.update_paths(self._paths)
+        else:
+            self.scanner.update(None)
+        if self.scanner.is_locked():
+            self.hold()
+        else:
+            print("Nothing to scan")
+            self._status = 1
+
+#######################
+# PRIVATE             #
+#######################
+    def _init(self):
+        """
+            Init GStreamer, settings, database and scanner
+        """
+        Gst.init(None)
+        self.settings = Settings.new()
+        self.db = Database()
+        SqlCursor.add(self.db)
+        self.albums = AlbumsDatabase()
+        self.artists = ArtistsDatabase()
+        self.genres = GenresDatabase()
+        self.tracks = TracksDatabase()
+        self.art = Art()
+        self.scanner = CollectionScanner(False)
+
+    def _on_scan_finished(self, scanner):
+        """
+            Print throughput and exit
+            @param scanner as CollectionScanner
+        """
+        elapsed = time() - self._start
+        stats = scanner.get_stats()
+        plan = stats['plan']
+        tags = stats['tags']
+        write = stats['write']
+        files = plan['add'] + plan['update'] + plan['unchanged'] +\
+            plan['move']
+        print("%s files in %.2fs (%.0f files/s)" % (files, elapsed,
+                                                    files / elapsed))
+        print("Plan: add %(add)s, update %(update)s, unchanged "
+              "%(unchanged)s, move %(move)s, delete %(delete)s" % plan)
+        print("Walk: %(entries)s entries in %(elapsed).2fs" % stats['walk'])
+        print("Tag read: %.2fs (%s fast, %s discoverer, %s errors)" % (
+              tags['elapsed'], tags['fast'], tags['discoverer'],
+              tags['errors']))
+        print("DB write: %(elapsed).2fs (%(tracks)s tracks)" % write)
+        # Kilobytes on Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print("Peak RSS: %.1f MB" % (rss / 1024))
+        self.release()
@@ -0,0 +1,124 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+class ScanPlan:
+    """
+        Sort files found on disk against files known by database:
+            - add: files unknown to database
+            - update: known files with a new mtime
+            - unchanged: known files with same mtime
+            - move: new files that are known files moved on disk
+            - delete: known files not found on disk
+        Each file is handled with dict/set operations only.
+        A plan that does not keep files only counts them, so memory does
+        not grow with library size while streaming files to the scanner
+    """
+    ADD = 0
+    UPDATE = 1
+    UNCHANGED = 2
+    MOVE = 3
+
+    def __init__(self, mtimes, keep=True):
+        """
+            Init plan
+            @param mtimes as {filepath as string: mtime as int}
+            @param keep as bool, False to leave add/update/unchanged empty,
+                   files must then be classified only once
+        """
+        # Files not seen yet, remaining ones are deleted
+        self._pending = dict(mtimes)
+        self._keep = keep
+        self._counts = {self.ADD: 0, self.UPDATE: 0, self.UNCHANGED: 0,
+                        self.MOVE: 0}
+        self.add = {}
+        self.update = {}
+        self.unchanged = set()
+        # {filepath: old filepath}
+        self.move = {}
+        self.delete = set()
+
+    def classify(self, filepath, mtime):
+        """
+            Classify file found on disk
+            @param filepath as string
+            @param mtime as int
+            @return ScanPlan.ADD/UPDATE/UNCHANGED
+        """
+        if filepath in self.add or filepath in self.update or\
+           filepath in self.unchanged or filepath in self.move:
+            return self.UNCHANGED
+        stored = self._pending.pop(filepath, None)
+        if stored is None:
+            status = self.ADD
+        elif stored != mtime:
+            status = self.UPDATE
+        else:
+            status = self.UNCHANGED
+        self._counts[status] += 1
+        if not self._keep:
+            return status
+        if status == self.ADD:
+            self.add[filepath] = mtime
+        elif status == self.UPDATE:
+            self.update[filepath] = mtime
+        else:
+            self.unchanged.add(filepath)
+        return status
+
+    def set_moved(self, filepath, old_filepath):
+        """
+            Mark file added by classify() as a known file moved on disk,
+            old file will not be deleted
+            @param filepath as string
+            @param old_filepath as string
+        """
+        self._pending.pop(old_filepath, None)
+        self._counts[self.ADD] -= 1
+        self._counts[self.MOVE] += 1
+        if self._keep:
+            self.add.pop(filepath, None)
+            self.move[filepath] = old_filepath
+
+    def finish(self):
+        """
+            Mark files not found on disk as deleted
+        """
+        self.delete = set(self._pending.keys())
+        self._pending = {}
+
+    def count(self):
+        """
+            Return count of files found on disk
+            @return int
+        """
+        return sum(self._counts.values())
+
+    def get_summary(self):
+        """
+            Return plan summary
+            @return {'add', 'update', 'unchanged', 'move', 'delete': int}
+        """
+        return {'add': self._counts[self.ADD],
+                'update': self._counts[self.UPDATE],
+                'unchanged': self._counts[self.UNCHANGED],
+                'move': self._counts[self.MOVE],
+                'delete': len(self.delete)}
+
+    def __str__(self):
+        """
+            Return a human readable summary
+        """
+        return "add: %(add)s, update: %(update)s, "\
+               "unchanged: %(unchanged)s, move: %(move)s, "\
+               "delete: %(delete)s" %\
+               self.get_summary()
@@ -0,0 +1,182 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+import os
+from time import time, sleep
+
+from lollypop.define import Lp
+from lollypop.utils import debug
+
+
+def lower_priority():
+    """
+        Run calling thread with idle CPU and I/O priority.
+        SCHED_IDLE threads get idle I/O class on Linux, threads started
+        from calling thread inherit its priority
+        @thread safe
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except:
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, 19)
+        except Exception as e:
+            print("lower_priority(): %s" % e)
+
+
+class ScanThrottle:
+    """
+        Keep scanner from hurting playback and user interface:
+            - progress updates are coalesced to one per PROGRESS_INTERVAL
+            - scanner backs off while main loop lags or while a track
+              is played from a scanned device
+        Main loop is probed every PROBE_INTERVAL. Sleeping never takes
+        more than MAX_SHARE of scan time, so scan always progresses
+    """
+    PROGRESS_INTERVAL = 0.2
+    PROBE_INTERVAL = 0.25
+    # Main loop lag allowed before backing off, in seconds
+    MAX_LAG = 0.1
+    # Backoff bounds, in seconds
+    MIN_DELAY = 0.01
+    MAX_DELAY = 0.5
+    # Max part of scan time spent sleeping
+    MAX_SHARE = 0.5
+
+    def __init__(self, callback):
+        """
+            Init throttle
+            @param callback as function(current as int, total as int),
+                   called from main loop
+        """
+        self._callback = callback
+        self._progress = None
+        self._pending = False
+        self._posted = 0
+        self._probe_id = None
+        self._probed = 0
+        self._lag = 0
+        self._devices = set()
+        self._playing = None
+        self._contended = False
+        self._delay = 0
+        self._waited = 0
+        self._started = 0
+
+    def start(self, paths):
+        """
+            Start probing main loop
+            @param paths as [str], scanned paths
+        """
+        self._devices = set()
+        for path in paths:
+            try:
+                self._devices.add(os.stat(path).st_dev)
+            except:
+                pass
+        self._lag = 0
+        self._delay = 0
+        self._waited = 0
+        self._contended = False
+        self._started = time()
+        self._probed = self._started
+        if self._probe_id is None:
+            self._probe_id = GLib.timeout_add(
+                                        int(self.PROBE_INTERVAL * 1000),
+                                        self._probe)
+
+    def stop(self):
+        """
+            Stop probing main loop
+        """
+        if self._probe_id is not None:
+            GLib.source_remove(self._probe_id)
+            self._probe_id = None
+        if self._waited:
+            debug("ScanThrottle::stop(): waited %.2fs" % self._waited)
+
+    def progress(self, current, total):
+        """
+            Update progress, only last value is sent to main loop
+            @param current as int
+            @param total as int
+            @thread safe
+        """
+        self._progress = (current, total)
+        if not self._pending and\
+           time() - self._posted > self.PROGRESS_INTERVAL:
+            self._pending = True
+            self._posted = time()
+            GLib.idle_add(self._on_progress)
+
+    def wait(self):
+        """
+            Sleep if scanner should back off, delay doubles while
+            contention lasts and halves once it is gone.
+            Do not call it while holding a database connection
+            @thread safe
+        """
+        # A blocked main loop does not run probes
+        lag = max(self._lag, time() - self._probed - self.PROBE_INTERVAL)
+        if lag > self.MAX_LAG or self._contended:
+            self._delay = min(self.MAX_DELAY,
+                              max(self.MIN_DELAY, self._delay * 2))
+            elapsed = time() - self._started
+            if self._waited + self._delay > self.MAX_SHARE * elapsed:
+                return
+            self._waited += self._delay
+            sleep(self._delay)
+        elif self._delay > self.MIN_DELAY:
+            self._delay /= 2
+        else:
+            self._delay = 0
+
+#######################
+# PRIVATE             #
+#######################
+    def _probe(self):
+        """
+            Measure main loop lag, check played track device
+        """
+        now = time()
+        self._lag = now - self._probed - self.PROBE_INTERVAL
+        self._probed = now
+        self._contended = self._is_contended()
+        return True
+
+    def _is_contended(self):
+        """
+            True if a track is played from a scanned device
+            @return bool
+        """
+        player = Lp().player
+        if player is None or not player.is_playing():
+            return False
+        path = player.current_track.path
+        if not path:
+            return False
+        if self._playing is None or self._playing[0] != path:
+            try:
+                self._playing = (path, os.stat(path).st_dev)
+            except:
+                self._playing = (path, None)
+        return self._playing[1] in self._devices
+
+    def _on_progress(self):
+        """
+            Send last progress to callback
+        """
+        self._pending = False
+        if self._progress is not None:
+            self._callback(*self._progress)
@@ -0,0 +1,314 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio
+
+import os
+from queue import Queue
+from threading import Thread, Event
+from time import time
+
+from lollypop.utils import is_audio, is_pls, debug
+
+
+class ScanWalker:
+    """
+        Enumerate music files, files are classified by extension,
+        content is only sniffed for unknown extensions.
+        Files of a directory with same mtime and entry count as in last
+        scan are not stat-ed, known files are returned instead.
+        Files modified in place do not change directory mtime,
+        a full walk is needed to catch them
+        Paths on different devices are walked concurrently, one thread
+        per device, so slow disks or network mounts do not wait for
+        each other
+        Images found in walked directories are listed in
+        ScanWalker.images
+    """
+    AUDIO = ["aac", "ac3", "aif", "aifc", "aiff", "alac", "ape", "dff",
+             "dsf", "flac", "m4a", "m4b", "mka", "mp2", "mp3", "mp4",
+             "mpc", "oga", "ogg", "opus", "spx", "tta", "wav", "wma",
+             "wv"]
+    PLAYLISTS = ["asx", "m3u", "m3u8", "pls", "xspf"]
+    IGNORED = ["bmp", "cue", "db", "gif", "htm", "html", "ini", "jpeg",
+               "jpg", "log", "md5", "nfo", "pdf", "png", "sfv", "txt",
+               "url", "xml"]
+    IMAGES = ["gif", "jpeg", "jpg", "png"]
+    QUEUE_SIZE = 1000
+
+    def __init__(self, known_dirs=None, known_files=None):
+        """
+            Init walker
+            @param known_dirs as {path as string: (mtime as int, count as int)}
+            @param known_files as {path as string: {filepath as string:
+                                                    mtime as int}}
+        """
+        if known_dirs is None:
+            known_dirs = {}
+        if known_files is None:
+            known_files = {}
+        self._audio = set(self.AUDIO)
+        self._playlists = set(self.PLAYLISTS)
+        self._ignored = set(self.IGNORED)
+        self._images = set(self.IMAGES)
+        self._known_dirs = known_dirs
+        self._known_files = known_files
+        self.dirs = []
+        # Walked directories status: {path: (mtime, count)}
+        self.status = {}
+        # Images in walked directories, unchanged ones are not listed:
+        # {path: [(name, size, mtime)]}
+        self.images = {}
+        self._skipped = 0
+        self._entries = 0
+        self._files = 0
+        self._sniffed = 0
+        self._elapsed = 0
+
+    def walk(self, paths):
+        """
+            Walk paths for music files
+            @param paths as [string]
+            @return generator of (filepath as string, mtime as int)
+            Walked dirs are in ScanWalker.dirs, each file is only returned
+            once
+        """
+        # Status is keyed by path, "/music/" must be "/music"
+        paths = [os.path.normpath(path) for path in paths]
+        # Nested paths would be walked twice
+        paths = list(dict.fromkeys(paths))
+        paths = [path for path in paths
+                 if not any(path.startswith(os.path.join(other, ''))
+                            for other in paths if other != path)]
+        self.dirs = list(paths)
+        self.status = {}
+        self.images = {}
+        self._skipped = 0
+        self._entries = 0
+        self._files = 0
+        self._sniffed = 0
+        self._elapsed = 0
+        lanes = self._get_lanes(paths)
+        if len(lanes) > 1:
+            yield from self._walk_lanes(lanes)
+        else:
+            yield from self._walk(paths)
+        debug("ScanWalker::walk(): %s" % self)
+
+    def invalidate(self, path):
+        """
+            Do not remember directory status, its files will be stat-ed
+            on next walk. Use it when a file failed to be scanned
+            @param path as string
+        """
+        self.status.pop(path, None)
+
+    def get_stats(self):
+        """
+            Return walk statistics
+            @return {'entries', 'files', 'sniffed', 'skipped': int,
+                     'elapsed', 'rate': float}
+        """
+        rate = 0
+        if self._elapsed > 0:
+            rate = self._entries / self._elapsed
+        return {'entries': self._entries,
+                'files': self._files,
+                'sniffed': self._sniffed,
+                'skipped': self._skipped,
+                'elapsed': self._elapsed,
+                'rate': rate}
+
+    def __str__(self):
+        """
+            Return a human readable throughput
+        """
+        return "%(entries)s entries, %(files)s music files, "\
+               "%(sniffed)s sniffed, %(skipped)s unchanged dirs "\
+               "in %(elapsed).2fs (%(rate).0f entries/s)" % self.get_stats()
+
+#######################
+# PRIVATE             #
+#######################
+    def _get_lanes(self, paths):
+        """
+            Group paths by device
+            @param paths as [string]
+            @return [[string]]
+        """
+        lanes = {}
+        for path in paths:
+            try:
+                device = os.stat(path).st_dev
+            except Exception:
+                # Walking will fail, keep path in its own lane
+                device = path
+            lanes.setdefault(device, []).append(path)
+        return list(lanes.values())
+
+    def _walk(self, paths):
+        """
+            Walk paths one directory after another
+            @param paths as [string]
+            @return generator of (filepath as string, mtime as int)
+        """
+        start = time()
+        stack = list(reversed(paths))
+        while stack:
+            path = stack.pop()
+            subdirs = []
+            for (filepath, mtime) in self._scan_dir(path, subdirs):
+                # Do not count time spent by consumer
+                self._elapsed += time() - start
+                yield (filepath, mtime)
+                start = time()
+            self.dirs += subdirs
+            stack += reversed(subdirs)
+        self._elapsed += time() - start
+
+    def _walk_lanes(self, lanes):
+        """
+            Walk each lane in its own thread
+            @param lanes as [[string]], see _get_lanes()
+            @return generator of (filepath as string, mtime as int)
+        """
+        queue = Queue(self.QUEUE_SIZE)
+        stop = Event()
+        walkers = []
+        for paths in lanes:
+            walker = ScanWalker(self._known_dirs, self._known_files)
+            # Share results so invalidate() works while walking
+            walker.dirs = self.dirs
+            walker.status = self.status
+            walker.images = self.images
+            walkers.append(walker)
+            thread = Thread(target=self._walk_lane,
+                            args=(walker, paths, queue, stop))
+            thread.daemon = True
+            thread.start()
+        running = len(walkers)
+        try:
+            while running:
+                item = queue.get()
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+        finally:
+            # Consumer may stop early, unblock lanes
+            stop.set()
+            while running:
+                if queue.get() is None:
+                    running -= 1
+            for walker in walkers:
+                self._skipped += walker._skipped
+                self._entries += walker._entries
+                self._files += walker._files
+                self._sniffed += walker._sniffed
+            # Lanes run concurrently, slowest one is walk time
+            self._elapsed = max(walker._elapsed for walker in walkers)
+
+    def _walk_lane(self, walker, paths, queue, stop):
+        """
+            Walk paths with walker and push files to queue,
+            None is pushed when done
+            @param walker as ScanWalker
+            @param paths as [string]
+            @param queue as Queue
+            @param stop as Event
+            @thread safe
+        """
+        try:
+            for item in walker._walk(paths):
+                if stop.is_set():
+                    break
+                queue.put(item)
+        except Exception as e:
+            print("ScanWalker::_walk_lane(): %s" % e)
+        finally:
+            queue.put(None)
+
+    def _scan_dir(self, path, subdirs):
+        """
+            Scan directory
+            @param path as string
+            @param subdirs as [string], filled with sub directories
+            @return generator of (filepath as string, mtime as int)
+        """
+        try:
+            mtime = int(os.stat(path).st_mtime)
+            entries = list(os.scandir(path))
+        except Exception as e:
+            print("ScanWalker::_scan_dir(): %s" % e)
+            return
+        self.status[path] = (mtime, len(entries))
+        if self._known_dirs.get(path) == self.status[path]:
+            self._skipped += 1
+            for entry in entries:
+                self._entries += 1
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                except Exception as e:
+                    print("ScanWalker::_scan_dir(): %s" % e)
+            known_files = self._known_files.get(path, {})
+            for (filepath, mtime) in known_files.items():
+                self._files += 1
+                yield (filepath, mtime)
+            return
+        images = []
+        self.images[path] = images
+        for entry in entries:
+            self._entries += 1
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif not entry.is_file():
+                    continue
+                elif self._is_image(entry):
+                    stat = entry.stat()
+                    images.append((entry.name, stat.st_size,
+                                   int(stat.st_mtime)))
+                elif self._is_audio(entry):
+                    self._files += 1
+                    yield (entry.path, int(entry.stat().st_mtime))
+            except Exception as e:
+                print("ScanWalker::_scan_dir(): %s" % e)
+
+    def _is_image(self, entry):
+        """
+            True if entry is an image
+            @param entry as os.DirEntry
+            @return bool
+        """
+        extension = os.path.splitext(entry.name)[1][1:].lower()
+        return extension in self._images
+
+    def _is_audio(self, entry):
+        """
+            True if entry is a music file
+            @param entry as os.DirEntry
+            @return bool
+        """
+        extension = os.path.splitext(entry.name)[1][1:].lower()
+        if extension in self._audio:
+            return True
+        elif extension in self._playlists or extension in self._ignored:
+            return False
+        self._sniffed += 1
+        f = Gio.File.new_for_path(entry.path)
+        if is_pls(f):
+            return False
+        elif is_audio(f):
+            return True
+        debug("%s not detected as a music file" % entry.path)
+        return False
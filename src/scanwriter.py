@@ -0,0 +1,161 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from time import time
+
+from lollypop.define import Lp
+from lollypop.sqlcursor import SqlCursor
+from lollypop.utils import debug
+
+
+class ScanWriter:
+    """
+        Group scanned tracks in transactions:
+            - tracks and their artists/genres are inserted with executemany
+            - deferred calls run once tracks are inserted
+            - signals are emitted once batch is committed
+        A batch is written when full or INTERVAL seconds after previous
+        one, so scanned albums show up while scan is running
+        Only one writer should insert tracks at a time as track ids are
+        allocated by the writer
+    """
+    INTERVAL = 2
+
+    def __init__(self, scanner, size):
+        """
+            Init writer
+            @param scanner as CollectionScanner, used to emit signals
+            @param size as int, tracks per transaction
+        """
+        self._scanner = scanner
+        self._size = max(1, size)
+        self._next_id = Lp().tracks.get_max_id() + 1
+        self._tracks = []
+        self._track_artists = []
+        self._track_genres = []
+        self._deferred = []
+        self._deferred_once = {}
+        self._signals = []
+        self._count = 0
+        self._elapsed = 0
+        self._start = time()
+        self._last_flush = self._start
+
+    def add(self, name, filepath, duration, tracknumber, discnumber,
+            album_id, year, popularity, ltime, mtime, inode, size,
+            artist_ids, genre_ids):
+        """
+            Add a track to batch, see TracksDatabase.add()
+            @param inode as int
+            @param size as int
+            @param artist_ids as [int]
+            @param genre_ids as [int]
+            @return track id as int
+            @thread safe
+        """
+        track_id = self._next_id
+        self._next_id += 1
+        self._tracks.append((track_id, name, filepath, duration, tracknumber,
+                             discnumber, album_id, year, popularity, ltime,
+                             mtime, inode, size))
+        for artist_id in sorted(set(artist_ids), key=artist_ids.index):
+            self._track_artists.append((track_id, artist_id))
+        for genre_id in sorted(set(genre_ids), key=genre_ids.index):
+            self._track_genres.append((track_id, genre_id))
+        if len(self._tracks) >= self._size or\
+           time() - self._last_flush > self.INTERVAL:
+            self.flush()
+        return track_id
+
+    def defer(self, callback, *args):
+        """
+            Run callback once batch tracks are inserted, before commit
+            @param callback as function
+        """
+        self._deferred.append((callback, args))
+
+    def defer_once(self, key, callback, *args):
+        """
+            Same as defer() but callback only runs once for key,
+            with last args, after other deferred callbacks
+            @param key as hashable
+            @param callback as function
+        """
+        self._deferred_once[key] = (callback, args)
+
+    def emit(self, signal, *args):
+        """
+            Emit scanner signal once batch is committed
+            @param signal as str
+        """
+        self._signals.append((signal, args))
+
+    def flush(self):
+        """
+            Write batch to database and commit
+            @thread safe
+        """
+        start = time()
+        count = len(self._tracks)
+        with SqlCursor(Lp().db, True) as sql:
+            Lp().tracks.add_many(self._tracks)
+            Lp().tracks.add_artists(self._track_artists)
+            Lp().tracks.add_genres(self._track_genres)
+            for (callback, args) in self._deferred:
+                callback(*args)
+            for (callback, args) in self._deferred_once.values():
+                callback(*args)
+            sql.commit()
+        for (signal, args) in self._signals:
+            GLib.idle_add(self._scanner.emit, signal, *args)
+        self._tracks = []
+        self._track_artists = []
+        self._track_genres = []
+        self._deferred = []
+        self._deferred_once = {}
+        self._signals = []
+        self._count += count
+        self._last_flush = time()
+        self._elapsed += self._last_flush - start
+        debug("ScanWriter::flush(): %s tracks in %.3fs" % (count,
+                                                            time() - start))
+
+    def commit(self):
+        """
+            Commit scanner writes done outside of batches,
+            call it from a writer block
+        """
+        with SqlCursor(Lp().db, True) as sql:
+            sql.commit()
+
+    def get_stats(self):
+        """
+            Return insert statistics
+            @return {'tracks': int, 'elapsed', 'rate', 'total': float}
+            elapsed is time spent writing, total is writer lifetime
+        """
+        rate = 0
+        if self._elapsed > 0:
+            rate = self._count / self._elapsed
+        return {'tracks': self._count,
+                'elapsed': self._elapsed,
+                'rate': rate,
+                'total': time() - self._start}
+
+    def __str__(self):
+        """
+            Return a human readable insert rate
+        """
+        return "%(tracks)s tracks written in %(elapsed).2fs "\
+               "(%(rate).0f tracks/s)" % self.get_stats()
@@ -11,45 +11,111 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from threading import current_thread
-
-from lollypop.define import Lp
+from threading import local, Lock, RLock
 
 
 class SqlCursor:
     """
-        Context manager to get the SQL cursor
+        Context manager to get a SQL connection:
+            - nested blocks of a thread use outermost block connection
+            - connections are taken from a pool, outermost block gives
+              its connection back, uncommitted changes are rolled back
+            - writer blocks use a dedicated connection, one thread at a
+              time, so long writes never wait for a free connection
+        Connections are shared by objects of same class
     """
+    # Idle connections kept by pool
+    POOL_SIZE = 4
+    # {class name: [connection]}
+    _pools = {}
+    # {class name: (connection, lock)}
+    _writers = {}
+    _lock = Lock()
+    # Connections used by current thread: {class name: [connection, depth]}
+    _local = local()
+
     def add(obj):
         """
-            Add cursor to thread list
-            Raise an exception if cursor already exists
+            Give calling thread its own connection until it exits
+            @param obj as Database/Playlists/Radios
         """
-        name = current_thread().getName() + obj.__class__.__name__
-        Lp().cursors[name] = obj.get_cursor()
+        SqlCursor._get_cursors()[obj.__class__.__name__] = [obj.get_cursor(),
+                                                            1]
 
-    def __init__(self, obj):
+    def __init__(self, obj, writer=False):
         """
             Init object
+            @param obj as Database/Playlists/Radios
+            @param writer as bool, use dedicated writer connection,
+                   ignored in an already opened block
         """
         self._obj = obj
-        self._creator = False
+        self._name = obj.__class__.__name__
+        self._writer = writer
 
     def __enter__(self):
         """
-            Return cursor for thread, create a new one if needed
+            Return connection for thread, take one if needed
         """
-        name = current_thread().getName() + self._obj.__class__.__name__
-        if name not in Lp().cursors:
-            self._creator = True
-            Lp().cursors[name] = self._obj.get_cursor()
-        return Lp().cursors[name]
+        cursors = SqlCursor._get_cursors()
+        if self._name in cursors:
+            cursors[self._name][1] += 1
+        elif self._writer:
+            (sql, lock) = self._get_writer()
+            lock.acquire()
+            cursors[self._name] = [sql, 1]
+        else:
+            with self._lock:
+                pool = self._pools.setdefault(self._name, [])
+                sql = pool.pop() if pool else None
+            if sql is None:
+                sql = self._obj.get_cursor()
+            cursors[self._name] = [sql, 1]
+        return cursors[self._name][0]
 
     def __exit__(self, type, value, traceback):
         """
-            If creator, close cursor and remove it
+            If outermost block, give connection back
+        """
+        cursors = SqlCursor._get_cursors()
+        cursors[self._name][1] -= 1
+        if cursors[self._name][1] > 0:
+            return
+        sql = cursors.pop(self._name)[0]
+        try:
+            sql.rollback()
+        except Exception as e:
+            print("SqlCursor::__exit__(): %s" % e)
+        if self._name in self._writers and\
+           self._writers[self._name][0] is sql:
+            self._writers[self._name][1].release()
+            return
+        with self._lock:
+            pool = self._pools.setdefault(self._name, [])
+            if len(pool) < self.POOL_SIZE:
+                pool.append(sql)
+                sql = None
+        if sql is not None:
+            sql.close()
+
+#######################
+# PRIVATE             #
+#######################
+    def _get_cursors():
+        """
+            Return connections used by calling thread
+            @return {class name: [connection, depth]}
+        """
+        if not hasattr(SqlCursor._local, 'cursors'):
+            SqlCursor._local.cursors = {}
+        return SqlCursor._local.cursors
+
+    def _get_writer(self):
+        """
+            Return writer connection and its lock
+            @return (connection, RLock)
         """
-        if self._creator:
-            name = current_thread().getName() + self._obj.__class__.__name__
-            Lp().cursors[name].close()
-            del Lp().cursors[name]
+        with self._lock:
+            if self._name not in self._writers:
+                self._writers[self._name] = (self._obj.get_cursor(), RLock())
+            return self._writers[self._name]
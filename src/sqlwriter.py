@@ -0,0 +1,139 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread, current_thread, Lock
+
+from lollypop.sqlcursor import SqlCursor
+
+
+class SqlWriter:
+    """
+        Run database mutations in a single thread using writer connection:
+            - mutations are queued from any thread, in order
+            - queued mutations are grouped in one commit
+            - a mutation failing is rolled back alone
+        Mutations must not commit, callers get a Future
+    """
+    # Max mutations by commit
+    BATCH_SIZE = 100
+    # Time to wait for more mutations before commit, in seconds
+    COMMIT_DELAY = 0.05
+
+    def __init__(self, obj):
+        """
+            Init writer, thread is started on first write
+            @param obj as Database/Playlists
+        """
+        self._obj = obj
+        self._queue = Queue()
+        self._thread = None
+        self._lock = Lock()
+
+    def write(self, function, *args, callback=None):
+        """
+            Queue function call
+            @param function as function, called with writer connection
+            @param args as function arguments
+            @param callback as function(result), called from main loop
+            @return Future
+            @thread safe
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(
+                lambda f: f.exception() is None and
+                GLib.idle_add(callback, f.result()))
+        # Already in writer thread, do not wait for ourself
+        if current_thread() is self._thread:
+            self._run(function, args, future)
+            return future
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._loop,
+                                      name=self.__class__.__name__)
+                self._thread.daemon = True
+                self._thread.start()
+        self._queue.put((function, args, future))
+        return future
+
+    def stop(self):
+        """
+            Wait for queued mutations to be committed
+        """
+        self._queue.join()
+
+#######################
+# PRIVATE             #
+#######################
+    def _loop(self):
+        """
+            Get queued mutations, run them and commit
+        """
+        while True:
+            items = [self._queue.get()]
+            with SqlCursor(self._obj, True) as sql:
+                results = [self._run(*items[0][:2])]
+                while len(items) < self.BATCH_SIZE:
+                    try:
+                        items.append(self._queue.get(
+                                                timeout=self.COMMIT_DELAY))
+                    except Empty:
+                        break
+                    results.append(self._run(*items[-1][:2]))
+                try:
+                    sql.commit()
+                except Exception as e:
+                    print("SqlWriter::_loop(): %s" % e)
+                    sql.rollback()
+                    results = [e] * len(items)
+            for ((function, args, future), result) in zip(items, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+                self._queue.task_done()
+
+    def _run(self, function, args, future=None):
+        """
+            Run function in a savepoint, rolled back on error
+            @param function as function
+            @param args as function arguments
+            @param future as Future, set now if not None
+            @return function result or Exception
+        """
+        with SqlCursor(self._obj, True) as sql:
+            if not sql.in_transaction:
+                sql.execute("BEGIN")
+            sql.execute("SAVEPOINT mutation")
+            try:
+                result = function(*args)
+                # Function may have committed itself
+                if sql.in_transaction:
+                    sql.execute("RELEASE mutation")
+            except Exception as e:
+                print("SqlWriter::_run(): %s" % e)
+                try:
+                    sql.execute("ROLLBACK TO mutation")
+                    sql.execute("RELEASE mutation")
+                except:  # Savepoint committed by function
+                    sql.rollback()
+                result = e
+        if future is not None:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        return result
@@ -15,11 +15,16 @@ gi.require_version('GstPbutils', '1.0')
 from gi.repository import GLib, Gst, GstPbutils
 
 import os
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from time import time
 
 from gettext import gettext as _
 
 from lollypop.define import Lp, Type
-from lollypop.utils import format_artist_name
+from lollypop.utils import format_artist_name, debug
+from lollypop.tagreader_fast import FastTagReader, FastImage
+from lollypop.scanthrottle import lower_priority
 
 
 class TagReader:
@@ -51,6 +56,243 @@ class TagReader:
         infos = self._tagreader.discover_uri(uri)
         return infos
 
+    def set_timeout(self, timeout):
+        """
+            Set discovery timeout
+            @param timeout as float, in seconds
+        """
+        self._tagreader.set_property('timeout', int(timeout * Gst.SECOND))
+
+    def get_image(self, tags):
+        """
+            Return first embedded image
+            @param tags as Gst.TagList/FastTags
+            @return image data as bytes or None
+        """
+        if tags is None:
+            return None
+        (exist, sample) = tags.get_sample_index('image', 0)
+        if not exist:
+            return None
+        if isinstance(sample, FastImage):
+            return sample.get_data()
+        buf = sample.get_buffer()
+        (exist, mapinfo) = buf.map(Gst.MapFlags.READ)
+        if not exist:
+            return None
+        data = bytes(mapinfo.data)
+        buf.unmap(mapinfo)
+        return data
+
+
+class TagReaderPool:
+    """
+        Pool of tag readers, each worker owns its discoverer.
+        Discoverer timeout adapts to average discovery time and file size
+    """
+    # Discoverer timeout bounds, in seconds
+    MIN_TIMEOUT = 2
+    MAX_TIMEOUT = 10
+    # Allowed slowdown against average discovery time
+    TIMEOUT_FACTOR = 10
+    # Extra time given to big files, in bytes per second
+    TIMEOUT_RATE = 10 * 1024 * 1024
+
+    def __init__(self, count=0, low_priority=False):
+        """
+            Init pool
+            @param count as int, 0 means one worker per CPU
+            @param low_priority as bool, run feeder and workers with idle
+                   CPU and I/O priority
+        """
+        if count <= 0:
+            count = os.cpu_count() or 1
+        self._count = count
+        self._low_priority = low_priority
+        self._cancelled = False
+        # Average discovery time, in seconds, guarded by lock
+        self._average = None
+        self._lock = Lock()
+        self._stats = {'fast': 0, 'discoverer': 0, 'errors': 0,
+                       'elapsed': 0}
+
+    def get_count(self):
+        """
+            Return worker count
+            @return int
+        """
+        return self._count
+
+    def cancel(self):
+        """
+            Stop feeding workers, pending results are dropped
+        """
+        self._cancelled = True
+
+    def get_stats(self):
+        """
+            Return tag reading statistics, updated when workers exit
+            @return {'fast', 'discoverer', 'errors': int, 'elapsed': float}
+            elapsed is time spent reading tags summed over workers
+        """
+        return dict(self._stats)
+
+    def discover(self, items):
+        """
+            Read tags for items in workers
+            @param items as iterable of (filepath as str, data)
+            @return generator of (filepath, data,
+                                  GstPbutils.DiscovererInfo/None,
+                                  Exception/None)
+            Results are yielded in completion order, error is a
+            TimeoutError if discovery timed out
+        """
+        self._cancelled = False
+        # Bounded, so feeding never runs far ahead of discovery
+        todo = Queue(self._count * 4)
+        done = Queue(self._count * 4)
+        feeder = Thread(target=self._feed, args=(items, todo))
+        feeder.daemon = True
+        feeder.start()
+        for i in range(0, self._count):
+            worker = Thread(target=self._work, args=(todo, done))
+            worker.daemon = True
+            worker.start()
+        running = self._count
+        while running and not self._cancelled:
+            try:
+                result = done.get(timeout=1)
+            except Empty:
+                continue
+            if result is None:
+                running -= 1
+            else:
+                yield result
+
+#######################
+# PRIVATE             #
+#######################
+    def _feed(self, items, todo):
+        """
+            Push items to workers, then one end marker per worker.
+            Items may be a generator, it then runs in this thread
+            @param items as iterable
+            @param todo as Queue
+        """
+        if self._low_priority:
+            # Walker threads started from here inherit it
+            lower_priority()
+        try:
+            for item in items:
+                if self._cancelled:
+                    break
+                todo.put(item)
+        except Exception as e:
+            print("TagReaderPool::_feed(): %s" % e)
+        for i in range(0, self._count):
+            todo.put(None)
+
+    def _work(self, todo, done):
+        """
+            Discover items until end marker, headers are parsed by
+            FastTagReader, GStreamer is only used when it fails
+            @param todo as Queue
+            @param done as Queue
+        """
+        if self._low_priority:
+            lower_priority()
+        fast_tagreader = FastTagReader()
+        tagreader = None
+        stats = dict.fromkeys(self._stats.keys(), 0)
+        while True:
+            item = todo.get()
+            if item is None:
+                break
+            if self._cancelled:
+                continue
+            (filepath, data) = item
+            start = time()
+            try:
+                infos = fast_tagreader.get_infos(filepath)
+                if infos is None:
+                    if tagreader is None:
+                        tagreader = TagReader()
+                    stats['discoverer'] += 1
+                    infos = self._discover(tagreader, filepath)
+                else:
+                    stats['fast'] += 1
+                result = (filepath, data, infos, None)
+            except Exception as e:
+                stats['errors'] += 1
+                result = (filepath, data, None, e)
+            stats['elapsed'] += time() - start
+            self._put(done, result)
+        with self._lock:
+            for (key, value) in stats.items():
+                self._stats[key] += value
+        self._put(done, None)
+
+    def _discover(self, tagreader, filepath):
+        """
+            Discover file with an adaptive timeout
+            @param tagreader as TagReader
+            @param filepath as str
+            @return GstPbutils.DiscovererInfo
+            @raise TimeoutError, GLib.Error
+            A file timing out is retried once with MAX_TIMEOUT
+        """
+        timeouts = [self._get_timeout(filepath)]
+        if timeouts[0] < self.MAX_TIMEOUT:
+            timeouts.append(self.MAX_TIMEOUT)
+        for timeout in timeouts:
+            tagreader.set_timeout(timeout)
+            start = time()
+            infos = tagreader.get_infos(filepath)
+            if infos.get_result() != GstPbutils.DiscovererResult.TIMEOUT:
+                break
+            debug("TagReaderPool::_discover(): %s timed out after %.1fs" %
+                  (filepath, timeout))
+        else:
+            raise TimeoutError("Discovery timed out after %.1fs" % timeout)
+        elapsed = time() - start
+        # Shared by workers
+        with self._lock:
+            if self._average is None:
+                self._average = elapsed
+            else:
+                self._average = 0.9 * self._average + 0.1 * elapsed
+        return infos
+
+    def _get_timeout(self, filepath):
+        """
+            Return discovery timeout for file
+            @param filepath as str
+            @return timeout in seconds as float
+        """
+        with self._lock:
+            average = self._average
+        if average is None:
+            return self.MAX_TIMEOUT
+        timeout = max(self.MIN_TIMEOUT, self.TIMEOUT_FACTOR * average)
+        try:
+            timeout += os.path.getsize(filepath) / self.TIMEOUT_RATE
+        except:
+            pass
+        return min(self.MAX_TIMEOUT, timeout)
+
+    def _put(self, done, result):
+        """
+            Put result in queue, give up if pool cancelled
+            @param done as Queue
+            @param result as tuple/None
+        """
+        while not self._cancelled:
+            try:
+                done.put(result, timeout=1)
+                break
+            except Full:
+                pass
+
 
 class ScannerTagReader(TagReader):
     """
@@ -62,6 +304,16 @@ class ScannerTagReader(TagReader):
             Init tag reader
         """
         TagReader.__init__(self)
+        # Scan caches, see init_cache()
+        self._artist_ids = {}
+        self._artist_names = {}
+        self._sortnames = {}
+        self._genre_ids = {}
+        self._genre_names = {}
+        self._album_ids = {}
+        self._album_keys = {}
+        self._album_paths = {}
+        self._album_genres = {}
 
     def get_title(self, tags, filepath):
         """
@@ -207,6 +459,63 @@ class ScannerTagReader(TagReader):
             year = None
         return year
 
+    def init_cache(self):
+        """
+            Load artist, genre and album ids from db in one go,
+            db is then only queried on cache miss
+        """
+        self._artist_ids = {}
+        self._artist_names = {}
+        self._sortnames = {}
+        for (artist_id, name, sortname) in Lp().artists.get_all():
+            self._artist_ids[name] = artist_id
+            self._artist_names[artist_id] = name
+            self._sortnames[artist_id] = sortname
+        self._genre_ids = {}
+        self._genre_names = {}
+        for (genre_id, name) in Lp().genres.get():
+            self._genre_ids[name] = genre_id
+            self._genre_names[genre_id] = name
+        self._album_ids = {}
+        self._album_keys = {}
+        self._album_paths = {}
+        for (album_id, name, artist_id, year,
+             no_album_artist, path) in Lp().albums.get_all():
+            key = self._get_album_key(name, artist_id, no_album_artist, year)
+            self._album_ids[key] = album_id
+            self._album_keys[album_id] = key
+            self._album_paths[album_id] = path
+        self._album_genres = {}
+        for (album_id, genre_id) in Lp().albums.get_all_genre_ids():
+            self._album_genres.setdefault(album_id, set()).add(genre_id)
+
+    def forget_artist(self, artist_id):
+        """
+            Remove deleted artist from cache
+            @param artist id as int
+        """
+        name = self._artist_names.pop(artist_id, None)
+        self._artist_ids.pop(name, None)
+        self._sortnames.pop(artist_id, None)
+
+    def forget_genre(self, genre_id):
+        """
+            Remove deleted genre from cache
+            @param genre id as int
+        """
+        name = self._genre_names.pop(genre_id, None)
+        self._genre_ids.pop(name, None)
+
+    def forget_album(self, album_id):
+        """
+            Remove deleted or modified album from cache
+            @param album id as int
+        """
+        key = self._album_keys.pop(album_id, None)
+        self._album_ids.pop(key, None)
+        self._album_paths.pop(album_id, None)
+        self._album_genres.pop(album_id, None)
+
     def add_artists(self, artists, album_artist, sortname):
         """
             Add artists to db
@@ -221,13 +530,14 @@ class ScannerTagReader(TagReader):
         artist_ids = []
         for artist in artists.split(';'):
             # Get artist id, add it if missing
-            artist_id = Lp().artists.get_id(artist)
+            artist_id = self._get_artist_id(artist)
             if artist_id is None:
-                artist_id = Lp().artists.add(artist, sortname)
+                artist_id = self._add_artist(artist, sortname)
                 if artist == album_artist:
                     new_artist_ids.append(artist_id)
-            elif sortname != "":
+            elif sortname != "" and self._sortnames.get(artist_id) != sortname:
                 Lp().artists.set_sortname(artist_id, sortname)
+                self._sortnames[artist_id] = sortname
             artist_ids.append(artist_id)
         return (artist_ids, new_artist_ids)
 
@@ -242,9 +552,9 @@ class ScannerTagReader(TagReader):
         new = False
         if album_artist:
             # Get album artist id, add it if missing
-            album_artist_id = Lp().artists.get_id(album_artist)
+            album_artist_id = self._get_artist_id(album_artist)
             if album_artist_id is None:
-                album_artist_id = Lp().artists.add(album_artist,
+                album_artist_id = self._add_artist(album_artist,
                                                    format_artist_name(
                                                                  album_artist))
                 new = True
@@ -262,14 +572,24 @@ class ScannerTagReader(TagReader):
         new_genre_ids = []
         for genre in genres.split(';'):
             # Get genre id, add genre if missing
-            genre_id = Lp().genres.get_id(genre)
+            genre_id = self._genre_ids.get(genre)
+            if genre_id is None:
+                genre_id = Lp().genres.get_id(genre)
             if genre_id is None:
                 genre_id = Lp().genres.add(genre)
                 new_genre_ids.append(genre_id)
+            self._genre_ids[genre] = genre_id
+            self._genre_names[genre_id] = genre
             genre_ids.append(genre_id)
 
+        album_genres = self._album_genres.get(album_id)
+        if album_genres is None:
+            album_genres = set(Lp().albums.get_genre_ids(album_id))
+            self._album_genres[album_id] = album_genres
         for genre_id in genre_ids:
-            Lp().albums.add_genre(album_id, genre_id)
+            if genre_id not in album_genres:
+                Lp().albums.add_genre(album_id, genre_id)
+                album_genres.add(genre_id)
         return (genre_ids, new_genre_ids)
 
     def add_album(self, album_name, artist_id, no_album_artist,
@@ -285,43 +605,105 @@ class ScannerTagReader(TagReader):
             @param mtime as int
             @return (album id as int, new as bool)
             @commit needed
+            Album artist of albums without album artist is not handled,
+            see set_compilation_artist()
         """
         path = os.path.dirname(filepath)
         new = False
-        if no_album_artist:
-            album_id = Lp().albums.get_compilation_id(album_name, year)
-        else:
-            album_id = Lp().albums.get_non_compilation_id(album_name,
-                                                          artist_id,
-                                                          year)
+        key = self._get_album_key(album_name, artist_id, no_album_artist, year)
+        album_id = self._album_ids.get(key)
+        if album_id is None:
+            if no_album_artist:
+                album_id = Lp().albums.get_compilation_id(album_name, year)
+            else:
+                album_id = Lp().albums.get_non_compilation_id(album_name,
+                                                              artist_id,
+                                                              year)
+            if album_id is not None:
+                self._album_paths[album_id] = Lp().albums.get_path(album_id)
         if album_id is None:
             new = True
             album_id = Lp().albums.add(album_name, artist_id, no_album_artist,
                                        year, path, popularity, mtime)
+            self._album_paths[album_id] = path
+        self._album_ids[key] = album_id
+        self._album_keys[album_id] = key
         # Now we have our album id, check if path doesn't change
-        if Lp().albums.get_path(album_id) != path:
+        if self._album_paths[album_id] != path:
             Lp().albums.set_path(album_id, path)
+            self._album_paths[album_id] = path
+        return (album_id, new)
 
-        # If no album artist, handle album artist id for compilations
+    def set_compilation_artist(self, album_id, artist_id):
+        """
+            Set artist for album without album artist,
+            compilation if its tracks have many artists
+            @param album id as int
+            @param artist id as int, used if not a compilation
+            @commit needed
+        """
+        if Lp().albums.is_compilation(album_id):
+            Lp().albums.set_artist_id(album_id, Type.COMPILATIONS)
+        else:
+            Lp().albums.set_artist_id(album_id, artist_id)
+
+    def move_album(self, album_id, old_path, path):
+        """
+            Follow album moved from old path to path
+            @param album id as int
+            @param old path as string
+            @param path as string
+            @commit needed
+        """
+        if self._album_paths.get(album_id) == old_path:
+            Lp().albums.set_path(album_id, path)
+            self._album_paths[album_id] = path
+
+#######################
+# PRIVATE             #
+#######################
+    def _get_album_key(self, name, artist_id, no_album_artist, year):
+        """
+            Return album cache key, compilations ignore artist
+            @param name as string
+            @param artist id as int
+            @param no album artist as bool
+            @param year as int
+            @return tuple
+        """
         if no_album_artist:
-            if Lp().albums.is_compilation(album_id):
-                Lp().albums.set_artist_id(album_id,
-                                          Type.COMPILATIONS)
-            else:
-                Lp().albums.set_artist_id(album_id,
-                                          artist_id)
-        return (album_id, new)
+            return (name, None, True, year)
+        else:
+            return (name, artist_id, False, year)
+
+    def _get_artist_id(self, name):
+        """
+            Return artist id for name, from cache if possible
+            @param name as string
+            @return artist id as int/None
+        """
+        artist_id = self._artist_ids.get(name)
+        if artist_id is None:
+            artist_id = Lp().artists.get_id(name)
+            if artist_id is not None:
+                self._artist_ids[name] = artist_id
+                self._artist_names[artist_id] = name
+                self._sortnames[artist_id] = Lp().artists.get_sortname(
+                                                                    artist_id)
+        return artist_id
 
-    def update_track(self, track_id, artist_ids, genre_ids):
+    def _add_artist(self, name, sortname):
         """
-            Set track artists/genres
-            @param track id as int
-            @param artist ids as [int]
-            @param genre ids as [int]
+            Add artist to db and cache
+            @param name as string
+            @param sortname as string
+            @return artist id as int
             @commit needed
         """
-        # Set artists/genres for track
-        for artist_id in artist_ids:
-            Lp().tracks.add_artist(track_id, artist_id)
-        for genre_id in genre_ids:
-            Lp().tracks.add_genre(track_id, genre_id)
+        artist_id = Lp().artists.add(name, sortname)
+        if sortname == "":
+            sortname = format_artist_name(name)
+        self._artist_ids[name] = artist_id
+        self._artist_names[artist_id] = name
+        self._sortnames[artist_id] = sortname
+        return artist_id
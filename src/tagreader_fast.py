@@ -0,0 +1,983 @@
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from base64 import b64decode
+from io import BytesIO
+import os
+import re
+import struct
+
+from lollypop.utils import debug
+
+
+# ID3v1 genres, with Winamp extensions
+ID3_GENRES = [
+    "Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge",
+    "Hip-Hop", "Jazz", "Metal", "New Age", "Oldies", "Other", "Pop", "R&B",
+    "Rap", "Reggae", "Rock", "Techno", "Industrial", "Alternative", "Ska",
+    "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient",
+    "Trip-Hop", "Vocal", "Jazz+Funk", "Fusion", "Trance", "Classical",
+    "Instrumental", "Acid", "House", "Game", "Sound Clip", "Gospel", "Noise",
+    "AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative",
+    "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic", "Darkwave",
+    "Techno-Industrial", "Electronic", "Pop-Folk", "Eurodance", "Dream",
+    "Southern Rock", "Comedy", "Cult", "Gangsta", "Top 40", "Christian Rap",
+    "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave",
+    "Psychadelic", "Rave", "Showtunes", "Trailer", "Lo-Fi", "Tribal",
+    "Acid Punk", "Acid Jazz", "Polka", "Retro", "Musical", "Rock & Roll",
+    "Hard Rock", "Folk", "Folk-Rock", "National Folk", "Swing", "Fast Fusion",
+    "Bebob", "Latin", "Revival", "Celtic", "Bluegrass", "Avantgarde",
+    "Gothic Rock", "Progressive Rock", "Psychedelic Rock", "Symphonic Rock",
+    "Slow Rock", "Big Band", "Chorus", "Easy Listening", "Acoustic", "Humour",
+    "Speech", "Chanson", "Opera", "Chamber Music", "Sonata", "Symphony",
+    "Booty Bass", "Primus", "Porn Groove", "Satire", "Slow Jam", "Club",
+    "Tango", "Samba", "Folklore", "Ballad", "Power Ballad", "Rhythmic Soul",
+    "Freestyle", "Duet", "Punk Rock", "Drum Solo", "A capella", "Euro-House",
+    "Dance Hall", "Goa", "Drum & Bass", "Club-House", "Hardcore", "Terror",
+    "Indie", "BritPop", "Negerpunk", "Polsk Punk", "Beat",
+    "Christian Gangsta Rap", "Heavy Metal", "Black Metal", "Crossover",
+    "Contemporary Christian", "Christian Rock", "Merengue", "Salsa",
+    "Thrash Metal", "Anime", "JPop", "Synthpop"]
+
+
+class FastDate:
+    """
+        Date as returned by FastTags.get_date()
+    """
+
+    def __init__(self, year):
+        """
+            Init date
+            @param year as int
+        """
+        self._year = year
+
+    def get_year(self):
+        """
+            Return year
+            @return int
+        """
+        return self._year
+
+
+class FastImage:
+    """
+        Embedded image, data is read from file when needed
+    """
+
+    def __init__(self, path=None, offset=0, size=0, data=None):
+        """
+            Init image, give data or its location in file
+            @param path as str
+            @param offset as int
+            @param size as int
+            @param data as bytes
+        """
+        self._path = path
+        self._offset = offset
+        self._size = size
+        self._data = data
+
+    def get_data(self):
+        """
+            Return image data
+            @return bytes
+        """
+        if self._data is not None:
+            return self._data
+        with open(self._path, "rb") as f:
+            f.seek(self._offset)
+            return f.read(self._size)
+
+
+class FastTags:
+    """
+        Tags read by FastTagReader, same API as the Gst.TagList subset
+        used by ScannerTagReader
+    """
+
+    def __init__(self):
+        """
+            Init tags
+        """
+        self._tags = {}
+
+    def add(self, tag, value):
+        """
+            Add value for tag, empty values are ignored
+            @param tag as str, a GStreamer tag name
+            @param value as str/int
+        """
+        if value is not None and value != "":
+            self._tags.setdefault(tag, []).append(value)
+
+    def get_tag_size(self, tag):
+        """
+            Return value count for tag
+            @param tag as str
+            @return int
+        """
+        return len(self._tags.get(tag, []))
+
+    def get_string_index(self, tag, index):
+        """
+            Return string value at index
+            @param tag as str
+            @param index as int
+            @return (exist as bool, value as str)
+        """
+        values = self._tags.get(tag, [])
+        if index < len(values):
+            return (True, values[index])
+        return (False, None)
+
+    def get_uint_index(self, tag, index):
+        """
+            Return uint value at index
+            @param tag as str
+            @param index as int
+            @return (exist as bool, value as int)
+        """
+        return self.get_string_index(tag, index)
+
+    def add_image(self, image, front):
+        """
+            Add an image, front covers are returned first
+            @param image as FastImage
+            @param front as bool
+        """
+        if front:
+            self._tags.setdefault("image", []).insert(0, image)
+        else:
+            self.add("image", image)
+
+    def get_sample_index(self, tag, index):
+        """
+            Return image at index, a FastImage, not a Gst.Sample
+            @param tag as str
+            @param index as int
+            @return (exist as bool, FastImage)
+        """
+        return self.get_string_index(tag, index)
+
+    def get_date(self, tag):
+        """
+            Return date for tag
+            @param tag as str
+            @return (exist as bool, FastDate)
+        """
+        (exist, year) = self.get_string_index(tag, 0)
+        if exist:
+            return (True, FastDate(year))
+        return (False, None)
+
+    def get_date_time(self, tag):
+        """
+            Dates are only stored in 'date'
+            @param tag as str
+            @return (False, None)
+        """
+        return (False, None)
+
+
+class FastInfos:
+    """
+        Same API as the GstPbutils.DiscovererInfo subset used by scanner
+    """
+
+    def __init__(self, tags, duration):
+        """
+            Init infos
+            @param tags as FastTags
+            @param duration as float, in seconds
+        """
+        self._tags = tags
+        self._duration = duration
+
+    def get_tags(self):
+        """
+            Return tags
+            @return FastTags
+        """
+        return self._tags
+
+    def get_duration(self):
+        """
+            Return duration
+            @return duration in nanoseconds as int
+        """
+        return int(self._duration * 1000000000)
+
+
+class FastTagReader:
+    """
+        Read tags from file headers only, no GStreamer pipeline:
+            - MP3: ID3v2/ID3v1 tags, Xing/VBRI or CBR duration
+            - FLAC: Vorbis comments and STREAMINFO
+            - Ogg: Vorbis, Opus, Speex and FLAC streams
+            - MP4: iTunes atoms and mvhd duration
+        Embedded images are located, not read, when stored as is in file
+        get_infos() returns None for anything it can not parse,
+        caller should then fallback to TagReader
+    """
+    # Never read more than this for a metadata block
+    _MAX_READ = 16 * 1024 * 1024
+    # Search audio frames/last Ogg page in this many bytes
+    _SEARCH_SIZE = 64 * 1024
+    # Picture header (mime type, description) must fit in this many bytes
+    _PICTURE_HEADER_SIZE = 4096
+    # ID3/FLAC picture type
+    _FRONT_COVER = 3
+
+    _ID3_FRAMES = {
+        "TIT2": "title", "TT2": "title",
+        "TPE1": "artist", "TP1": "artist",
+        "TPE2": "album-artist", "TP2": "album-artist",
+        "TALB": "album", "TAL": "album",
+        "TCON": "genre", "TCO": "genre",
+        "TRCK": "track-number", "TRK": "track-number",
+        "TPOS": "album-disc-number", "TPA": "album-disc-number",
+        "TDRC": "date", "TYER": "date", "TYE": "date",
+        "TSOP": "artist-sortname", "XSOP": "artist-sortname",
+        "TSP": "artist-sortname"
+    }
+    _VORBIS_FIELDS = {
+        "TITLE": "title",
+        "ARTIST": "artist",
+        "ALBUMARTIST": "album-artist",
+        "ALBUM ARTIST": "album-artist",
+        "ALBUM": "album",
+        "GENRE": "genre",
+        "TRACKNUMBER": "track-number",
+        "DISCNUMBER": "album-disc-number",
+        "DATE": "date",
+        "ARTISTSORT": "artist-sortname"
+    }
+    _MP4_ATOMS = {
+        b"\xa9nam": "title",
+        b"\xa9ART": "artist",
+        b"aART": "album-artist",
+        b"\xa9alb": "album",
+        b"\xa9gen": "genre",
+        b"\xa9day": "date",
+        b"soar": "artist-sortname"
+    }
+    _MPEG_BITRATES = {
+        (1, 1): [0, 32, 64, 96, 128, 160, 192, 224,
+                 256, 288, 320, 352, 384, 416, 448],
+        (1, 2): [0, 32, 48, 56, 64, 80, 96, 112,
+                 128, 160, 192, 224, 256, 320, 384],
+        (1, 3): [0, 32, 40, 48, 56, 64, 80, 96,
+                 112, 128, 160, 192, 224, 256, 320],
+        (2, 1): [0, 32, 48, 56, 64, 80, 96, 112,
+                 128, 144, 160, 176, 192, 224, 256],
+        (2, 2): [0, 8, 16, 24, 32, 40, 48, 56,
+                 64, 80, 96, 112, 128, 144, 160]
+    }
+    _MPEG_RATES = {1: [44100, 48000, 32000],
+                   2: [22050, 24000, 16000],
+                   2.5: [11025, 12000, 8000]}
+
+    def get_infos(self, path):
+        """
+            Return informations on file at path
+            @param path as str
+            @return FastInfos/None
+        """
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                head = f.read(12)
+                f.seek(0)
+                if head[0:3] == b"ID3" or self._is_mpeg_header(head[0:4]):
+                    return self._read_id3(f, size)
+                elif head[0:4] == b"fLaC":
+                    return self._read_flac(f)
+                elif head[0:4] == b"OggS":
+                    return self._read_ogg(f, size)
+                elif head[4:8] == b"ftyp":
+                    return self._read_mp4(f, size)
+        except Exception as e:
+            debug("FastTagReader::get_infos(): %s, %s" % (path, e))
+        return None
+
+#######################
+# PRIVATE             #
+#######################
+    def _read(self, f, size):
+        """
+            Read size bytes from f
+            @param f as file
+            @param size as int
+            @return bytes
+            @raise IOError if size is too big or file truncated
+        """
+        if size > self._MAX_READ:
+            raise IOError("block too big: %s" % size)
+        data = f.read(size)
+        if len(data) != size:
+            raise IOError("truncated file")
+        return data
+
+    def _add_values(self, tags, tag, values):
+        """
+            Add string values to tags, convert numbers and dates
+            @param tags as FastTags
+            @param tag as str
+            @param values as [str]
+        """
+        for value in values:
+            value = value.strip()
+            if tag in ["track-number", "album-disc-number"]:
+                match = re.match(r"\s*(\d+)", value)
+                if match is not None:
+                    tags.add(tag, int(match.group(1)))
+            elif tag == "date":
+                match = re.search(r"(\d{4})", value)
+                if match is not None and tags.get_tag_size(tag) == 0:
+                    tags.add(tag, int(match.group(1)))
+            elif tag == "genre":
+                tags.add(tag, self._get_genre(value))
+            else:
+                tags.add(tag, value)
+
+    def _get_genre(self, value):
+        """
+            Resolve ID3v1 genre references like "(17)", "17" or "(17)Rock"
+            @param value as str
+            @return genre as str
+        """
+        match = re.match(r"^\((\d+)\)(.*)$", value)
+        if match is not None:
+            if match.group(2):
+                return match.group(2)
+            value = match.group(1)
+        if value.isdigit() and int(value) < len(ID3_GENRES):
+            return ID3_GENRES[int(value)]
+        return value
+
+    # ID3 / MP3
+    def _read_id3(self, f, size):
+        """
+            Read ID3 tags and MP3 duration
+            @param f as file at offset 0
+            @param size as int, file size
+            @return FastInfos/None
+        """
+        tags = FastTags()
+        audio_start = 0
+        header = f.read(10)
+        if header[0:3] == b"ID3":
+            major = header[3]
+            flags = header[5]
+            tag_size = self._syncsafe(header[6:10])
+            audio_start = 10 + tag_size
+            if flags & 0x10:  # Footer
+                audio_start += 10
+            self._read_id3v2(f, major, flags, tag_size, tags)
+            # FLAC file with ID3 tags
+            f.seek(audio_start)
+            if f.read(4) == b"fLaC":
+                f.seek(audio_start)
+                return self._read_flac(f)
+        audio_end = size
+        f.seek(max(0, size - 128))
+        v1 = f.read(128)
+        if v1[0:3] == b"TAG":
+            audio_end -= 128
+            if tags.get_tag_size("title") == 0:
+                self._read_id3v1(v1, tags)
+        duration = self._get_mpeg_duration(f, audio_start, audio_end)
+        if duration is None:
+            return None
+        return FastInfos(tags, duration)
+
+    def _syncsafe(self, data):
+        """
+            Decode a syncsafe integer
+            @param data as bytes
+            @return int
+        """
+        value = 0
+        for byte in data:
+            value = (value << 7) | (byte & 0x7f)
+        return value
+
+    def _read_id3v2(self, f, major, flags, tag_size, tags):
+        """
+            Read ID3v2 frames
+            @param f as file after tag header
+            @param major as int, ID3v2 version
+            @param flags as int, tag flags
+            @param tag_size as int
+            @param tags as FastTags
+        """
+        if major not in [2, 3, 4]:
+            return
+        if flags & 0x80 and major < 4:
+            # Whole tag unsynchronisation, read it and undo it
+            data = self._read(f, tag_size).replace(b"\xff\x00", b"\xff")
+            f = BytesIO(data)
+            end = len(data)
+        else:
+            end = f.tell() + tag_size
+        if flags & 0x40 and major > 2:  # Extended header
+            ext_size = struct.unpack(">I", f.read(4))[0]
+            if major == 4:
+                f.seek(self._syncsafe(struct.pack(">I", ext_size)) - 4, 1)
+            else:
+                f.seek(ext_size, 1)
+        id_size = 3 if major == 2 else 4
+        header_size = 6 if major == 2 else 10
+        while f.tell() + header_size <= end:
+            header = f.read(header_size)
+            frame_id = header[0:id_size]
+            if not frame_id.strip(b"\x00") or\
+               not frame_id.isalnum():  # Padding
+                break
+            frame_id = frame_id.decode("ascii")
+            if major == 2:
+                frame_size = int.from_bytes(header[3:6], "big")
+                frame_flags = 0
+            elif major == 3:
+                frame_size = struct.unpack(">I", header[4:8])[0]
+                frame_flags = header[9]
+            else:
+                frame_size = self._syncsafe(header[4:8])
+                frame_flags = header[9]
+            if frame_id in ["APIC", "PIC"]:
+                self._read_id3_picture(f, major, frame_size, frame_flags,
+                                       tags)
+                continue
+            tag = self._ID3_FRAMES.get(frame_id)
+            if tag is None:
+                f.seek(frame_size, 1)
+                continue
+            data = self._read(f, frame_size)
+            if major == 3 and frame_flags & 0xc0:
+                continue  # Compressed/encrypted
+            elif major == 3 and frame_flags & 0x20:
+                data = data[1:]  # Grouping
+            elif major == 4:
+                if frame_flags & 0x0c:
+                    continue  # Compressed/encrypted
+                if frame_flags & 0x40:
+                    data = data[1:]  # Grouping
+                if frame_flags & 0x01:
+                    data = data[4:]  # Data length indicator
+                if frame_flags & 0x02:
+                    data = data.replace(b"\xff\x00", b"\xff")
+            self._add_values(tags, tag, self._decode_id3_text(data))
+
+    def _read_id3_picture(self, f, major, frame_size, frame_flags, tags):
+        """
+            Read ID3v2 picture frame, only image location is kept if
+            frame is stored as is
+            @param f as file at frame data
+            @param major as int, ID3v2 version
+            @param frame_size as int
+            @param frame_flags as int
+            @param tags as FastTags
+        """
+        start = f.tell()
+        end = start + frame_size
+        try:
+            if frame_flags or not hasattr(f, "name"):
+                data = self._read(f, frame_size)
+                if major == 3 and frame_flags & 0xc0 or\
+                   major == 4 and frame_flags & 0x0c:
+                    return  # Compressed/encrypted
+                elif major == 3 and frame_flags & 0x20:
+                    data = data[1:]
+                elif major == 4:
+                    if frame_flags & 0x40:
+                        data = data[1:]
+                    if frame_flags & 0x01:
+                        data = data[4:]
+                    if frame_flags & 0x02:
+                        data = data.replace(b"\xff\x00", b"\xff")
+                (picture_type, offset) = self._parse_id3_picture(data, major)
+                image = FastImage(data=data[offset:])
+            else:
+                data = f.read(min(frame_size, self._PICTURE_HEADER_SIZE))
+                (picture_type, offset) = self._parse_id3_picture(data, major)
+                image = FastImage(f.name, start + offset, frame_size - offset)
+            tags.add_image(image, picture_type == self._FRONT_COVER)
+        except (IndexError, ValueError) as e:
+            debug("FastTagReader::_read_id3_picture(): %s" % e)
+        finally:
+            f.seek(end)
+
+    def _parse_id3_picture(self, data, major):
+        """
+            Parse ID3v2 picture frame header
+            @param data as bytes, frame start
+            @param major as int, ID3v2 version
+            @return (picture type as int, image offset as int)
+            @raise ValueError/IndexError if header is not in data
+        """
+        encoding = data[0]
+        if major == 2:
+            # Encoding and image format
+            offset = 4
+        else:
+            # Encoding and mime type
+            offset = data.index(b"\x00", 1) + 1
+        picture_type = data[offset]
+        offset += 1
+        # Description
+        if encoding in [1, 2]:
+            while data[offset:offset + 2] != b"\x00\x00":
+                if offset >= len(data):
+                    raise ValueError("description too long")
+                offset += 2
+            offset += 2
+        else:
+            offset = data.index(b"\x00", offset) + 1
+        return (picture_type, offset)
+
+    def _decode_id3_text(self, data):
+        """
+            Decode ID3v2 text frame
+            @param data as bytes, encoding byte followed by text
+            @return [str]
+        """
+        if not data:
+            return []
+        encoding = data[0]
+        data = data[1:]
+        if encoding == 0:
+            text = data.decode("latin-1")
+        elif encoding == 1:
+            text = data[0:len(data) & ~1].decode("utf-16", "replace")
+        elif encoding == 2:
+            text = data[0:len(data) & ~1].decode("utf-16-be", "replace")
+        else:
+            text = data.decode("utf-8", "replace")
+        text = text.replace("\ufeff", "").replace("\ufffe", "")
+        return [value for value in text.split("\x00") if value]
+
+    def _read_id3v1(self, data, tags):
+        """
+            Read ID3v1 tag
+            @param data as bytes, 128 bytes starting with "TAG"
+            @param tags as FastTags
+        """
+        def text(raw):
+            return raw.split(b"\x00")[0].decode("latin-1").strip()
+        tags.add("title", text(data[3:33]))
+        tags.add("artist", text(data[33:63]))
+        tags.add("album", text(data[63:93]))
+        self._add_values(tags, "date", [text(data[93:97])])
+        # ID3v1.1 track number
+        if data[125] == 0 and data[126] != 0:
+            tags.add("track-number", data[126])
+        if data[127] < len(ID3_GENRES):
+            tags.add("genre", ID3_GENRES[data[127]])
+
+    def _is_mpeg_header(self, data):
+        """
+            True if data is a valid MPEG audio frame header
+            @param data as bytes
+            @return bool
+        """
+        return self._parse_mpeg_header(data) is not None
+
+    def _parse_mpeg_header(self, data):
+        """
+            Parse MPEG audio frame header
+            @param data as bytes (4)
+            @return (version, layer, bitrate in kbps, rate, frame length,
+                     samples per frame, mono) or None
+        """
+        if len(data) < 4:
+            return None
+        header = struct.unpack(">I", data[0:4])[0]
+        if (header >> 21) & 0x7ff != 0x7ff:
+            return None
+        version = {0: 2.5, 2: 2, 3: 1}.get((header >> 19) & 3)
+        layer = {1: 3, 2: 2, 3: 1}.get((header >> 17) & 3)
+        bitrate_index = (header >> 12) & 0xf
+        rate_index = (header >> 10) & 3
+        if version is None or layer is None or\
+           bitrate_index in [0, 15] or rate_index == 3:
+            return None
+        padding = (header >> 9) & 1
+        mono = (header >> 6) & 3 == 3
+        if version == 1:
+            bitrates = self._MPEG_BITRATES[(1, layer)]
+        else:
+            bitrates = self._MPEG_BITRATES[(2, min(layer, 2))]
+        bitrate = bitrates[bitrate_index]
+        rate = self._MPEG_RATES[version][rate_index]
+        if layer == 1:
+            samples = 384
+            length = (12 * bitrate * 1000 // rate + padding) * 4
+        elif layer == 3 and version != 1:
+            samples = 576
+            length = 72 * bitrate * 1000 // rate + padding
+        else:
+            samples = 1152
+            length = 144 * bitrate * 1000 // rate + padding
+        return (version, layer, bitrate, rate, length, samples, mono)
+
+    def _get_mpeg_duration(self, f, start, end):
+        """
+            Get MPEG audio duration from first frame
+            @param f as file
+            @param start as int, audio data start
+            @param end as int, audio data end
+            @return duration in seconds as float/None
+        """
+        f.seek(start)
+        data = f.read(self._SEARCH_SIZE)
+        offset = data.find(b"\xff")
+        while offset != -1 and offset + 4 <= len(data):
+            infos = self._parse_mpeg_header(data[offset:offset + 4])
+            if infos is not None:
+                # Check next frame to avoid false sync
+                next_offset = offset + infos[4]
+                if next_offset + 4 > len(data) or\
+                   self._is_mpeg_header(data[next_offset:next_offset + 4]):
+                    break
+            offset = data.find(b"\xff", offset + 1)
+        else:
+            return None
+        (version, layer, bitrate, rate, length, samples, mono) = infos
+        frame = data[offset:offset + 200]
+        # Xing/Info header
+        if version == 1:
+            xing = 4 + (17 if mono else 32)
+        else:
+            xing = 4 + (9 if mono else 17)
+        if frame[xing:xing + 4] in [b"Xing", b"Info"]:
+            flags = struct.unpack(">I", frame[xing + 4:xing + 8])[0]
+            if flags & 1:
+                frames = struct.unpack(">I", frame[xing + 8:xing + 12])[0]
+                return frames * samples / rate
+        # VBRI header
+        if frame[36:40] == b"VBRI":
+            frames = struct.unpack(">I", frame[50:54])[0]
+            return frames * samples / rate
+        # Constant bitrate
+        return (end - start - offset) * 8 / (bitrate * 1000)
+
+    # FLAC
+    def _read_flac(self, f):
+        """
+            Read FLAC metadata blocks
+            @param f as file at "fLaC"
+            @return FastInfos/None
+        """
+        tags = FastTags()
+        duration = None
+        f.read(4)
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) != 4:
+                break
+            last = header[0] & 0x80
+            block_type = header[0] & 0x7f
+            block_size = int.from_bytes(header[1:4], "big")
+            if block_type == 0:
+                duration = self._get_streaminfo_duration(
+                                                self._read(f, block_size))
+            elif block_type == 4:
+                self._read_vorbis_comment(self._read(f, block_size), tags)
+            elif block_type == 6:
+                self._read_flac_picture(f, block_size, tags)
+            else:
+                f.seek(block_size, 1)
+        if duration is None:
+            return None
+        return FastInfos(tags, duration)
+
+    def _get_streaminfo_duration(self, data):
+        """
+            Get duration from FLAC STREAMINFO block
+            @param data as bytes
+            @return duration in seconds as float/None
+        """
+        value = int.from_bytes(data[10:18], "big")
+        rate = value >> 44
+        samples = value & 0xfffffffff
+        if rate == 0:
+            return None
+        return samples / rate
+
+    def _read_flac_picture(self, f, block_size, tags):
+        """
+            Locate image of FLAC PICTURE block
+            @param f as file at block data
+            @param block_size as int
+            @param tags as FastTags
+        """
+        end = f.tell() + block_size
+        (picture_type, mime_size) = struct.unpack(">II", f.read(8))
+        f.seek(mime_size, 1)
+        description_size = struct.unpack(">I", f.read(4))[0]
+        # Description, width, height, depth and colors
+        f.seek(description_size + 16, 1)
+        size = struct.unpack(">I", f.read(4))[0]
+        if f.tell() + size <= end:
+            tags.add_image(FastImage(f.name, f.tell(), size),
+                           picture_type == self._FRONT_COVER)
+        f.seek(end)
+
+    def _parse_flac_picture(self, data):
+        """
+            Parse a FLAC PICTURE block
+            @param data as bytes
+            @return (picture type as int, image as bytes)
+        """
+        (picture_type, mime_size) = struct.unpack(">II", data[0:8])
+        offset = 8 + mime_size
+        description_size = struct.unpack(">I", data[offset:offset + 4])[0]
+        offset += 4 + description_size + 16
+        size = struct.unpack(">I", data[offset:offset + 4])[0]
+        offset += 4
+        return (picture_type, data[offset:offset + size])
+
+    def _read_vorbis_comment(self, data, tags):
+        """
+            Read Vorbis comments
+            @param data as bytes
+            @param tags as FastTags
+        """
+        vendor_size = struct.unpack("<I", data[0:4])[0]
+        offset = 4 + vendor_size
+        count = struct.unpack("<I", data[offset:offset + 4])[0]
+        offset += 4
+        for i in range(0, count):
+            size = struct.unpack("<I", data[offset:offset + 4])[0]
+            offset += 4
+            comment = data[offset:offset + size].decode("utf-8", "replace")
+            offset += size
+            (key, sep, value) = comment.partition("=")
+            key = key.upper()
+            tag = self._VORBIS_FIELDS.get(key)
+            if sep and tag is not None:
+                self._add_values(tags, tag, [value])
+            elif key in ["METADATA_BLOCK_PICTURE", "COVERART"]:
+                try:
+                    image = b64decode(value)
+                    front = False
+                    if key == "METADATA_BLOCK_PICTURE":
+                        (picture_type, image) = self._parse_flac_picture(
+                                                                    image)
+                        front = picture_type == self._FRONT_COVER
+                    tags.add_image(FastImage(data=image), front)
+                except Exception as e:
+                    debug("FastTagReader::_read_vorbis_comment(): %s" % e)
+
+    # Ogg
+    def _read_ogg(self, f, size):
+        """
+            Read Ogg headers and duration from last page
+            @param f as file at first page
+            @param size as int, file size
+            @return FastInfos/None
+        """
+        tags = FastTags()
+        packets = self._get_ogg_packets(f, 2)
+        if len(packets) != 2:
+            return None
+        (first, second) = packets
+        preskip = 0
+        if first[0:7] == b"\x01vorbis":
+            rate = struct.unpack("<I", first[12:16])[0]
+            if second[0:7] != b"\x03vorbis":
+                return None
+            self._read_vorbis_comment(second[7:], tags)
+        elif first[0:8] == b"OpusHead":
+            rate = 48000
+            preskip = struct.unpack("<H", first[10:12])[0]
+            if second[0:8] != b"OpusTags":
+                return None
+            self._read_vorbis_comment(second[8:], tags)
+        elif first[0:5] == b"\x7fFLAC" and first[9:13] == b"fLaC":
+            rate = int.from_bytes(first[27:30], "big") >> 4
+            if second[0] & 0x7f == 4:
+                self._read_vorbis_comment(second[4:], tags)
+        elif first[0:8] == b"Speex   ":
+            rate = struct.unpack("<I", first[36:40])[0]
+            self._read_vorbis_comment(second, tags)
+        else:
+            return None
+        granule = self._get_ogg_last_granule(f, size)
+        if granule is None or rate == 0:
+            return None
+        return FastInfos(tags, max(0, granule - preskip) / rate)
+
+    def _get_ogg_packets(self, f, count):
+        """
+            Read first packets of first logical stream
+            @param f as file at first page
+            @param count as int
+            @return [bytes]
+        """
+        packets = []
+        packet = b""
+        serial = None
+        read = 0
+        while len(packets) < count:
+            header = f.read(27)
+            if len(header) != 27 or header[0:4] != b"OggS":
+                break
+            page_serial = struct.unpack("<I", header[14:18])[0]
+            segments = f.read(header[26])
+            data = self._read(f, sum(segments))
+            read += len(data)
+            if read > self._MAX_READ:
+                break
+            if serial is None:
+                serial = page_serial
+            elif page_serial != serial:
+                continue
+            offset = 0
+            for segment in segments:
+                packet += data[offset:offset + segment]
+                offset += segment
+                if segment < 255:
+                    packets.append(packet)
+                    packet = b""
+        return packets[0:count]
+
+    def _get_ogg_last_granule(self, f, size):
+        """
+            Get granule position of last page
+            @param f as file
+            @param size as int, file size
+            @return int/None
+        """
+        f.seek(max(0, size - self._SEARCH_SIZE))
+        data = f.read(self._SEARCH_SIZE)
+        offset = data.rfind(b"OggS")
+        while offset != -1:
+            if len(data) >= offset + 14:
+                granule = struct.unpack("<q",
+                                        data[offset + 6:offset + 14])[0]
+                if granule != -1:
+                    return granule
+            offset = data.rfind(b"OggS", 0, offset)
+        return None
+
+    # MP4
+    def _read_mp4(self, f, size):
+        """
+            Read MP4 atoms
+            @param f as file at first atom
+            @param size as int, file size
+            @return FastInfos/None
+        """
+        moov = None
+        offset = 0
+        while offset + 8 <= size:
+            f.seek(offset)
+            (atom_size, atom_type, header_size) = self._read_atom_header(f)
+            if atom_size == 0:
+                atom_size = size - offset
+            if atom_size < header_size:
+                return None
+            if atom_type == b"moov":
+                moov = self._read(f, atom_size - header_size)
+                break
+            offset += atom_size
+        if moov is None:
+            return None
+        tags = FastTags()
+        duration = None
+        for (atom_type, data) in self._get_atoms(moov):
+            if atom_type == b"mvhd":
+                if data[0] == 1:
+                    (scale, length) = struct.unpack(">IQ", data[20:32])
+                else:
+                    (scale, length) = struct.unpack(">II", data[12:20])
+                if scale != 0:
+                    duration = length / scale
+            elif atom_type == b"udta":
+                for (udta_type, udta) in self._get_atoms(data):
+                    if udta_type == b"meta":
+                        # Full box, skip version and flags
+                        for (meta_type, meta) in self._get_atoms(udta[4:]):
+                            if meta_type == b"ilst":
+                                self._read_ilst(meta, tags)
+        if duration is None:
+            return None
+        return FastInfos(tags, duration)
+
+    def _read_atom_header(self, f):
+        """
+            Read atom header
+            @param f as file
+            @return (size as int, type as bytes, header size as int)
+        """
+        header = f.read(8)
+        if len(header) != 8:
+            raise IOError("truncated file")
+        (atom_size, atom_type) = struct.unpack(">I4s", header)
+        if atom_size == 1:
+            atom_size = struct.unpack(">Q", f.read(8))[0]
+            return (atom_size, atom_type, 16)
+        return (atom_size, atom_type, 8)
+
+    def _get_atoms(self, data):
+        """
+            Split atoms in data
+            @param data as bytes
+            @return generator of (type as bytes, data as bytes)
+        """
+        offset = 0
+        while offset + 8 <= len(data):
+            (atom_size, atom_type) = struct.unpack(">I4s",
+                                                   data[offset:offset + 8])
+            header_size = 8
+            if atom_size == 1:
+                atom_size = struct.unpack(">Q",
+                                          data[offset + 8:offset + 16])[0]
+                header_size = 16
+            elif atom_size == 0:
+                atom_size = len(data) - offset
+            if atom_size < header_size:
+                break
+            yield (atom_type, data[offset + header_size:offset + atom_size])
+            offset += atom_size
+
+    def _read_ilst(self, data, tags):
+        """
+            Read iTunes metadata items
+            @param data as bytes
+            @param tags as FastTags
+        """
+        for (item_type, item) in self._get_atoms(data):
+            for (data_type, value) in self._get_atoms(item):
+                if data_type != b"data":
+                    continue
+                # Type indicator and locale
+                payload = value[8:]
+                tag = self._MP4_ATOMS.get(item_type)
+                if tag is not None:
+                    self._add_values(tags, tag,
+                                     [payload.decode("utf-8", "replace")])
+                elif item_type == b"trkn" and len(payload) >= 4:
+                    tags.add("track-number",
+                             struct.unpack(">H", payload[2:4])[0] or None)
+                elif item_type == b"disk" and len(payload) >= 4:
+                    tags.add("album-disc-number",
+                             struct.unpack(">H", payload[2:4])[0] or None)
+                elif item_type == b"covr":
+                    tags.add_image(FastImage(data=payload), False)
+                elif item_type == b"gnre" and len(payload) >= 2:
+                    genre = struct.unpack(">H", payload[0:2])[0] - 1
+                    if 0 <= genre < len(ID3_GENRES):
+                        tags.add("genre", ID3_GENRES[genre])
@@ -116,6 +116,17 @@ def translate_artist_name(name):
     return name
 
 
+def get_fts_match(string):
+    """
+        Return full text search query matching names with words
+        starting like string words, in any order
+        @param string as str
+        @return str, empty if no words
+    """
+    return " ".join(['"%s"*' % word.replace('"', '""')
+                     for word in string.split()])
+
+
 def seconds_to_string(duration):
     """
         Convert seconds to a pretty string
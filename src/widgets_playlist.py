@@ -26,6 +26,8 @@ class PlaylistWidget(Gtk.Bin):
     """
         Show playlist tracks/albums
     """
+    # Tracks loaded at once
+    _LOAD_SIZE = 50
 
     def __init__(self, playlist_id):
         """
@@ -117,7 +119,7 @@ class PlaylistWidget(Gtk.Bin):
     def _add_tracks(self, tracks, widget, pos, previous_album_id=None):
         """
             Add tracks to list
-            @param tracks id as array of [int]
+            @param tracks as [int/Track], ids are loaded by _LOAD_SIZE
             @param widget TracksWidget
             @param track position as int
             @param previous album id as int
@@ -125,7 +127,11 @@ class PlaylistWidget(Gtk.Bin):
         if not tracks or self._stop:
             return
 
-        track = Track(tracks.pop(0))
+        # Load next tracks in one go, a chunk at a time to not block ui
+        if not isinstance(tracks[0], Track):
+            tracks[:self._LOAD_SIZE] = Track.load_many(
+                                                    tracks[:self._LOAD_SIZE])
+        track = tracks.pop(0)
         name = escape(track.name)
         album = track.album
 
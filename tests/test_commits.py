@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Usage: python3 -m unittest discover tests
+
+import glob
+import os
+import re
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# Only modules allowed to commit: mutations go through SqlWriter,
+# collection scanner through ScanWriter
+WRITERS = ["database_upgrade.py", "scanwriter.py", "sqlwriter.py"]
+COMMIT = re.compile(r"\bsql\.commit\(\)|\bCOMMIT\b|\bEND TRANSACTION\b")
+
+
+class CommitTest(unittest.TestCase):
+    """
+        Database writes are committed by writers only
+    """
+
+    def test_commits(self):
+        """
+            No commit outside of writers
+        """
+        found = []
+        for path in sorted(glob.glob(os.path.join(SRC, "*.py"))):
+            if os.path.basename(path) in WRITERS:
+                continue
+            with open(path) as f:
+                for (i, line) in enumerate(f, 1):
+                    if COMMIT.search(line):
+                        found.append("%s:%s: %s" % (os.path.basename(path),
+                                                    i, line.strip()))
+        self.assertEqual(found, [])
+
+if __name__ == '__main__':
+    unittest.main()
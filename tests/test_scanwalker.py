@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Usage: PYTHONPATH=<dir containing lollypop> python3 -m unittest discover
+#        tests
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lollypop.scanwalker import ScanWalker
+
+
+class ScanWalkerTest(unittest.TestCase):
+    """
+        Walk a small tree twice, second walk uses first walk status
+    """
+
+    def setUp(self):
+        """
+            Create root/a.mp3 and root/sub/b.mp3
+        """
+        self._root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self._root, "sub"))
+        for name in ["a.mp3", os.path.join("sub", "b.mp3")]:
+            with open(os.path.join(self._root, name), "wb") as f:
+                f.write(b"\0")
+
+    def tearDown(self):
+        """
+            Remove tree
+        """
+        shutil.rmtree(self._root)
+
+    def test_trailing_slash(self):
+        """
+            Files of an unchanged root are found again when root has a
+            trailing separator
+        """
+        root = os.path.join(self._root, "")
+        walker = ScanWalker()
+        found = dict(walker.walk([root]))
+        self.assertEqual(sorted(found), self._expected())
+        self.assertIn(self._root, walker.status)
+        self.assertNotIn(root, walker.status)
+        # What CollectionScanner loads from database on next scan
+        known_files = {}
+        for (filepath, mtime) in found.items():
+            known_files.setdefault(os.path.dirname(filepath),
+                                   {})[filepath] = mtime
+        walker = ScanWalker(dict(walker.status), known_files)
+        found = dict(walker.walk([root]))
+        self.assertEqual(sorted(found), self._expected())
+        self.assertEqual(walker.get_stats()['skipped'], 2)
+
+    def test_nested(self):
+        """
+            Nested roots are walked once
+        """
+        walker = ScanWalker()
+        files = list(walker.walk([os.path.join(self._root, ""),
+                                  os.path.join(self._root, "sub")]))
+        self.assertEqual(sorted(f[0] for f in files), self._expected())
+
+#######################
+# PRIVATE             #
+#######################
+    def _expected(self):
+        """
+            Return music files in tree
+            @return [str]
+        """
+        return sorted([os.path.join(self._root, "a.mp3"),
+                       os.path.join(self._root, "sub", "b.mp3")])
+
+if __name__ == '__main__':
+    unittest.main()
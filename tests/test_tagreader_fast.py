@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+# Copyright (c) 2014-2016 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Usage: PYTHONPATH=<dir containing lollypop> python3 -m unittest discover
+#        tests
+
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+from lollypop.tagreader_fast import FastTagReader
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "benchmarks"))
+from generate import write_flac, write_m4a, write_mp3, write_opus  # noqa
+
+# Longer than 127 bytes, so syncsafe and plain sizes differ
+TITLE = " ".join(["Title"] * 30)
+COVER = b"\xff\xd8\xff\xe0" + bytes(range(0, 256)) + b"\xff\xd9"
+TAGS = {"title": TITLE,
+        "artist": "Artist",
+        "album": "Album",
+        "track": 3,
+        "disc": 2,
+        "genres": ["Rock"],
+        "year": 1999,
+        "cover": COVER}
+SECONDS = 5
+
+
+class FastTagReaderTest(unittest.TestCase):
+    """
+        Read files written by benchmarks/generate.py
+    """
+
+    def setUp(self):
+        """
+            Create a temporary directory
+        """
+        self._root = tempfile.mkdtemp()
+        self._reader = FastTagReader()
+
+    def tearDown(self):
+        """
+            Remove directory
+        """
+        shutil.rmtree(self._root)
+
+    def test_id3v24(self):
+        """
+            ID3v2.4 frame sizes are syncsafe
+        """
+        path = self._write("a.mp3", write_mp3)
+        infos = self._reader.get_infos(path)
+        self._check_tags(infos)
+        # 191 CBR frames of 417 bytes at 128kbps
+        self.assertAlmostEqual(infos.get_duration() / 1000000000,
+                               SECONDS, delta=0.05)
+
+    def test_id3v23(self):
+        """
+            ID3v2.3 frame sizes are plain 32 bits integers
+        """
+        path = os.path.join(self._root, "a.mp3")
+        write_mp3(path, TAGS, SECONDS, 3)
+        infos = self._reader.get_infos(path)
+        self._check_tags(infos)
+        self.assertAlmostEqual(infos.get_duration() / 1000000000,
+                               SECONDS, delta=0.05)
+
+    def test_flac(self):
+        """
+            FLAC duration comes from STREAMINFO
+        """
+        path = self._write("a.flac", write_flac)
+        infos = self._reader.get_infos(path)
+        self._check_tags(infos)
+        # Duration is rounded down to 4096 samples blocks
+        self.assertEqual(infos.get_duration(),
+                         SECONDS * 44100 // 4096 * 4096 * 1000000000 // 44100)
+
+    def test_opus(self):
+        """
+            Ogg duration comes from last granule position minus pre-skip
+        """
+        path = self._write("a.opus", write_opus)
+        infos = self._reader.get_infos(path)
+        self._check_tags(infos)
+        self.assertEqual(infos.get_duration(), SECONDS * 1000000000)
+
+    def test_m4a(self):
+        """
+            MP4 duration comes from mvhd
+        """
+        path = self._write("a.m4a", write_m4a)
+        infos = self._reader.get_infos(path)
+        self._check_tags(infos)
+        self.assertEqual(infos.get_duration(), SECONDS * 1000000000)
+
+    def test_truncated(self):
+        """
+            Truncated files are never read with wrong tags
+        """
+        writers = [("a.mp3", write_mp3), ("a.flac", write_flac),
+                   ("a.opus", write_opus), ("a.m4a", write_m4a)]
+        for (name, writer) in writers:
+            path = self._write(name, writer)
+            with open(path, "rb") as f:
+                data = f.read()
+            # Cut in headers, in tags and in cover
+            for size in [0, 3, 4, 9, 12, 30, 60, 100, 200, 400]:
+                with open(path, "wb") as f:
+                    f.write(data[0:size])
+                infos = self._reader.get_infos(path)
+                if infos is not None:
+                    (exist, title) = infos.get_tags().get_string_index(
+                                                                "title", 0)
+                    self.assertIn(title, [None, TITLE], (name, size))
+
+    def test_truncated_metadata(self):
+        """
+            Files cut before duration are not read
+        """
+        # FLAC cut in STREAMINFO
+        path = self._write("a.flac", write_flac)
+        self._truncate(path, 20)
+        self.assertIsNone(self._reader.get_infos(path))
+        # Ogg cut in comment header
+        path = self._write("a.opus", write_opus)
+        with open(path, "rb") as f:
+            data = f.read()
+        self._truncate(path, data.index(b"OpusTags") + 16)
+        self.assertIsNone(self._reader.get_infos(path))
+        # MP4 cut in moov
+        path = self._write("a.m4a", write_m4a)
+        self._truncate(path, 64)
+        self.assertIsNone(self._reader.get_infos(path))
+        # MP3 cut in ID3v2 tag
+        path = self._write("a.mp3", write_mp3)
+        self._truncate(path, 200)
+        self.assertIsNone(self._reader.get_infos(path))
+
+    def test_corrupt(self):
+        """
+            Corrupt headers are rejected
+        """
+        # ID3v2.4 frame size bigger than reader limit
+        path = self._write("a.mp3", write_mp3)
+        self._patch(path, 14, b"\x7f\x7f\x7f\x7f")
+        self.assertIsNone(self._reader.get_infos(path))
+        # FLAC sample rate of 0
+        path = self._write("a.flac", write_flac)
+        self._patch(path, 18, b"\x00\x00\x00")
+        self.assertIsNone(self._reader.get_infos(path))
+        # Unknown Ogg codec
+        path = self._write("a.opus", write_opus)
+        self._patch(path, 28, b"Corrupt!")
+        self.assertIsNone(self._reader.get_infos(path))
+        # MP4 atom smaller than its header
+        path = self._write("a.m4a", write_m4a)
+        with open(path, "rb") as f:
+            data = f.read()
+        self._patch(path, data.index(b"moov") - 4, struct.pack(">I", 4))
+        self.assertIsNone(self._reader.get_infos(path))
+        # Not a music file
+        path = os.path.join(self._root, "a.txt")
+        with open(path, "wb") as f:
+            f.write(b"ID3" + b"\xff" * 1024)
+        self.assertIsNone(self._reader.get_infos(path))
+
+#######################
+# PRIVATE             #
+#######################
+    def _write(self, name, writer):
+        """
+            Write a file with TAGS
+            @param name as str
+            @param writer as function
+            @return path as str
+        """
+        path = os.path.join(self._root, name)
+        writer(path, TAGS, SECONDS)
+        return path
+
+    def _truncate(self, path, size):
+        """
+            Truncate file
+            @param path as str
+            @param size as int
+        """
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+    def _patch(self, path, offset, data):
+        """
+            Overwrite file at offset
+            @param path as str
+            @param offset as int
+            @param data as bytes
+        """
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+
+    def _check_tags(self, infos):
+        """
+            Check infos match TAGS
+            @param infos as FastInfos
+        """
+        self.assertIsNotNone(infos)
+        tags = infos.get_tags()
+        self.assertEqual(tags.get_string_index("title", 0), (True, TITLE))
+        self.assertEqual(tags.get_string_index("artist", 0),
+                         (True, "Artist"))
+        self.assertEqual(tags.get_string_index("album", 0), (True, "Album"))
+        self.assertEqual(tags.get_string_index("genre", 0), (True, "Rock"))
+        self.assertEqual(tags.get_uint_index("track-number", 0), (True, 3))
+        self.assertEqual(tags.get_uint_index("album-disc-number", 0),
+                         (True, 2))
+        self.assertEqual(tags.get_date("date")[1].get_year(), 1999)
+        (exist, image) = tags.get_sample_index("image", 0)
+        self.assertTrue(exist)
+        self.assertEqual(image.get_data(), COVER)
+
+if __name__ == '__main__':
+    unittest.main()